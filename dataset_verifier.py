@@ -0,0 +1,335 @@
+"""
+Dataset Integrity Verifier
+==========================
+Checks every split of a YOLO-OBB dataset in a process pool:
+
+- every image opens and its header is sane (full decode optional)
+- image and label stems pair up (orphan labels, unlabeled images)
+- every label line has a class id plus 8 coordinates, all numeric
+- class ids are known and coordinates lie in [0, 1]
+- no degenerate boxes (zero area, repeated corners) or self-intersecting quads
+
+Per-file results are cached by file kind and content hash, so re-verifying after a merge
+only opens files that are new or changed. A machine-readable report is
+written to <dataset>/verification_report.json.
+
+Usage:
+    python dataset_verifier.py [dataset_dir]     # default: dataset
+"""
+
+import hashlib
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import yaml
+
+# Verification configuration
+DATASET_DIR = Path("dataset")
+SPLITS = ['train', 'valid', 'val', 'test']
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+VERIFY_WORKERS = os.cpu_count() or 4
+FULL_DECODE = False        # True: decode every pixel instead of header + structure checks
+COORD_TOLERANCE = 1e-6     # Slack for float noise like 1.0000000000000002
+MIN_BOX_AREA = 1e-6        # Normalized area below which a box counts as degenerate
+MIN_IMAGE_SIDE = 32
+CACHE_FILE = ".verify_cache.json"
+REPORT_FILE = "verification_report.json"
+CHECKS_VERSION = 2         # Bump when checks change so cached results are discarded
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _cache_key(kind, digest):
+    """Results are shared by content hash within one kind only: an image and a label
+    with the same bytes (e.g. two empty files) get different results"""
+    return f"{kind}:{digest}"
+
+
+def _polygon_checks(xy):
+    """Issue codes for one quad given as 8 normalized floats"""
+    pts = [(xy[i], xy[i + 1]) for i in range(0, 8, 2)]
+    issues = []
+
+    if len(set(pts)) < 4:
+        issues.append('repeated_corner')
+
+    # Cross products of consecutive edges: mixed signs mean a bow-tie or concave quad
+    crosses = []
+    for i in range(4):
+        (x0, y0), (x1, y1), (x2, y2) = pts[i], pts[(i + 1) % 4], pts[(i + 2) % 4]
+        crosses.append((x1 - x0) * (y2 - y1) - (y1 - y0) * (x2 - x1))
+    area = abs(sum(pts[i][0] * pts[(i + 1) % 4][1] - pts[(i + 1) % 4][0] * pts[i][1] for i in range(4))) / 2
+
+    if area < MIN_BOX_AREA:
+        issues.append('zero_area')
+    elif any(c > 0 for c in crosses) and any(c < 0 for c in crosses):
+        issues.append('not_convex')
+    return issues
+
+
+def check_label(path, num_classes):
+    """
+    Validate one label file (runs in a worker process).
+
+    Returns:
+        Dict with hash, instances, classes and a list of (line, code) issues
+    """
+    data = Path(path).read_bytes()
+    result = {'hash': _digest(data), 'instances': 0, 'classes': [], 'issues': []}
+
+    for line_no, line in enumerate(data.decode('utf-8', errors='replace').splitlines(), 1):
+        tokens = line.split()
+        if not tokens:
+            continue
+        if len(tokens) != 9:
+            result['issues'].append((line_no, f'bad_field_count:{len(tokens)}'))
+            continue
+        try:
+            values = [float(t) for t in tokens]
+        except ValueError:
+            result['issues'].append((line_no, 'not_numeric'))
+            continue
+
+        class_id, xy = values[0], values[1:]
+        if class_id != int(class_id) or class_id < 0 or (num_classes and class_id >= num_classes):
+            result['issues'].append((line_no, f'bad_class:{tokens[0]}'))
+        if any(v < -COORD_TOLERANCE or v > 1 + COORD_TOLERANCE for v in xy):
+            result['issues'].append((line_no, 'coord_out_of_range'))
+        for code in _polygon_checks(xy):
+            result['issues'].append((line_no, code))
+
+        result['instances'] += 1
+        result['classes'].append(int(class_id))
+    return result
+
+
+def check_image(path, full_decode=FULL_DECODE):
+    """
+    Validate one image file (runs in a worker process).
+
+    Header-only by default: PIL parses the header and `verify()` walks the
+    file structure (PNG chunks and CRCs, JPEG markers) without decoding pixels.
+
+    Returns:
+        Dict with hash, width, height, format and a list of issue codes
+    """
+    from PIL import Image
+
+    data = Path(path).read_bytes()
+    result = {'hash': _digest(data), 'width': 0, 'height': 0, 'format': None, 'issues': []}
+    if not data:
+        result['issues'].append('empty_file')
+        return result
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            result['width'], result['height'], result['format'] = img.width, img.height, img.format
+            img.verify()
+        if full_decode:
+            with Image.open(io.BytesIO(data)) as img:
+                img.load()
+    except Exception as e:
+        result['issues'].append(f'unreadable:{type(e).__name__}')
+        return result
+
+    if data[-2:] != b'\xff\xd9' and result['format'] == 'JPEG':
+        result['issues'].append('truncated_jpeg')
+    if min(result['width'], result['height']) < MIN_IMAGE_SIDE:
+        result['issues'].append('too_small')
+    return result
+
+
+_known_keys = frozenset()
+
+
+def _init_worker(known_keys):
+    global _known_keys
+    _known_keys = known_keys
+
+
+def _check_file(job):
+    """
+    Worker entry point: job is (kind, path, num_classes, full_decode).
+
+    Files whose (kind, content hash) already has a cached result (e.g. copied
+    or renamed by a merge) are only hashed, not checked again.
+    """
+    kind, path, num_classes, full_decode = job
+    try:
+        digest = _digest(Path(path).read_bytes())
+        if _cache_key(kind, digest) in _known_keys:
+            return {'hash': digest, 'known': True}
+        return check_image(path, full_decode) if kind == 'image' else check_label(path, num_classes)
+    except OSError as e:
+        code = f'io_error:{e.strerror}'
+        return {'hash': None, 'issues': [code] if kind == 'image' else [(0, code)]}
+
+
+def load_num_classes(dataset_dir):
+    """Class count from data.yaml (nc or names), or None if unavailable"""
+    data_yaml = Path(dataset_dir) / 'data.yaml'
+    if not data_yaml.exists():
+        return None
+    with open(data_yaml) as f:
+        config = yaml.safe_load(f) or {}
+    if 'nc' in config:
+        return int(config['nc'])
+    names = config.get('names')
+    return len(names) if names else None
+
+
+def _load_cache(cache_path, settings):
+    """Cached per-file results, discarded if the checks or settings changed"""
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+        if cache.get('settings') == settings:
+            return cache['files'], cache['by_key']
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}, {}
+
+
+def verify_dataset_tree(dataset_dir=DATASET_DIR, workers=VERIFY_WORKERS, full_decode=FULL_DECODE):
+    """
+    Verify every split of a dataset and write the JSON report.
+
+    Args:
+        dataset_dir: Dataset root containing <split>/images and <split>/labels
+        workers: Worker processes
+        full_decode: Decode every pixel instead of header-only checks
+
+    Returns:
+        Report dictionary (also written to <dataset_dir>/verification_report.json)
+    """
+    dataset_dir = Path(dataset_dir)
+    num_classes = load_num_classes(dataset_dir)  # None: class ids are not range-checked
+    settings = {'version': CHECKS_VERSION, 'num_classes': num_classes, 'full_decode': full_decode,
+                'coord_tolerance': COORD_TOLERANCE, 'min_box_area': MIN_BOX_AREA, 'min_side': MIN_IMAGE_SIDE}
+    cache_path = dataset_dir / CACHE_FILE
+    cached_files, cached_by_key = _load_cache(cache_path, settings)
+
+    # Collect files; unchanged ones (same size + mtime) reuse their cached result
+    splits = {}
+    results, jobs = {}, []
+    for split in SPLITS:
+        images_dir, labels_dir = dataset_dir / split / 'images', dataset_dir / split / 'labels'
+        if not images_dir.exists() and not labels_dir.exists():
+            continue
+        images = sorted(p for p in images_dir.glob('*') if p.suffix.lower() in IMAGE_EXTENSIONS) \
+            if images_dir.exists() else []
+        labels = sorted(labels_dir.glob('*.txt')) if labels_dir.exists() else []
+        splits[split] = (images, labels)
+
+        for kind, paths in (('image', images), ('label', labels)):
+            for path in paths:
+                rel = path.relative_to(dataset_dir).as_posix()
+                stat = path.stat()
+                entry = cached_files.get(rel)
+                if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                    results[rel] = cached_by_key[entry['key']]
+                else:
+                    jobs.append((rel, stat, (kind, str(path), num_classes, full_decode)))
+
+    # Only new or touched files reach the pool
+    files = {rel: cached_files[rel] for rel in results}
+    by_key = {entry['key']: cached_by_key[entry['key']] for entry in files.values()}
+    checked = 0
+    if jobs:
+        chunksize = max(1, len(jobs) // (workers * 8))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(frozenset(cached_by_key),)) as pool:
+            for (rel, stat, job), result in zip(jobs, pool.map(_check_file, [j[2] for j in jobs],
+                                                               chunksize=chunksize)):
+                key = _cache_key(job[0], result['hash'])
+                if result.get('known'):
+                    result = cached_by_key[key]
+                else:
+                    checked += 1
+                results[rel] = result
+                if result['hash'] is not None:
+                    files[rel] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'key': key}
+                    by_key[key] = result
+
+    report = {
+        'dataset': str(dataset_dir), 'created': datetime.now().isoformat(timespec='seconds'),
+        'num_classes': num_classes, 'checked': checked, 'cached': len(results) - checked,
+        'splits': {}, 'issues': [],
+    }
+    for split, (images, labels) in splits.items():
+        image_stems = {p.stem: p for p in images}
+        label_stems = {p.stem: p for p in labels}
+        class_counts = {}
+        split_issues = []
+
+        for path in images:
+            rel = path.relative_to(dataset_dir).as_posix()
+            split_issues += [{'file': rel, 'issue': code} for code in results[rel]['issues']]
+            if path.stem not in label_stems:
+                split_issues.append({'file': rel, 'issue': 'missing_label'})
+        for path in labels:
+            rel = path.relative_to(dataset_dir).as_posix()
+            result = results[rel]
+            split_issues += [{'file': rel, 'line': line, 'issue': code} for line, code in result['issues']]
+            for class_id in result.get('classes', []):
+                class_counts[class_id] = class_counts.get(class_id, 0) + 1
+            if path.stem not in image_stems:
+                split_issues.append({'file': rel, 'issue': 'orphan_label'})
+
+        report['splits'][split] = {
+            'images': len(images), 'labels': len(labels),
+            'paired': len(image_stems.keys() & label_stems.keys()),
+            'instances': sum(class_counts.values()),
+            'class_counts': {str(k): v for k, v in sorted(class_counts.items())},
+            'issues': len(split_issues),
+        }
+        report['issues'] += split_issues
+
+    with open(dataset_dir / REPORT_FILE, 'w') as f:
+        json.dump(report, f, indent=2)
+    tmp = cache_path.with_suffix('.tmp')
+    with open(tmp, 'w') as f:
+        json.dump({'settings': settings, 'files': files, 'by_key': by_key}, f)
+    os.replace(tmp, cache_path)
+    return report
+
+
+def print_verification(report, limit=15):
+    """Print per-split counts and the most common issues"""
+    print("\n" + "=" * 70)
+    print(f"🔍 DATASET VERIFICATION: {report['dataset']}")
+    print("=" * 70)
+    print(f"  Files checked: {report['checked']} (cached: {report['cached']})")
+    print(f"\n  {'Split':<8} {'Images':>8} {'Labels':>8} {'Paired':>8} {'Instances':>10} {'Issues':>8}")
+    for split, stats in report['splits'].items():
+        print(f"  {split:<8} {stats['images']:>8} {stats['labels']:>8} {stats['paired']:>8} "
+              f"{stats['instances']:>10} {stats['issues']:>8}")
+
+    by_code = {}
+    for issue in report['issues']:
+        code = issue['issue'].split(':')[0]
+        by_code[code] = by_code.get(code, 0) + 1
+    if by_code:
+        print("\n  Issues by type:")
+        for code, count in sorted(by_code.items(), key=lambda kv: -kv[1]):
+            print(f"    {code:.<30} {count}")
+        print("\n  First issues:")
+        for issue in report['issues'][:limit]:
+            line = f":{issue['line']}" if 'line' in issue else ""
+            print(f"    ⚠️  {issue['file']}{line} {issue['issue']}")
+    else:
+        print("\n  ✅ No issues found")
+    print(f"\n  Report: {Path(report['dataset']) / REPORT_FILE}")
+    print("=" * 70)
+
+
+if __name__ == '__main__':
+    dataset = Path(sys.argv[1]) if len(sys.argv) > 1 else DATASET_DIR
+    print_verification(verify_dataset_tree(dataset))
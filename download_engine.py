@@ -0,0 +1,528 @@
+"""
+Concurrent Image Download Engine
+================================
+Shared downloader for the scraper scripts. Replaces one-at-a-time
+`requests.get` + `time.sleep` loops with:
+
+- a thread pool, each thread keeping its own keep-alive `requests.Session`
+- a per-host concurrency limit, so one slow image host cannot hog the pool
+- a token-bucket rate limiter (steady rate with short bursts) instead of fixed sleeps
+- retries with exponential backoff and jitter for timeouts, 429 and 5xx
+  (honouring Retry-After)
+- streaming validation: the magic bytes and the image header (dimensions)
+  are checked from the first chunks, so HTML error pages, non-images and
+  thumbnails are rejected before anything is written or fully downloaded
+- streaming writes to a temporary file that is only renamed into place once
+  the download is complete and large enough
+- optional re-encoding of every kept image to a JPEG of a fixed longer side
+  (TRANSCODE_MAX_SIDE), so the dataset does not carry 6000px originals
+
+The engine knows nothing about Bing or Google, so it can be pointed at any
+server, including the local stand-in used by `python download_engine.py selftest`.
+
+Usage:
+    from download_engine import DownloadEngine
+    engine = DownloadEngine()
+    results = engine.download_all(urls, name_fn, out_dir, limit=250)
+"""
+
+import hashlib
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Download configuration
+MAX_WORKERS = 16
+PER_HOST_LIMIT = 4          # Concurrent connections to any one host
+RATE_PER_SECOND = 8.0       # Steady request rate across all hosts
+BURST = 16                  # Requests allowed back-to-back before the rate applies
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5          # Seconds; doubled on every retry, plus jitter
+MAX_BACKOFF = 30.0
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 15
+CHUNK_SIZE = 64 * 1024
+MIN_BYTES = 5000            # Smaller responses are almost always error pages or icons
+MIN_IMAGE_SIDE = 224        # Reject thumbnails before they are written
+HEADER_PROBE_BYTES = 256 * 1024  # Give up if no image header was found in this many bytes
+TRANSCODE_MAX_SIDE = None   # e.g. 1280: re-encode every image as JPEG with this longer side
+TRANSCODE_QUALITY = 92
+MAX_BYTES = 25 * 1024 * 1024
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+# Declared types that may still hold an image (the magic bytes decide)
+SNIFF_CONTENT_TYPES = {'application/octet-stream', 'binary/octet-stream', 'application/x-www-form-urlencoded'}
+
+MAGIC_BYTES = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp'),
+]
+
+CONTENT_TYPE_EXTENSIONS = {
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/bmp': '.bmp',
+}
+
+
+def extension_for(content_type):
+    """File extension for a Content-Type header (defaults to .jpg, as the scrapers did)"""
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    return CONTENT_TYPE_EXTENSIONS.get(content_type, '.jpg')
+
+
+def sniff_image_type(head):
+    """MIME type from the first bytes of a file, or None if it is not a supported image"""
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    for magic, mime in MAGIC_BYTES:
+        if head.startswith(magic):
+            return mime
+    return None
+
+
+def transcode_jpeg(path, max_side, quality=TRANSCODE_QUALITY):
+    """Re-encode an image in place as an RGB JPEG whose longer side is at most max_side"""
+    from PIL import Image
+
+    with Image.open(path) as img:
+        img.draft('RGB', (max_side, max_side))  # JPEG: decode straight at a reduced scale
+        img = img.convert('RGB')
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+        tmp = Path(f"{path}.jpg.tmp")
+        img.save(tmp, 'JPEG', quality=quality, optimize=True)
+    os.replace(tmp, path)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`.
+
+    `acquire()` blocks until a token is available.
+    """
+
+    def __init__(self, rate=RATE_PER_SECOND, capacity=BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+
+class DownloadEngine:
+    """
+    Concurrent, rate-limited downloader.
+
+    Args:
+        workers: Download threads
+        per_host: Maximum concurrent requests per host
+        rate: Requests per second (token refill rate); None disables rate limiting
+        burst: Token bucket capacity
+        retries: Retries after the first attempt
+        headers: Request headers
+        min_bytes: Downloads smaller than this are discarded
+        min_side: Images whose shorter side is below this are rejected from the header
+        transcode_side: If set, saved images are re-encoded as JPEG with this longer side
+        known_hash: Optional callable(hash) returning a truthy value when byte-identical
+                    content was already saved from another URL (e.g. ScrapeState.known_hash);
+                    such downloads are dropped as 'duplicate' before they get a file name
+    """
+
+    def __init__(self, workers=MAX_WORKERS, per_host=PER_HOST_LIMIT, rate=RATE_PER_SECOND, burst=BURST,
+                 retries=MAX_RETRIES, headers=None, min_bytes=MIN_BYTES, min_side=MIN_IMAGE_SIDE,
+                 transcode_side=TRANSCODE_MAX_SIDE, known_hash=None):
+        self.workers = workers
+        self.per_host = per_host
+        self.retries = retries
+        self.headers = dict(HEADERS if headers is None else headers)
+        self.min_bytes = min_bytes
+        self.min_side = min_side
+        self.transcode_side = transcode_side
+        self.known_hash = known_hash
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self._local = threading.local()
+        self._host_slots = {}
+        self._hosts_lock = threading.Lock()
+        self._name_lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'bytes': 0}
+        self._stats_lock = threading.Lock()
+
+    def _session(self):
+        """Per-thread Session; requests Sessions are not guaranteed thread-safe"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.per_host * 4, pool_maxsize=self.per_host)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._hosts_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_slots[host]
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            try:
+                return min(MAX_BACKOFF, float(retry_after))
+            except ValueError:
+                pass  # HTTP-date form; fall back to exponential backoff
+        return min(MAX_BACKOFF, BACKOFF_BASE * (2 ** attempt)) * (0.5 + random.random())
+
+    def _stream_to(self, response, tmp_path, result):
+        """
+        Validate and stream a response body to disk, hashing it on the way.
+
+        The first chunks stay in memory until the magic bytes and the image
+        header have been checked, so a rejected response never touches the
+        disk and the rest of its body is never downloaded.
+
+        Returns:
+            Status: 'ok', 'not_image', 'low_resolution' or 'too_large'.
+            On 'ok', result gets bytes, hash, content_type (sniffed), width and height
+        """
+        from PIL import ImageFile
+
+        parser = ImageFile.Parser()
+        digest = hashlib.blake2b(digest_size=16)
+        head, head_bytes, written = [], 0, 0
+        mime, f = None, None
+        try:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                written += len(chunk)
+                if written > MAX_BYTES:
+                    return 'too_large'
+                digest.update(chunk)
+                if f is not None:
+                    f.write(chunk)
+                    continue
+
+                head.append(chunk)
+                head_bytes += len(chunk)
+                if mime is None:
+                    if head_bytes < 16:
+                        continue
+                    mime = sniff_image_type(b''.join(head))
+                    if mime is None:
+                        return 'not_image'
+                    chunk = b''.join(head)
+                try:
+                    parser.feed(chunk)  # Stops being fed once the header is parsed
+                except Exception:
+                    return 'not_image'
+
+                if parser.image is not None:
+                    width, height = parser.image.size
+                    if min(width, height) < self.min_side:
+                        return 'low_resolution'
+                    result.update(width=width, height=height)
+                    f = open(tmp_path, 'wb')
+                    f.write(b''.join(head))
+                elif head_bytes > HEADER_PROBE_BYTES:
+                    return 'not_image'
+        finally:
+            if f is not None:
+                f.close()
+
+        if f is None:
+            return 'not_image'  # Body ended before a complete image header
+        result.update(bytes=written, hash=digest.hexdigest(), content_type=mime)
+        if self.transcode_side:
+            transcode_jpeg(tmp_path, self.transcode_side)
+            result['content_type'] = 'image/jpeg'
+        return 'ok'
+
+    def fetch(self, url, out_dir, name_fn, budget=None):
+        """
+        Download one URL into out_dir.
+
+        Args:
+            url: Image URL
+            out_dir: Destination directory
+            name_fn: Callable(url, content_type) -> file name, called (under a lock)
+                     only once the download succeeded, so numbering has no gaps
+            budget: Optional {'left': n} shared by a batch; once n files were kept,
+                    further completed downloads are discarded
+
+        Returns:
+            Dict with url, status ('ok', 'http_error', 'not_image', 'low_resolution',
+            'too_small', 'too_large', 'duplicate', 'discarded', 'error'), path, bytes, hash
+            (BLAKE2b of the downloaded body), width, height, attempts,
+            content_type (sniffed from the magic bytes) and error
+        """
+        out_dir = Path(out_dir)
+        result = {'url': url, 'status': 'error', 'path': None, 'bytes': 0, 'hash': None, 'attempts': 0,
+                  'content_type': None, 'width': None, 'height': None, 'error': None}
+        tmp_path = out_dir / f".{uuid.uuid4().hex}.part"
+        slot = self._host_slot(url)
+
+        for attempt in range(self.retries + 1):
+            result['attempts'] = attempt + 1
+            retry_after = None
+            if self.bucket is not None:
+                self.bucket.acquire()
+            try:
+                with slot:
+                    self._count('requests')
+                    with self._session().get(url, stream=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as response:
+                        if response.status_code in RETRY_STATUS:
+                            retry_after = response.headers.get('Retry-After')
+                            raise requests.HTTPError(f"HTTP {response.status_code}")
+                        if response.status_code != 200:
+                            result.update(status='http_error', error=f"HTTP {response.status_code}")
+                            return result
+
+                        declared = (response.headers.get('content-type') or '').split(';')[0].strip().lower()
+                        if declared and not declared.startswith('image/') and declared not in SNIFF_CONTENT_TYPES:
+                            result.update(status='not_image', error=f"content-type {declared}")
+                            return result
+                        status = self._stream_to(response, tmp_path, result)
+
+                if status != 'ok':
+                    tmp_path.unlink(missing_ok=True)
+                    result.update(status=status)
+                    return result
+                self._count('bytes', result['bytes'])
+                if result['bytes'] < self.min_bytes:
+                    tmp_path.unlink(missing_ok=True)
+                    result.update(status='too_small')
+                    return result
+                if self.known_hash is not None and self.known_hash(result['hash']):
+                    tmp_path.unlink(missing_ok=True)
+                    result.update(status='duplicate')
+                    return result
+
+                with self._name_lock:
+                    if budget is not None and budget['left'] <= 0:
+                        tmp_path.unlink(missing_ok=True)
+                        result.update(status='discarded')
+                        return result
+                    if budget is not None:
+                        budget['left'] -= 1
+                    path = out_dir / name_fn(url, result['content_type'])
+                    os.replace(tmp_path, path)
+                result.update(status='ok', path=path, error=None)
+                return result
+
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                tmp_path.unlink(missing_ok=True)
+                result['error'] = str(e)
+                if attempt < self.retries:
+                    self._count('retries')
+                    time.sleep(self._backoff(attempt, retry_after))
+            except Exception as e:
+                tmp_path.unlink(missing_ok=True)
+                result['error'] = str(e)
+                return result
+        return result
+
+    def download_all(self, urls, name_fn, out_dir, limit=None, on_result=None):
+        """
+        Download many URLs concurrently.
+
+        Only about 2x `workers` downloads are in flight at a time, so when
+        `limit` successes are reached nothing beyond those is fetched.
+
+        Args:
+            urls: Iterable of image URLs
+            name_fn: See `fetch`
+            out_dir: Destination directory
+            limit: Stop after this many successful downloads (None for all)
+            on_result: Optional callable(result) run for every finished download
+
+        Returns:
+            List of result dicts, in completion order
+        """
+        Path(out_dir).mkdir(parents=True, exist_ok=True)
+        urls = iter(urls)
+        results, pending = [], set()
+        successes = 0
+        budget = None if limit is None else {'left': limit}
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='download') as pool:
+            while True:
+                in_flight = self.workers * 2 if limit is None else min(self.workers * 2, 2 * (limit - successes))
+                while len(pending) < in_flight:
+                    url = next(urls, None)
+                    if url is None:
+                        break
+                    pending.add(pool.submit(self.fetch, url, out_dir, name_fn, budget))
+                if not pending:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.cancelled():
+                        continue
+                    result = future.result()
+                    if result['status'] == 'ok':
+                        successes += 1
+                    results.append(result)
+                    if on_result is not None:
+                        on_result(result)
+
+                if limit is not None and successes >= limit:
+                    for future in pending:
+                        future.cancel()
+        return results
+
+
+def summarize(results):
+    """Counts per status plus total bytes, for log lines"""
+    counts = {}
+    for r in results:
+        counts[r['status']] = counts.get(r['status'], 0) + 1
+    counts['bytes'] = sum(r['bytes'] for r in results if r['status'] == 'ok')
+    return counts
+
+
+def selftest(num_images=60, workers=8):
+    """
+    Run the engine against a local stand-in image server.
+
+    Serves noise images on 127.0.0.1, including slow responses, a URL that
+    fails with 503 once before succeeding, 404s, HTML pages, thumbnails below
+    MIN_IMAGE_SIDE and random bytes sent as octet-stream, and prints what the
+    engine did with each. A second pass with `known_hash` set to the hashes
+    just saved must drop every image as a duplicate.
+    """
+    import io
+    import tempfile
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    import numpy as np
+    from PIL import Image
+
+    def encode(side, fmt):
+        noise = np.random.default_rng(side).integers(0, 256, (side, side, 3), dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(noise).save(buffer, fmt)
+        return buffer.getvalue()
+
+    bodies = {
+        'jpeg': ('image/jpeg', encode(MIN_IMAGE_SIDE + 32, 'JPEG')),
+        'png': ('image/png', encode(MIN_IMAGE_SIDE + 32, 'PNG')),
+        'thumb': ('image/jpeg', encode(MIN_IMAGE_SIDE // 2, 'JPEG')),
+        'html': ('text/html; charset=utf-8', b'<html><body>Not found</body></html>' * 200),
+        'garbage': ('application/octet-stream', os.urandom(20_000)),
+    }
+
+    seen = set()
+    seen_lock = threading.Lock()
+
+    class StandIn(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # Keep-alive, so connection pooling is exercised
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            kind, _, ident = self.path.strip('/').partition('/')
+            if kind == 'flaky':
+                with seen_lock:
+                    first = self.path not in seen
+                    seen.add(self.path)
+                if first:
+                    self.send_response(503)
+                    self.send_header('Retry-After', '0')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+            if kind == 'missing':
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            if kind == 'slow':
+                time.sleep(0.2)
+            if kind in bodies:
+                content_type, body = bodies[kind]
+            else:
+                content_type, body = bodies['png' if int(ident or 0) % 2 else 'jpeg']
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    kinds = ['ok', 'ok', 'slow', 'flaky', 'missing', 'html', 'ok', 'thumb', 'garbage']
+    urls = [f"{base}/{kinds[i % len(kinds)]}/{i}" for i in range(num_images)]
+
+    counter = iter(range(1, num_images + 1))
+    engine = DownloadEngine(workers=workers, rate=200, burst=20)
+
+    print("\n" + "="*60)
+    print("🧪 DOWNLOAD ENGINE SELF-TEST")
+    print("="*60)
+    with tempfile.TemporaryDirectory() as out_dir:
+        start = time.perf_counter()
+        results = engine.download_all(urls, lambda url, ct: f"img_{next(counter):04d}{extension_for(ct)}", out_dir)
+        elapsed = time.perf_counter() - start
+        on_disk = len(list(Path(out_dir).glob('img_*')))
+
+        saved = {r['hash'] for r in results if r['status'] == 'ok'}
+        again = DownloadEngine(workers=workers, rate=None, known_hash=saved.__contains__).download_all(
+            [r['url'] for r in results if r['status'] == 'ok'], lambda url, ct: f"dup_{uuid.uuid4().hex}", out_dir)
+        duplicates = summarize(again).get('duplicate', 0)
+        dup_on_disk = len(list(Path(out_dir).glob('dup_*')))
+    server.shutdown()
+
+    counts = summarize(results)
+    print(f"  URLs: {len(urls)} in {elapsed:.2f}s")
+    for status, count in sorted(counts.items()):
+        print(f"  {status:.<20} {count}")
+    print(f"  requests: {engine.stats['requests']} | retries: {engine.stats['retries']} | files on disk: {on_disk}")
+    print(f"  re-download of saved content: {duplicates} duplicates, {dup_on_disk} files kept")
+    print("="*60)
+    expected_ok = sum(k in ('ok', 'slow', 'flaky') for k in (kinds[i % len(kinds)] for i in range(num_images)))
+    return counts.get('ok', 0) == expected_ok == on_disk == duplicates and dup_on_disk == 0
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'selftest':
+        print("✅ Self-test passed" if selftest() else "❌ Self-test failed")
+    else:
+        print(__doc__)
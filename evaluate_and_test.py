@@ -1,17 +1,34 @@
 """
 🎯 WEDTECT YOLOv8 OBB - EVALUATION & TESTING
 Comprehensive analysis with prediction graphs, precision metrics, and inference testing
+
+Each step is a subcommand and imports only what it needs: `stats` reads
+results.csv through run_metrics (NumPy only), `curves`, `charts` and
+`report` add matplotlib through report_figures, and only `infer` pays for
+ultralytics/torch and OpenCV. The evaluated run is looked up in the run
+registry (SQLite, run_registry.py) the first time a step needs it, never at
+import, so other scripts (threshold_sweep.py, inference_server.py,
+show_evaluation_report.py) import the constants below without pulling in
+NumPy, SQLite or any of the above.
+
+Usage:
+    python evaluate_and_test.py                 # all steps, as before
+    python evaluate_and_test.py --run latest stats  # run name, best (default), latest, latest-completed
+    python evaluate_and_test.py stats           # final metrics from results.csv
+    python evaluate_and_test.py curves          # training curves figure
+    python evaluate_and_test.py infer [--batch-size 8] [--conf 0.3] [--tiled]
+    python evaluate_and_test.py charts [--tiled]  # prediction distribution charts
+    python evaluate_and_test.py report [--force] [--tiled]  # all figures, cached by input hash
+    python evaluate_and_test.py startup-bench   # time each subcommand's startup
 """
 
+import argparse
 import os
+import subprocess
 import sys
-import cv2
-import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
+import time
+from itertools import chain
 from pathlib import Path
-from ultralytics import YOLO
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -23,117 +40,118 @@ COLORS = {
     'leak': (255, 165, 0)      # Orange
 }
 
+# OpenCV draws in BGR order
+COLORS_BGR = {name: rgb[::-1] for name, rgb in COLORS.items()}
+
 CLASS_NAMES = {0: 'crack', 1: 'dent', 2: 'hole', 3: 'leak'}
 
+# Run evaluated (--run): a run directory name, or 'best' (highest mAP50-95
+# among completed runs), 'latest' or 'latest-completed' looked up in the run
+# registry on first use - never at import
+RUNS_DIR = Path("runs/obb")
+RUN_SELECTOR = 'best'
+DEFAULT_RUN_DIR = RUNS_DIR / "wedtect-obb-final4"  # When the registry has no matching run
+EVALUATION_DIR = Path("evaluation")
+THROUGHPUT_FILE = EVALUATION_DIR / "inference_throughput.json"
+
+# Inference settings
+CONF_THRESHOLD = 0.3
+NMS_IOU = 0.7
+IMG_SIZE = 640
+INFERENCE_BATCH_SIZE = 8
+TILED_INFERENCE = False  # Slice high-resolution frames into 640px tiles (see tiled_inference.py)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Startup benchmark: subcommands timed and the wall-clock budget for `stats`
+BENCH_COMMANDS = ('stats', 'curves', 'charts')
+BENCH_REPEATS = 5
+STATS_STARTUP_BUDGET = 1.0  # seconds
+HEAVY_MODULES = ('torch', 'ultralytics', 'cv2', 'pandas', 'matplotlib')
+
+_run_selector = RUN_SELECTOR
+_run_dir = None
+
 def log_msg(msg, level="ℹ️"):
     """Print formatted log message"""
     print(f"\n[{level}] {msg}")
 
-def generate_training_curves():
+def select_run(selector):
+    """Choose the run the steps below evaluate (resolved on first use)"""
+    global _run_selector, _run_dir
+    _run_selector, _run_dir = selector, None
+
+def get_run_dir():
+    """Directory of the selected run; symbolic selectors are looked up in the run registry"""
+    global _run_dir
+    if _run_dir is None:
+        from run_registry import SELECTORS, resolve_run
+        
+        if _run_selector not in SELECTORS:
+            _run_dir = RUNS_DIR / _run_selector
+        else:
+            _run_dir = resolve_run(_run_selector, RUNS_DIR)
+            if _run_dir is None:
+                log_msg(f"No '{_run_selector}' run in the run registry, using {DEFAULT_RUN_DIR} "
+                        f"(python run_registry.py indexes {RUNS_DIR})", "⚠️")
+                _run_dir = DEFAULT_RUN_DIR
+    return _run_dir
+
+def get_model_path():
+    return get_run_dir() / "weights" / "best.pt"
+
+def get_results_file():
+    return get_run_dir() / "results.csv"
+
+def inference_tiling(tiled):
+    """Inference mode for the prediction cache key: None (full frame) or (tile size, overlap)"""
+    if not tiled:
+        return None
+    from tiled_inference import TILE_OVERLAP, TILE_SIZE
+    return (TILE_SIZE, TILE_OVERLAP)
+
+def generate_training_curves(results_file=None):
     """Generate comprehensive training metrics visualization"""
     log_msg("Generating Training Curves and Metrics Graphs...", "📊")
-    
-    results_file = Path("runs/obb/wedtect-obb-final4/results.csv")
+    results_file = results_file or get_results_file()
     
     if not results_file.exists():
         log_msg(f"Results file not found: {results_file}", "⚠️")
         return False
     
     try:
-        df = pd.read_csv(results_file)
-        
-        # Create comprehensive figure with multiple subplots
-        fig, axes = plt.subplots(3, 2, figsize=(15, 12))
-        fig.suptitle('YOLOv8 OBB Training Metrics - Wedtect Dataset', fontsize=16, fontweight='bold')
-        
-        # 1. Train vs Validation Loss
-        if 'train/loss' in df.columns and 'val/loss' in df.columns:
-            axes[0, 0].plot(df['train/loss'], label='Train Loss', linewidth=2)
-            axes[0, 0].plot(df['val/loss'], label='Val Loss', linewidth=2)
-            axes[0, 0].set_title('Training vs Validation Loss', fontweight='bold')
-            axes[0, 0].set_xlabel('Epoch')
-            axes[0, 0].set_ylabel('Loss')
-            axes[0, 0].legend()
-            axes[0, 0].grid(True, alpha=0.3)
-        
-        # 2. Box Loss, DFL Loss, Cls Loss
-        if 'train/box_loss' in df.columns:
-            axes[0, 1].plot(df['train/box_loss'], label='Box Loss', linewidth=2)
-            axes[0, 1].plot(df['train/dfl_loss'], label='DFL Loss', linewidth=2)
-            axes[0, 1].plot(df['train/cls_loss'], label='Class Loss', linewidth=2)
-            axes[0, 1].set_title('Component Losses Over Time', fontweight='bold')
-            axes[0, 1].set_xlabel('Epoch')
-            axes[0, 1].set_ylabel('Loss Value')
-            axes[0, 1].legend()
-            axes[0, 1].grid(True, alpha=0.3)
-        
-        # 3. Precision Curve
-        if 'metrics/precision(B)' in df.columns:
-            axes[1, 0].plot(df['metrics/precision(B)'], color='green', linewidth=2, marker='o', markersize=4)
-            axes[1, 0].set_title('Precision Over Epochs', fontweight='bold')
-            axes[1, 0].set_xlabel('Epoch')
-            axes[1, 0].set_ylabel('Precision')
-            axes[1, 0].set_ylim([0, 1])
-            axes[1, 0].grid(True, alpha=0.3)
-        
-        # 4. Recall Curve
-        if 'metrics/recall(B)' in df.columns:
-            axes[1, 1].plot(df['metrics/recall(B)'], color='blue', linewidth=2, marker='o', markersize=4)
-            axes[1, 1].set_title('Recall Over Epochs', fontweight='bold')
-            axes[1, 1].set_xlabel('Epoch')
-            axes[1, 1].set_ylabel('Recall')
-            axes[1, 1].set_ylim([0, 1])
-            axes[1, 1].grid(True, alpha=0.3)
-        
-        # 5. mAP50 Curve
-        if 'metrics/mAP50(B)' in df.columns:
-            axes[2, 0].plot(df['metrics/mAP50(B)'], color='red', linewidth=2, marker='s', markersize=4)
-            axes[2, 0].set_title('mAP@50 Over Epochs', fontweight='bold')
-            axes[2, 0].set_xlabel('Epoch')
-            axes[2, 0].set_ylabel('mAP@50')
-            axes[2, 0].set_ylim([0, 1])
-            axes[2, 0].grid(True, alpha=0.3)
-        
-        # 6. mAP50-95 Curve
-        if 'metrics/mAP50-95(B)' in df.columns:
-            axes[2, 1].plot(df['metrics/mAP50-95(B)'], color='purple', linewidth=2, marker='d', markersize=4)
-            axes[2, 1].set_title('mAP@50-95 Over Epochs', fontweight='bold')
-            axes[2, 1].set_xlabel('Epoch')
-            axes[2, 1].set_ylabel('mAP@50-95')
-            axes[2, 1].set_ylim([0, 1])
-            axes[2, 1].grid(True, alpha=0.3)
+        from report_figures import render_figures, training_curves_job
         
-        plt.tight_layout()
-        output_path = Path("evaluation/training_metrics_detailed.png")
-        output_path.parent.mkdir(exist_ok=True)
-        plt.savefig(output_path, dpi=300, bbox_inches='tight')
-        log_msg(f"✅ Training metrics graph saved: {output_path}", "✅")
-        plt.close()
-        
-        return True
+        status = render_figures([training_curves_job(results_file, EVALUATION_DIR)], EVALUATION_DIR)
+        return status['training_curves'] != 'missing input'
     except Exception as e:
         log_msg(f"Error generating training curves: {e}", "❌")
         return False
 
-def generate_summary_stats():
+def generate_summary_stats(results_file=None):
     """Display training summary statistics"""
     log_msg("Extracting Final Training Statistics...", "📈")
-    
-    results_file = Path("runs/obb/wedtect-obb-final4/results.csv")
+    results_file = results_file or get_results_file()
     
     try:
-        df = pd.read_csv(results_file)
+        # NumPy-only loader: importing pandas alone would take longer than this whole command
+        from run_metrics import load_run_metrics
         
-        last_row = df.iloc[-1]
+        metrics = load_run_metrics(results_file)
+        if not len(metrics):
+            raise ValueError(f"No epochs in {results_file}")
+        last, best = -1, metrics.best_index
         
         stats = {
-            'Total Epochs': len(df),
-            'Final Train Loss': float(last_row.get('train/loss', 0)),
-            'Final Val Loss': float(last_row.get('val/loss', 0)),
-            'Final Precision': float(last_row.get('metrics/precision(B)', 0)),
-            'Final Recall': float(last_row.get('metrics/recall(B)', 0)),
-            'Final mAP@50': float(last_row.get('metrics/mAP50(B)', 0)),
-            'Final mAP@50-95': float(last_row.get('metrics/mAP50-95(B)', 0)),
+            'Total Epochs': len(metrics),
+            'Final Train Loss': float(metrics.train_loss[last]),
+            'Final Val Loss': float(metrics.val_loss[last]),
+            'Final Precision': float(metrics.precision[last]),
+            'Final Recall': float(metrics.recall[last]),
+            'Final mAP@50': float(metrics.map50[last]),
+            'Final mAP@50-95': float(metrics.map50_95[last]),
+            'Best Epoch': metrics.best_epoch,
+            'Best mAP@50': float(metrics.map50[best]),
+            'Best mAP@50-95': float(metrics.map50_95[best]),
         }
         
         print("\n" + "="*60)
@@ -151,21 +169,117 @@ def generate_summary_stats():
         log_msg(f"Error extracting stats: {e}", "❌")
         return {}
 
-def run_inference_on_test_set():
-    """Run inference on test images and generate visualization"""
-    log_msg("Running Inference on Test Set...", "🔍")
+def iter_image_batches(image_dir, batch_size=INFERENCE_BATCH_SIZE, keep=None):
+    """Lazily walk image_dir and yield lists of at most batch_size image paths accepted by keep"""
+    batch = []
+    for img_path in image_dir.rglob('*'):
+        if img_path.suffix.lower() not in IMAGE_EXTENSIONS:
+            continue
+        if keep is not None and not keep(img_path):
+            continue
+        batch.append(img_path)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def draw_predictions(img_path, img, xywhr, confs, classes, output_dir):
+    """Draw OBBs onto a BGR image and save it"""
+    import cv2
+    from obb_rendering import draw_obbs
+    
+    draw_obbs(img, xywhr, confs, classes, CLASS_NAMES, COLORS_BGR)
     
-    # Find the best model
-    model_path = Path("runs/obb/wedtect-obb-final4/weights/best.pt")
+    # Save annotated image
+    output_path = output_dir / f"pred_{img_path.stem}.jpg"
+    cv2.imwrite(str(output_path), img)
+
+def evaluate_predictions(predictions, test_dir, output_dir):
+    """Score predictions against the test label polygons and save the metrics"""
+    from obb_metrics import evaluate, load_ground_truth, print_evaluation, save_evaluation
+    
+    labels_dir = test_dir.parent / "labels"
+    if not labels_dir.exists():
+        log_msg(f"Labels directory not found: {labels_dir}", "⚠️")
+        return None
+    
+    # Images with no detections still count their ground truth as misses
+    stems = {p.stem for p in test_dir.rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS}
+    ground_truth = load_ground_truth(labels_dir, stems)
+    
+    metrics = evaluate(predictions, ground_truth, CLASS_NAMES)
+    print_evaluation(metrics)
+    save_evaluation(metrics, CLASS_NAMES, output_dir)
+    log_msg(f"Accuracy metrics saved to: {output_dir}", "✅")
+    return metrics
+
+def print_throughput_stats(batch_latencies, images_done, elapsed, batch_size):
+    """Print images/sec and per-batch latency percentiles"""
+    import numpy as np
+    
+    latencies_ms = np.array(batch_latencies) * 1000
+    
+    print("\n" + "="*60)
+    print("⚡ INFERENCE THROUGHPUT")
+    print("="*60)
+    print(f"  Images Processed: {images_done}")
+    print(f"  Batches: {len(latencies_ms)} (batch size {batch_size})")
+    print(f"  Throughput: {images_done / max(elapsed, 1e-9):.2f} images/sec")
+    print(f"  Batch Latency p50: {np.percentile(latencies_ms, 50):.1f} ms")
+    print(f"  Batch Latency p95: {np.percentile(latencies_ms, 95):.1f} ms")
+    print("="*60)
+
+def save_throughput_stats(batch_latencies, images_done, elapsed, batch_size, stage_timings, run_info,
+                          path=THROUGHPUT_FILE):
+    """
+    Persist the throughput of an inference run for show_evaluation_report.py.
+    
+    Only runs that actually inferred images write the file, so a run served
+    entirely from the prediction cache keeps the last real measurement.
+    """
+    import json
+    from datetime import datetime
+    import numpy as np
+    
+    latencies_ms = np.array(batch_latencies) * 1000
+    stats = {
+        'measured_at': datetime.now().isoformat(timespec='seconds'),
+        **run_info,
+        'images': images_done,
+        'batches': len(latencies_ms),
+        'batch_size': batch_size,
+        'elapsed_s': round(elapsed, 3),
+        'images_per_sec': round(images_done / max(elapsed, 1e-9), 2),
+        'batch_latency_p50_ms': round(float(np.percentile(latencies_ms, 50)), 1),
+        'batch_latency_p95_ms': round(float(np.percentile(latencies_ms, 95)), 1),
+        'stages': {stage: {'total_s': round(sum(samples), 3), 'mean_ms': round(sum(samples) / len(samples) * 1000, 1),
+                           'count': len(samples)}
+                   for stage, samples in stage_timings.items() if samples},
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(stats, f, indent=2)
+    os.replace(tmp, path)
+    return stats
+
+def run_inference_on_test_set(batch_size=INFERENCE_BATCH_SIZE, conf=CONF_THRESHOLD, tiled=TILED_INFERENCE):
+    """Run batched, streaming inference on new or changed test images and generate visualization"""
+    log_msg("Running Inference on Test Set...", "🔍")
+    model_path = get_model_path()
     
     if not model_path.exists():
         log_msg(f"Model not found: {model_path}", "❌")
         return False
     
     try:
-        # Load model
-        model = YOLO(str(model_path))
-        log_msg(f"Model loaded: {model_path}", "✅")
+        import pandas as pd
+        from ultralytics import YOLO
+        from inference_pipeline import run_pipeline, print_stage_timings
+        from obb_rendering import obb_to_numpy
+        from prediction_cache import PredictionCache, file_digest
+        from tiled_inference import TiledPredictor
         
         # Find test images
         test_dir = Path("dataset/test/images")
@@ -173,78 +287,83 @@ def run_inference_on_test_set():
             log_msg(f"Test directory not found: {test_dir}", "⚠️")
             return False
         
-        test_images = list(test_dir.glob("*.jpg")) + list(test_dir.glob("*.png"))
+        # Predictions already made by these weights at these settings are reused;
+        # only images whose content hash is unknown go through the model
+        cache = PredictionCache.open(model_path, conf, IMG_SIZE, NMS_IOU, inference_tiling(tiled))
+        log_msg(f"Prediction cache: {cache.path} ({len(cache)} images)", "💾")
         
-        if not test_images:
-            log_msg("No test images found", "⚠️")
-            return False
+        image_hashes = {}
         
-        log_msg(f"Found {len(test_images)} test images", "ℹ️")
+        def needs_inference(img_path):
+            image_hashes[img_path] = file_digest(img_path)
+            return image_hashes[img_path] not in cache
         
-        # Run predictions on all test images
         output_dir = Path("evaluation/test_predictions")
         output_dir.mkdir(parents=True, exist_ok=True)
         
-        all_predictions = []
+        def cache_and_draw(img_path, img, result):
+            xywhr, confs, classes = obb_to_numpy(result.obb)
+            cache.put(image_hashes[img_path], img.shape, xywhr, confs, classes)
+            # The cache may hold a lower threshold than requested; draw only what was asked for
+            keep = confs >= conf
+            draw_predictions(img_path, img, xywhr[keep], confs[keep], classes[keep], output_dir)
+            return []
         
-        for idx, img_path in enumerate(test_images[:20], 1):  # First 20 for visualization
-            print(f"  Processing: {idx}/{min(20, len(test_images))} - {img_path.name}", end='\r')
-            
-            results = model.predict(str(img_path), conf=0.3, verbose=False)
-            
-            # Draw predictions
-            img = cv2.imread(str(img_path))
-            img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            
-            for result in results:
-                if result.obb is not None:
-                    boxes = result.obb.cpu() if hasattr(result.obb, 'cpu') else result.obb
-                    for i, box in enumerate(boxes.data):
-                        # OBB format: [x, y, w, h, angle, conf, cls] or similar
-                        # Let's check the structure first
-                        box_data = box.cpu().numpy() if hasattr(box, 'cpu') else np.array(box)
-                        
-                        if len(box_data) >= 7:
-                            # Standard OBB: x, y, width, height, angle, conf, cls
-                            x, y, w, h, angle, conf, cls = box_data[:7]
-                            class_name = CLASS_NAMES.get(int(cls), 'unknown')
-                            color = COLORS.get(class_name, (255, 255, 255))
-                            
-                            # Draw rotated rectangle
-                            center = (int(x), int(y))
-                            size = (int(w), int(h))
-                            angle_deg = float(angle)
-                            
-                            # Get rotated box corners
-                            rect = cv2.RotatedRect(center, size, angle_deg)
-                            pts = cv2.boxPoints(rect)
-                            pts = np.int32(pts)
-                            
-                            cv2.polylines(img_rgb, [pts], True, color, 2)
-                            
-                            # Draw label
-                            centroid = (int(x), int(y))
-                            cv2.putText(img_rgb, f"{class_name} {conf:.2f}", 
-                                       centroid, cv2.FONT_HERSHEY_SIMPLEX, 
-                                       0.5, color, 2)
-                            
-                            all_predictions.append({
-                                'image': img_path.name,
-                                'class': class_name,
-                                'confidence': float(conf)
-                            })
+        # Peek first so the model is only loaded when something actually needs it
+        batches = iter_image_batches(test_dir, batch_size, keep=needs_inference)
+        first_batch = next(batches, None)
+        
+        batch_latencies, stage_timings = [], {}
+        start = time.perf_counter()
+        if first_batch is not None:
+            # Load model
+            if tiled:
+                model = TiledPredictor(lambda: YOLO(str(model_path)))
+                log_msg(f"Model loaded for tiled inference: {model_path}", "✅")
+            else:
+                model = YOLO(str(model_path))
+                log_msg(f"Model loaded: {model_path}", "✅")
             
-            # Save annotated image
-            output_path = output_dir / f"pred_{img_path.stem}.jpg"
-            img_bgr = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2BGR)
-            cv2.imwrite(str(output_path), img_bgr)
+            # Readers decode ahead, the model runs here, writers annotate and encode.
+            # Bounded queues keep only a few batches alive at once, so memory stays
+            # flat no matter how many frames are in the tree
+            start = time.perf_counter()
+            _, batch_latencies, stage_timings = run_pipeline(
+                model,
+                chain([first_batch], batches),
+                cache_and_draw,
+                cache.conf,
+                imgsz=IMG_SIZE,
+                iou=NMS_IOU,
+            )
+        elapsed = time.perf_counter() - start
+        # Names point at predictions by content, so renamed or identical images keep their own entry
+        cache.set_names({img_path.name: h for img_path, h in image_hashes.items()})
+        cache.save()
+        images_done = len(stage_timings.get('write', []))
+        
+        if not image_hashes:
+            log_msg("No test images found", "⚠️")
+            return False
         
         print()
+        log_msg(f"{images_done} new images inferred, {len(image_hashes) - images_done} served from cache", "✅")
         log_msg(f"Test predictions saved to: {output_dir}", "✅")
+        if images_done:
+            print_throughput_stats(batch_latencies, images_done, elapsed, batch_size)
+            print_stage_timings(stage_timings)
+            save_throughput_stats(batch_latencies, images_done, elapsed, batch_size, stage_timings, {
+                'weights': str(model_path), 'weights_hash': cache.weights_hash, 'imgsz': IMG_SIZE,
+                'conf': cache.conf, 'nms_iou': NMS_IOU, 'tiled': bool(tiled),
+            })
+        
+        current = [img_path.name for img_path in image_hashes]
+        evaluate_predictions(cache.to_predictions(current, min_conf=conf), test_dir, output_dir.parent)
         
         # Create prediction statistics
-        if all_predictions:
-            pred_df = pd.DataFrame(all_predictions)
+        rows = cache.to_rows(current, min_conf=conf, class_names=CLASS_NAMES)
+        if rows:
+            pred_df = pd.DataFrame(rows)
             pred_df.to_csv(output_dir / "predictions_summary.csv", index=False)
             
             print("\n" + "="*60)
@@ -265,75 +384,75 @@ def run_inference_on_test_set():
         traceback.print_exc()
         return False
 
-def create_prediction_distribution_chart():
+def create_prediction_distribution_chart(tiled=TILED_INFERENCE):
     """Create charts showing class distribution in predictions"""
     log_msg("Creating Prediction Distribution Charts...", "📊")
+    model_path = get_model_path()
     
-    pred_file = Path("evaluation/test_predictions/predictions_summary.csv")
-    
-    if not pred_file.exists():
-        log_msg("Predictions file not found", "⚠️")
+    if not model_path.exists():
+        log_msg(f"Model not found: {model_path}", "⚠️")
         return False
     
     try:
-        pred_df = pd.read_csv(pred_file)
-        
-        fig, axes = plt.subplots(1, 2, figsize=(14, 5))
-        fig.suptitle('Test Set Prediction Analysis', fontsize=14, fontweight='bold')
+        from prediction_cache import PredictionCache
+        from report_figures import prediction_analysis_job, render_figures
         
-        # Class distribution
-        class_counts = pred_df['class'].value_counts()
-        colors_list = [COLORS.get(cls_name, (100, 100, 100)) for cls_name in class_counts.index]
-        colors_list = [(r/255, g/255, b/255) for r, g, b in colors_list]
-        
-        axes[0].bar(class_counts.index, class_counts.values, color=colors_list, alpha=0.7, edgecolor='black', linewidth=2)
-        axes[0].set_title('Detections by Class', fontweight='bold')
-        axes[0].set_xlabel('Class')
-        axes[0].set_ylabel('Number of Detections')
-        axes[0].grid(axis='y', alpha=0.3)
-        
-        # Confidence distribution
-        for cls_name in pred_df['class'].unique():
-            confidences = pred_df[pred_df['class'] == cls_name]['confidence']
-            color = COLORS.get(cls_name, (100, 100, 100))
-            color_rgb = tuple(c/255 for c in color)
-            axes[1].hist(confidences, alpha=0.5, label=cls_name, bins=10, color=color_rgb, edgecolor='black')
-        
-        axes[1].set_title('Confidence Distribution', fontweight='bold')
-        axes[1].set_xlabel('Confidence Score')
-        axes[1].set_ylabel('Frequency')
-        axes[1].legend()
-        axes[1].grid(alpha=0.3)
-        
-        plt.tight_layout()
-        output_path = Path("evaluation/prediction_analysis.png")
-        output_path.parent.mkdir(exist_ok=True)
-        plt.savefig(output_path, dpi=300, bbox_inches='tight')
-        log_msg(f"Prediction analysis saved: {output_path}", "✅")
-        plt.close()
+        cache = PredictionCache.open(model_path, CONF_THRESHOLD, IMG_SIZE, NMS_IOU, inference_tiling(tiled))
+        if not len(cache):
+            log_msg("No cached predictions found - run inference first", "⚠️")
+            return False
         
+        job = prediction_analysis_job(cache.path, CONF_THRESHOLD, CLASS_NAMES, COLORS, EVALUATION_DIR)
+        render_figures([job], EVALUATION_DIR)
+        log_msg(f"Prediction analysis: {job['output']}", "✅")
         return True
     except Exception as e:
         log_msg(f"Error creating prediction charts: {e}", "❌")
         return False
 
-def main():
+def render_report(force=False, tiled=TILED_INFERENCE):
+    """Render every report figure whose inputs changed, in parallel worker processes"""
+    log_msg("Rendering Report Figures...", "🖼️")
+    model_path = get_model_path()
+    
+    from obb_metrics import CONFUSION_CONF, CONFUSION_IOU
+    from report_figures import evaluation_jobs, prediction_analysis_job, render_figures, training_curves_job
+    
+    jobs = [training_curves_job(get_results_file(), EVALUATION_DIR)]
+    if model_path.exists():
+        from prediction_cache import PredictionCache
+        
+        cache_path = PredictionCache.open(model_path, CONF_THRESHOLD, IMG_SIZE, NMS_IOU, inference_tiling(tiled)).path
+        jobs.append(prediction_analysis_job(cache_path, CONF_THRESHOLD, CLASS_NAMES, COLORS, EVALUATION_DIR))
+    jobs += evaluation_jobs(EVALUATION_DIR / "obb_metrics.json", CONFUSION_CONF, CONFUSION_IOU, EVALUATION_DIR)
+    
+    start = time.perf_counter()
+    status = render_figures(jobs, EVALUATION_DIR, force=force)
+    log_msg(f"{sum(v == 'rendered' for v in status.values())} rendered, "
+            f"{sum(v == 'cached' for v in status.values())} up to date "
+            f"({time.perf_counter() - start:.2f}s)", "✅")
+    return status
+
+def run_all():
     """Main evaluation pipeline"""
     print("\n" + "="*70)
     print("🚀 WEDTECT YOLOv8 OBB - COMPREHENSIVE EVALUATION & TESTING")
     print("="*70)
     
-    # Step 1: Generate training curves
-    generate_training_curves()
-    
-    # Step 2: Print summary statistics
+    # Step 1: Print summary statistics
     stats = generate_summary_stats()
     
-    # Step 3: Run inference on test set
+    # Step 2: Run inference on test set
     run_inference_on_test_set()
     
-    # Step 4: Create prediction charts
-    create_prediction_distribution_chart()
+    # Step 3: Training curves and prediction charts, rendered in parallel and
+    # skipped when their inputs did not change since the last run
+    render_report()
+    
+    # Step 4: Text/JSON/HTML summary, rebuilt only when one of its inputs changed
+    from show_evaluation_report import generate_report
+    _, regenerated = generate_report(run_dir=get_run_dir())  # The report module has its own run selection
+    log_msg(f"Evaluation report {'regenerated' if regenerated else 'up to date'}", "📝")
     
     print("\n" + "="*70)
     print("✅ EVALUATION COMPLETE!")
@@ -342,7 +461,104 @@ def main():
     print("  📊 evaluation/training_metrics_detailed.png - Training curves")
     print("  🎯 evaluation/test_predictions/ - Test predictions with visualizations")
     print("  📈 evaluation/prediction_analysis.png - Prediction statistics")
+    print("  🎯 evaluation/obb_metrics.json - mAP, per-class AP, PR curves, confusion matrix")
+    print("  📉 evaluation/pr_curves.png, evaluation/confusion_matrix.png")
+    print("  📝 evaluation/evaluation_report.txt/.json/.html - Summary report")
     print("\n" + "="*70 + "\n")
 
+def _heavy_imports(command):
+    """Top-level packages from HEAVY_MODULES a subcommand imports, via -X importtime"""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', __file__, command],
+                          capture_output=True, text=True)
+    loaded = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        if name in HEAVY_MODULES and cumulative.isdigit():
+            loaded[name] = int(cumulative) / 1e6
+    return loaded
+
+def benchmark_startup(commands=BENCH_COMMANDS, repeats=BENCH_REPEATS):
+    """
+    Time each subcommand end to end in a fresh interpreter.
+    
+    Args:
+        commands: Subcommands to run
+        repeats: Runs per subcommand (the median is reported)
+    
+    Returns:
+        Dictionary of command -> median wall-clock seconds
+    """
+    print("\n" + "="*70)
+    print("⏱️  STARTUP BENCHMARK")
+    print("="*70)
+    
+    medians = {}
+    for command in commands:
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, __file__, command], capture_output=True)
+            times.append(time.perf_counter() - start)
+        medians[command] = sorted(times)[len(times) // 2]
+        heavy = _heavy_imports(command)
+        imported = ", ".join(f"{name} {secs:.2f}s" for name, secs in sorted(heavy.items())) or "none"
+        print(f"  {command:.<20} {medians[command]:.3f}s median of {repeats} | heavy imports: {imported}")
+    
+    if 'stats' in medians:
+        ok = medians['stats'] < STATS_STARTUP_BUDGET
+        print(f"\n  {'✅' if ok else '❌'} stats: {medians['stats']:.3f}s (budget {STATS_STARTUP_BUDGET:.1f}s)")
+    print("="*70)
+    return medians
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Wedtect YOLOv8 OBB evaluation & testing")
+    parser.add_argument('--run', default=RUN_SELECTOR,
+                        help="Run directory name, or best / latest / latest-completed from the run registry")
+    sub = parser.add_subparsers(dest='command')
+    
+    curves = sub.add_parser('curves', help="Training curves from results.csv")
+    curves.add_argument('--results', type=Path, default=None, help="Default: the selected run's results.csv")
+    
+    stats = sub.add_parser('stats', help="Final training statistics from results.csv")
+    stats.add_argument('--results', type=Path, default=None, help="Default: the selected run's results.csv")
+    
+    infer = sub.add_parser('infer', help="Inference and OBB metrics on the test set")
+    infer.add_argument('--batch-size', type=int, default=INFERENCE_BATCH_SIZE)
+    infer.add_argument('--conf', type=float, default=CONF_THRESHOLD)
+    infer.add_argument('--tiled', action='store_true', default=TILED_INFERENCE)
+    
+    charts = sub.add_parser('charts', help="Prediction distribution charts from cached predictions")
+    charts.add_argument('--tiled', action='store_true', default=TILED_INFERENCE,
+                        help="Use the predictions of tiled inference")
+    
+    report = sub.add_parser('report', help="Render all report figures (parallel, skips unchanged inputs)")
+    report.add_argument('--force', action='store_true', help="Re-render even if inputs are unchanged")
+    report.add_argument('--tiled', action='store_true', default=TILED_INFERENCE,
+                        help="Use the predictions of tiled inference")
+    
+    bench = sub.add_parser('startup-bench', help="Time subcommand startup in fresh interpreters")
+    bench.add_argument('--repeats', type=int, default=BENCH_REPEATS)
+    bench.add_argument('commands', nargs='*', default=list(BENCH_COMMANDS))
+    
+    args = parser.parse_args(argv)
+    select_run(args.run)
+    
+    if args.command is None:
+        run_all()
+    elif args.command == 'curves':
+        generate_training_curves(args.results)
+    elif args.command == 'stats':
+        generate_summary_stats(args.results)
+    elif args.command == 'infer':
+        run_inference_on_test_set(args.batch_size, args.conf, args.tiled)
+    elif args.command == 'charts':
+        create_prediction_distribution_chart(args.tiled)
+    elif args.command == 'report':
+        render_report(args.force, args.tiled)
+    elif args.command == 'startup-bench':
+        benchmark_startup(args.commands, args.repeats)
+
 if __name__ == "__main__":
     main()
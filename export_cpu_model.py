@@ -0,0 +1,304 @@
+"""
+CPU Model Export & Backend Selection
+====================================
+Exports the trained OBB model to ONNX (and optionally OpenVINO IR) for the
+GPU-less inspection nodes, checks each exported backend's detections against
+the PyTorch model, and times the ones that pass. The fastest is recorded in
+<run>/weights/cpu_backend.json and loaded by load_fastest_model.
+
+Usage:
+    python export_cpu_model.py
+"""
+
+import importlib.util
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+from ultralytics import YOLO
+
+from obb_metrics import sparse_pairwise_iou
+from obb_rendering import obb_to_numpy, xywhr_to_corners
+from run_registry import resolve_weights
+
+# Configuration
+RUNS_DIR = Path("runs/obb")
+TEST_IMAGES_DIR = Path("dataset/test/images")
+IMG_SIZE = 640
+EXPORT_FORMATS = ('onnx', 'openvino')
+DYNAMIC_BATCH = True    # False bakes a fixed batch size into the graph
+FIXED_BATCH = 1         # Only used when DYNAMIC_BATCH is False
+
+# Preference order when no benchmark has been recorded. Each backend needs its
+# runtime installed and its artifact on disk.
+BACKENDS = [
+    # (name, runtime module, artifact path relative to best.pt)
+    ('openvino', 'openvino', lambda w: w.parent / f"{w.stem}_openvino_model"),
+    ('onnxruntime', 'onnxruntime', lambda w: w.with_suffix('.onnx')),
+    ('pytorch', 'torch', lambda w: w),
+]
+
+# Parity thresholds against the PyTorch model
+PARITY_CONF = 0.3
+PARITY_CONF_MARGIN = 0.05   # Both backends predict this far below PARITY_CONF, so a box near the
+                            # threshold in one backend still finds its partner in the other
+PARITY_MAX_IMAGES = 50
+PARITY_MIN_IOU = 0.95       # Rotated IoU of every matched pair (catches w/h or angle decoding bugs)
+PARITY_CENTER_TOL_PX = 2.0
+PARITY_CONF_TOL = 0.02
+SELECTION_FILE = "cpu_backend.json"   # Benchmark result, next to best.pt
+
+
+def find_best_weights(runs_dir=RUNS_DIR):
+    """
+    Return best.pt of the best run in the run registry (highest mAP50-95,
+    completed runs first), else the most recently written runs/obb/*/weights/best.pt,
+    or None
+    """
+    weights = resolve_weights('best', runs_dir)
+    if weights is not None:
+        return weights
+    candidates = list(Path(runs_dir).glob("*/weights/best.pt"))
+    if not candidates:
+        return None
+    return max(candidates, key=lambda p: p.stat().st_mtime)
+
+
+def export_cpu_artifacts(weights, formats=EXPORT_FORMATS, imgsz=IMG_SIZE,
+                         dynamic=DYNAMIC_BATCH, batch=FIXED_BATCH):
+    """
+    Export best.pt to CPU inference formats next to the weights file.
+
+    Args:
+        weights: Path to best.pt
+        formats: Ultralytics export formats ('onnx', 'openvino')
+        imgsz: Export image size (must match training)
+        dynamic: Export with a dynamic batch axis
+        batch: Fixed batch size used when dynamic is False
+
+    Returns:
+        Dictionary of format -> exported artifact path
+    """
+    model = YOLO(str(weights))
+    artifacts = {}
+
+    for fmt in formats:
+        if fmt == 'openvino' and importlib.util.find_spec('openvino') is None:
+            print(f"  ⚠️  Skipping {fmt}: openvino is not installed")
+            continue
+        try:
+            path = model.export(format=fmt, imgsz=imgsz, dynamic=dynamic,
+                                batch=1 if dynamic else batch, half=False)
+            artifacts[fmt] = Path(path)
+            print(f"  ✓ {fmt}: {path}")
+        except Exception as e:
+            print(f"  ❌ {fmt} export failed: {e}")
+
+    return artifacts
+
+
+def available_backends(weights):
+    """List (name, artifact) pairs usable on this machine, fastest first"""
+    weights = Path(weights)
+    usable = []
+    for name, module, artifact_for in BACKENDS:
+        artifact = artifact_for(weights)
+        if importlib.util.find_spec(module) is not None and artifact.exists():
+            usable.append((name, artifact))
+    return usable
+
+
+def select_backend(weights, image_dir=TEST_IMAGES_DIR):
+    """
+    Parity-check every exported backend against PyTorch, time the ones that
+    pass and record the fastest in <weights dir>/cpu_backend.json.
+
+    Args:
+        weights: Path to best.pt
+        image_dir: Images used for parity and timing
+
+    Returns:
+        Name of the fastest backend that passed parity ('pytorch' if none did)
+    """
+    weights = Path(weights)
+    reference = YOLO(str(weights))
+    latency_ms, parity = {}, {}
+    for name, artifact in available_backends(weights):
+        if name == 'pytorch':
+            continue
+        stats = check_parity(reference, YOLO(str(artifact), task='obb'), image_dir)
+        print_parity_report(name, stats)
+        parity[name] = stats
+        # PyTorch is timed alongside every candidate; keep its best median
+        latency_ms['pytorch'] = min(latency_ms.get('pytorch', float('inf')), stats['reference_ms'])
+        if stats['passed']:
+            latency_ms[name] = stats['candidate_ms']
+
+    fastest = min(latency_ms, key=latency_ms.get) if latency_ms else 'pytorch'
+    with open(weights.parent / SELECTION_FILE, 'w') as f:
+        json.dump({'backend': fastest, 'latency_ms': latency_ms, 'parity': parity}, f, indent=2)
+    return fastest
+
+
+def selected_backend(weights):
+    """
+    The (name, artifact) to serve: the backend recorded by select_backend if it
+    is still usable, otherwise the first available one in BACKENDS order.
+    """
+    backends = available_backends(weights)
+    if not backends:
+        raise FileNotFoundError(f"No usable model artifact found for {weights}")
+
+    selection_path = Path(weights).parent / SELECTION_FILE
+    if selection_path.exists():
+        with open(selection_path) as f:
+            chosen = json.load(f)['backend']
+        for name, artifact in backends:
+            # An artifact re-exported after the benchmark has not been parity-checked
+            if name == chosen and artifact.stat().st_mtime <= selection_path.stat().st_mtime:
+                return name, artifact
+    return backends[0]
+
+
+def load_fastest_model(weights):
+    """
+    Load the backend that select_backend measured fastest (falls back to the
+    BACKENDS preference order if no benchmark was recorded).
+
+    Args:
+        weights: Path to best.pt (exported artifacts are looked up next to it)
+
+    Returns:
+        Tuple (YOLO model, backend name)
+    """
+    name, artifact = selected_backend(weights)
+    return YOLO(str(artifact), task='obb'), name
+
+
+def _match_detections(ref, cand, min_conf=0.0):
+    """
+    Greedy one-to-one same-class matching by rotated IoU, highest IoU first,
+    so neighbouring objects are not cross-matched by a nearby centre.
+
+    Args:
+        ref, cand: (xywhr, conf, cls) arrays of the two backends
+        min_conf: Only pairs and unmatched boxes with a confidence at or above
+                  this count; lower boxes are only there to be matched against
+
+    Returns:
+        Tuple (list of (ref index, cand index, IoU), unmatched count)
+    """
+    ref_xywhr, ref_conf, ref_cls = ref
+    cand_xywhr, cand_conf, cand_cls = cand
+    if not len(ref_cls) or not len(cand_cls):
+        return [], int((ref_conf >= min_conf).sum() + (cand_conf >= min_conf).sum())
+
+    # One image: all boxes share image index 0
+    ri, ci, iou = sparse_pairwise_iou(xywhr_to_corners(ref_xywhr), np.zeros(len(ref_cls), np.int64),
+                                      xywhr_to_corners(cand_xywhr), np.zeros(len(cand_cls), np.int64))
+    same = ref_cls[ri] == cand_cls[ci]
+    ri, ci, iou = ri[same], ci[same], iou[same]
+
+    ref_used = np.zeros(len(ref_cls), bool)
+    cand_used = np.zeros(len(cand_cls), bool)
+    pairs = []
+    for k in np.argsort(-iou, kind='stable'):
+        i, j = ri[k], ci[k]
+        if ref_used[i] or cand_used[j]:
+            continue
+        ref_used[i] = cand_used[j] = True
+        if max(ref_conf[i], cand_conf[j]) >= min_conf:
+            pairs.append((int(i), int(j), float(iou[k])))
+
+    unmatched = int((~ref_used & (ref_conf >= min_conf)).sum() + (~cand_used & (cand_conf >= min_conf)).sum())
+    return pairs, unmatched
+
+
+def check_parity(reference, candidate, image_dir=TEST_IMAGES_DIR, conf=PARITY_CONF,
+                 max_images=PARITY_MAX_IMAGES):
+    """
+    Compare a candidate backend's OBBs and latency against the PyTorch model.
+
+    Args:
+        reference: PyTorch YOLO model
+        candidate: Exported YOLO model
+        image_dir: Images to compare on
+        conf: Confidence threshold compared at (both models predict down to
+              conf - PARITY_CONF_MARGIN so borderline boxes can still be matched)
+        max_images: Number of images to compare
+
+    Returns:
+        Dictionary with match statistics, latencies and a 'passed' flag
+    """
+    images = sorted(p for p in Path(image_dir).glob('*') if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+    images = images[:max_images]
+
+    stats = {
+        'images': len(images), 'matched': 0, 'unmatched': 0,
+        'min_iou': 1.0, 'max_center_px': 0.0, 'max_conf_delta': 0.0,
+        'reference_ms': [], 'candidate_ms': [],
+    }
+
+    for img_path in images:
+        outputs = []
+        for model, key in ((reference, 'reference_ms'), (candidate, 'candidate_ms')):
+            start = time.perf_counter()
+            result = model.predict(str(img_path), conf=conf - PARITY_CONF_MARGIN, imgsz=IMG_SIZE,
+                                   verbose=False)[0]
+            stats[key].append((time.perf_counter() - start) * 1000)
+            outputs.append(obb_to_numpy(result.obb))
+
+        pairs, unmatched = _match_detections(*outputs, min_conf=conf)
+        stats['matched'] += len(pairs)
+        stats['unmatched'] += unmatched
+        for i, j, iou in pairs:
+            stats['min_iou'] = min(stats['min_iou'], iou)
+            stats['max_center_px'] = max(stats['max_center_px'],
+                                         float(np.linalg.norm(outputs[0][0][i, :2] - outputs[1][0][j, :2])))
+            stats['max_conf_delta'] = max(stats['max_conf_delta'],
+                                          abs(float(outputs[0][1][i] - outputs[1][1][j])))
+
+    # First call of each backend includes warm-up, so report the median
+    stats['reference_ms'] = float(np.median(stats['reference_ms'])) if images else 0.0
+    stats['candidate_ms'] = float(np.median(stats['candidate_ms'])) if images else 0.0
+    stats['speedup'] = stats['reference_ms'] / max(stats['candidate_ms'], 1e-9)
+    stats['passed'] = (stats['unmatched'] == 0
+                       and stats['min_iou'] >= PARITY_MIN_IOU
+                       and stats['max_center_px'] <= PARITY_CENTER_TOL_PX
+                       and stats['max_conf_delta'] <= PARITY_CONF_TOL)
+    return stats
+
+
+def print_parity_report(backend, stats):
+    """Print the parity check results"""
+    print("\n" + "="*60)
+    print(f"🔬 PARITY CHECK: {backend} vs pytorch")
+    print("="*60)
+    print(f"  Images Compared: {stats['images']}")
+    print(f"  Matched Boxes: {stats['matched']}")
+    print(f"  Unmatched Boxes: {stats['unmatched']}")
+    print(f"  Min Rotated IoU: {stats['min_iou']:.4f} (min {PARITY_MIN_IOU})")
+    print(f"  Max Centre Shift: {stats['max_center_px']:.2f} px (tol {PARITY_CENTER_TOL_PX})")
+    print(f"  Max Conf Delta: {stats['max_conf_delta']:.4f} (tol {PARITY_CONF_TOL})")
+    print(f"  Median Latency: {stats['reference_ms']:.1f} ms -> {stats['candidate_ms']:.1f} ms "
+          f"({stats['speedup']:.1f}x)")
+    print(f"  Result: {'✅ PASS' if stats['passed'] else '❌ FAIL'}")
+    print("="*60)
+
+
+if __name__ == '__main__':
+    weights = find_best_weights()
+    if weights is None:
+        print(f"❌ No best.pt found under {RUNS_DIR}")
+    else:
+        print(f"📦 Exporting {weights}")
+        export_cpu_artifacts(weights)
+
+        if TEST_IMAGES_DIR.exists():
+            backend = select_backend(weights)
+            print(f"\n⚡ Fastest backend that passed parity: {backend} "
+                  f"(saved to {Path(weights).parent / SELECTION_FILE})")
+        else:
+            print(f"\n⚠️  {TEST_IMAGES_DIR} not found: backends not benchmarked, "
+                  f"using {selected_backend(weights)[0]} by preference order")
@@ -0,0 +1,288 @@
+"""
+Near-Duplicate Image Filter
+===========================
+Finds resized / re-encoded copies among scraped images with perceptual
+hashes, so the same crack photo is not annotated five times.
+
+- pHash (DCT of a 32x32 grayscale thumbnail) finds candidates through a
+  BK-tree, so each lookup visits a small part of the collection instead of
+  comparing against every image
+- dHash (gradient of a 9x8 thumbnail) must also agree before two images
+  count as duplicates, which keeps false matches rare
+- images already in TRAINING_DATA are loaded into the tree first, so a
+  scraped copy of an image we already have is always flagged
+- hashes are computed in a process pool and cached per file (size + mtime)
+
+Within SCRAPED_IMAGES the largest copy of each image is kept; the others
+are moved to SCRAPED_IMAGES/_duplicates/<defect>/ (or deleted with --delete)
+and marked 'near_duplicate' in the scrape state store, so a resumed scrape
+refills the per-type targets.
+
+Usage:
+    python image_dedup.py                 # move duplicates aside
+    python image_dedup.py --report-only   # only write the report
+    python image_dedup.py OTHER_DIR       # deduplicate another directory
+"""
+
+import argparse
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from scrape_state import STATE_DB, ScrapeState
+
+# Dedup configuration
+SCRAPED_DIR = Path('SCRAPED_IMAGES')
+REFERENCE_DIRS = [Path('TRAINING_DATA')]
+DUPLICATES_DIR = '_duplicates'           # Inside the deduplicated directory
+HASH_CACHE = 'phash_cache.json'          # Inside the deduplicated directory
+REPORT_FILE = 'dedup_report.json'         # Inside the deduplicated directory
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.gif')
+PHASH_THRESHOLD = 10     # Max Hamming distance (of 64 bits) for a candidate
+DHASH_THRESHOLD = 12     # Max dHash distance to confirm it
+HASH_WORKERS = os.cpu_count() or 4
+
+_DCT_SIZE = 32
+
+
+def _dct_matrix(n=_DCT_SIZE):
+    """Orthonormal DCT-II matrix, so dct2(x) = D @ x @ D.T"""
+    k = np.arange(n)[:, None]
+    d = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    d[0] /= np.sqrt(2)
+    return d
+
+
+_DCT = _dct_matrix()
+
+
+def _bits_to_int(bits):
+    return int(''.join('1' if b else '0' for b in bits.ravel()), 2)
+
+
+def image_hashes(path):
+    """
+    Perceptual hashes of one image (runs in a worker process).
+
+    Returns:
+        Tuple (phash, dhash, width, height), or None if the file cannot be decoded
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            img.draft('L', (64, 64))  # JPEG: decode at reduced scale, much faster for big photos
+            gray = img.convert('L')
+            small = np.asarray(gray.resize((_DCT_SIZE, _DCT_SIZE), Image.LANCZOS), dtype=np.float64)
+            grad = np.asarray(gray.resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    except Exception:
+        return None
+
+    low = (_DCT @ small @ _DCT.T)[:8, :8].ravel()
+    phash = _bits_to_int(low > np.median(low[1:]))  # DC term excluded from the median
+    dhash = _bits_to_int(grad[:, 1:] > grad[:, :-1])
+    return phash, dhash, width, height
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over 64-bit hashes with Hamming distance.
+
+    The triangle inequality prunes every subtree whose edge distance is more
+    than `radius` away from the query's distance to the node.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value, item):
+        node = [value, item, {}]
+        self.size += 1
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            d = hamming(value, current[0])
+            child = current[2].get(d)
+            if child is None:
+                current[2][d] = node
+                return
+            current = child
+
+    def query(self, value, radius):
+        """Yield (distance, item) for every stored hash within radius"""
+        if self.root is None:
+            return
+        stack = [self.root]
+        while stack:
+            node_value, item, children = stack.pop()
+            d = hamming(value, node_value)
+            if d <= radius:
+                yield d, item
+            for edge, child in children.items():
+                if d - radius <= edge <= d + radius:
+                    stack.append(child)
+
+
+def _list_images(root):
+    duplicates_dir = Path(root) / DUPLICATES_DIR
+    return sorted(p for p in Path(root).rglob('*')
+                  if p.suffix.lower() in IMAGE_EXTENSIONS and duplicates_dir not in p.parents)
+
+
+def hash_files(paths, cache_path=SCRAPED_DIR / HASH_CACHE, workers=HASH_WORKERS):
+    """
+    Hashes for many files, reusing the per-file cache when size and mtime match.
+
+    Returns:
+        Dict of path -> (phash, dhash, width, height); undecodable files are left out
+    """
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+
+    hashes, todo = {}, []
+    for path in paths:
+        stat = path.stat()
+        key = str(path.resolve())
+        entry = cache.get(key)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            if entry['hashes'] is not None:
+                hashes[path] = tuple(entry['hashes'])
+        else:
+            todo.append((path, key, stat))
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for (path, key, stat), result in zip(todo, pool.map(image_hashes, [t[0] for t in todo],
+                                                                chunksize=16)):
+                cache[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                              'hashes': list(result) if result else None}
+                if result:
+                    hashes[path] = result
+
+    Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(cache_path).with_suffix('.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp, cache_path)
+    print(f"  Hashed {len(todo)} files ({len(paths) - len(todo)} from cache)")
+    return hashes
+
+
+def find_duplicates(scraped_dir=SCRAPED_DIR, reference_dirs=REFERENCE_DIRS,
+                    phash_threshold=PHASH_THRESHOLD, dhash_threshold=DHASH_THRESHOLD):
+    """
+    Match every scraped image against the reference set and earlier scraped images.
+
+    Returns:
+        List of dicts {'file', 'duplicate_of', 'phash_distance', 'dhash_distance', 'source'}
+        where source is 'reference' or 'scraped'
+    """
+    reference = [p for d in reference_dirs if d.exists() for p in _list_images(d)]
+    scraped = _list_images(scraped_dir)
+    hashes = hash_files(reference + scraped, Path(scraped_dir) / HASH_CACHE)
+
+    tree = BKTree()
+    for path in reference:
+        if path in hashes:
+            tree.add(hashes[path][0], (path, 'reference'))
+
+    # Biggest copy first, so the one kept is the best-quality version
+    scraped = sorted((p for p in scraped if p in hashes), key=lambda p: (-hashes[p][2] * hashes[p][3], str(p)))
+
+    duplicates = []
+    for path in scraped:
+        phash, dhash = hashes[path][:2]
+        best = None
+        for distance, (other, source) in tree.query(phash, phash_threshold):
+            d_distance = hamming(dhash, hashes[other][1])
+            if d_distance <= dhash_threshold and (best is None or distance < best[0]):
+                best = (distance, d_distance, other, source)
+        if best is None:
+            tree.add(phash, (path, 'scraped'))
+        else:
+            duplicates.append({'file': str(path), 'duplicate_of': str(best[2]), 'phash_distance': best[0],
+                               'dhash_distance': best[1], 'source': best[3]})
+    return duplicates
+
+
+def dedupe_scraped_images(action='move', scraped_dir=SCRAPED_DIR, reference_dirs=REFERENCE_DIRS):
+    """
+    Find near-duplicates and move, delete or only report them.
+
+    Args:
+        action: 'move' (to <scraped_dir>/_duplicates), 'delete' or 'report'
+        scraped_dir: Directory to deduplicate
+        reference_dirs: Directories whose images count as already collected
+
+    Returns:
+        List of duplicate records (also written to <scraped_dir>/dedup_report.json)
+    """
+    print("\n" + "="*60)
+    print("🧬 NEAR-DUPLICATE FILTER")
+    print("="*60)
+
+    scraped_dir = Path(scraped_dir)
+    duplicates_dir, report_file = scraped_dir / DUPLICATES_DIR, scraped_dir / REPORT_FILE
+    duplicates = find_duplicates(scraped_dir, reference_dirs)
+
+    removed = {}
+    for dup in duplicates:
+        path = Path(dup['file'])
+        if action == 'delete':
+            path.unlink()
+            removed[path] = None
+        elif action == 'move':
+            target = duplicates_dir / path.relative_to(scraped_dir)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(path), str(target))
+            removed[path] = target
+
+    # Removed files must stop counting as downloaded, or resumed scrapes never refill them
+    state_db = scraped_dir / STATE_DB.name
+    marked = None
+    if removed and state_db.exists():
+        state = ScrapeState(state_db)
+        marked = state.mark_near_duplicates(removed)
+        state.close()
+
+    with open(report_file, 'w') as f:
+        json.dump({'action': action, 'duplicates': duplicates}, f, indent=2)
+
+    by_source = {}
+    for dup in duplicates:
+        by_source[dup['source']] = by_source.get(dup['source'], 0) + 1
+    print(f"  Already in training data: {by_source.get('reference', 0)}")
+    print(f"  Copies among scraped:     {by_source.get('scraped', 0)}")
+    verb = {'move': 'Moved to ' + str(duplicates_dir), 'delete': 'Deleted', 'report': 'Reported only'}[action]
+    print(f"  {verb}: {len(duplicates)} files")
+    if marked is not None:
+        print(f"  Marked in state store: {marked}")
+    print(f"  Report: {report_file}")
+    print("="*60)
+    return duplicates
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Remove near-duplicate scraped images")
+    parser.add_argument('scraped_dir', nargs='?', type=Path, default=SCRAPED_DIR,
+                        help="Directory to deduplicate (default: SCRAPED_IMAGES)")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--delete', action='store_true', help="Delete duplicates instead of moving them")
+    group.add_argument('--report-only', action='store_true', help="Only write the report")
+    args = parser.parse_args()
+    dedupe_scraped_images('delete' if args.delete else 'report' if args.report_only else 'move', args.scraped_dir)
@@ -0,0 +1,164 @@
+"""
+Staged Inference Pipeline
+=========================
+Overlaps image decoding, model inference and annotation/JPEG encoding so the
+model never sits idle waiting on disk or codec work.
+
+    reader pool --> decoded queue --> model (main thread) --> result queue --> writer pool
+
+Both queues are bounded, so a slow stage back-pressures the stages before it
+and memory stays flat no matter how many images are streamed through.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+# Pipeline configuration
+READER_WORKERS = 4
+WRITER_WORKERS = 4
+QUEUE_BATCHES = 4  # How many batches may wait between two stages
+
+_SENTINEL = object()
+
+
+def _record(timings, lock, stage, seconds):
+    """Append one timing sample (in seconds) for a stage"""
+    with lock:
+        timings.setdefault(stage, []).append(seconds)
+
+
+def _reader(batches, reader_pool, decoded_q, stop, timings, lock, errors):
+    """Decode each batch of paths in the reader pool and hand it to the model stage"""
+    try:
+        for batch_paths in batches:
+            if stop.is_set():
+                break
+            start = time.perf_counter()
+            images = list(reader_pool.map(lambda p: cv2.imread(str(p)), batch_paths))
+            _record(timings, lock, 'decode', time.perf_counter() - start)
+
+            # cv2.imread returns None for unreadable files - skip them
+            pairs = [(p, img) for p, img in zip(batch_paths, images) if img is not None]
+            if pairs:
+                decoded_q.put(pairs)
+    except Exception as e:
+        errors.append(e)
+    finally:
+        decoded_q.put(_SENTINEL)
+
+
+def _writer(write_q, render_fn, predictions, timings, lock, errors):
+    """Annotate and encode results until the sentinel arrives"""
+    while True:
+        item = write_q.get()
+        if item is _SENTINEL:
+            break
+        img_path, img, result = item
+        start = time.perf_counter()
+        try:
+            rendered = render_fn(img_path, img, result)
+            with lock:
+                predictions.extend(rendered)
+        except Exception as e:
+            errors.append(e)
+        _record(timings, lock, 'write', time.perf_counter() - start)
+
+
+def run_pipeline(model, batches, render_fn, conf, reader_workers=READER_WORKERS,
+                 writer_workers=WRITER_WORKERS, queue_batches=QUEUE_BATCHES, **predict_kwargs):
+    """
+    Stream batches of image paths through decode -> predict -> render.
+
+    Args:
+        model: Loaded YOLO model
+        batches: Iterable of lists of image paths
+        render_fn: Callable(img_path, bgr_image, result) -> list of prediction dicts,
+                   run in the writer pool
+        conf: Confidence threshold passed to model.predict
+        reader_workers: Threads decoding images
+        writer_workers: Threads drawing OBBs and writing JPEGs
+        queue_batches: Bound on batches buffered between stages
+        **predict_kwargs: Extra arguments for model.predict (e.g. imgsz)
+
+    Returns:
+        Tuple (predictions, batch_latencies, timings) where batch_latencies are the
+        per-batch model times in seconds and timings maps stage name to samples
+    """
+    decoded_q = queue.Queue(maxsize=queue_batches)
+    write_q = queue.Queue(maxsize=queue_batches * 16)
+    stop = threading.Event()
+    lock = threading.Lock()
+
+    predictions = []
+    batch_latencies = []
+    timings = {}
+    errors = []
+
+    reader_pool = ThreadPoolExecutor(max_workers=reader_workers, thread_name_prefix='reader')
+    reader = threading.Thread(target=_reader, daemon=True,
+                              args=(batches, reader_pool, decoded_q, stop, timings, lock, errors))
+    writers = [
+        threading.Thread(target=_writer, daemon=True, name=f'writer-{i}',
+                         args=(write_q, render_fn, predictions, timings, lock, errors))
+        for i in range(writer_workers)
+    ]
+    reader.start()
+    for w in writers:
+        w.start()
+
+    try:
+        while True:
+            wait_start = time.perf_counter()
+            item = decoded_q.get()
+            _record(timings, lock, 'model_wait', time.perf_counter() - wait_start)
+            if item is _SENTINEL:
+                break
+
+            paths, images = zip(*item)
+            batch_start = time.perf_counter()
+            # Images are already decoded BGR arrays, exactly what the model expects
+            results = list(model.predict(list(images), conf=conf, batch=len(images),
+                                         stream=True, verbose=False, **predict_kwargs))
+            latency = time.perf_counter() - batch_start
+            batch_latencies.append(latency)
+            _record(timings, lock, 'infer', latency)
+
+            for img_path, img, result in zip(paths, images, results):
+                write_q.put((img_path, img, result))  # Blocks when writers fall behind
+    except BaseException:
+        # Unblock the reader so it can exit, then re-raise
+        stop.set()
+        while decoded_q.get() is not _SENTINEL:
+            pass
+        raise
+    finally:
+        for _ in writers:
+            write_q.put(_SENTINEL)
+        for w in writers:
+            w.join()
+        reader.join()
+        reader_pool.shutdown()
+
+    if errors:
+        raise errors[0]
+
+    return predictions, batch_latencies, timings
+
+
+def print_stage_timings(timings):
+    """Print total and mean time spent in each pipeline stage"""
+    print("\n" + "="*60)
+    print("⏱️  PIPELINE STAGE TIMINGS")
+    print("="*60)
+    for stage in ('decode', 'model_wait', 'infer', 'write'):
+        samples = timings.get(stage, [])
+        if not samples:
+            continue
+        total = sum(samples)
+        mean_ms = total / len(samples) * 1000
+        print(f"  {stage:.<20} total {total:>8.2f}s | mean {mean_ms:>8.1f} ms x {len(samples)}")
+    print("="*60)
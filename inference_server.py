@@ -0,0 +1,309 @@
+"""
+Local Inference Server
+======================
+Serves OBB detections over HTTP on localhost. Concurrent requests that land
+within a short window are merged by a dynamic batcher into one forward pass.
+
+Endpoints:
+    POST /predict   image bytes (raw body or multipart/form-data) -> JSON detections
+    GET  /health    backend, worker and batching configuration
+
+Usage:
+    python inference_server.py serve
+    python inference_server.py loadtest --images dataset/test/images --concurrency 16
+"""
+
+import argparse
+import email
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from evaluate_and_test import CLASS_NAMES, CONF_THRESHOLD
+from export_cpu_model import IMG_SIZE, find_best_weights, load_fastest_model, selected_backend
+from obb_rendering import obb_to_numpy, xywhr_to_corners
+
+# Server configuration
+HOST = '127.0.0.1'
+PORT = 8000
+MAX_BATCH = 8
+MAX_WAIT_MS = 10
+THREADS_PER_WORKER = 4  # Intra-op threads per model instance (applied in load_worker_model)
+WORKERS = max(1, (os.cpu_count() or 1) // THREADS_PER_WORKER)
+MAX_UPLOAD_BYTES = 32 * 1024 * 1024
+
+
+class DynamicBatcher:
+    """
+    Collects single-image requests into batches for a pool of model workers.
+
+    Each worker blocks for the first request, then keeps pulling requests until
+    it has MAX_BATCH images or MAX_WAIT_MS has passed since the first one, and
+    runs them through its own model instance in a single predict call.
+    """
+
+    def __init__(self, model_factory, workers=WORKERS, max_batch=MAX_BATCH,
+                 max_wait_ms=MAX_WAIT_MS, conf=CONF_THRESHOLD):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.conf = conf
+        self._requests = queue.Queue()
+        self._threads = []
+        for i in range(workers):
+            # Ultralytics predictors are not thread-safe, so every worker owns a model
+            t = threading.Thread(target=self._worker, args=(model_factory(),),
+                                 name=f'batcher-{i}', daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, img):
+        """Queue one BGR image; returns a Future resolving to its detections"""
+        future = Future()
+        self._requests.put((img, future))
+        return future
+
+    def _collect(self):
+        """Block for one request, then gather more until the batch is full or the window closes"""
+        batch = [self._requests.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self, model):
+        while True:
+            batch = self._collect()
+            images = [img for img, _ in batch]
+            try:
+                results = model.predict(images, conf=self.conf, batch=len(images), verbose=False)
+                for (_, future), result in zip(batch, results):
+                    future.set_result((detections_to_json(result), len(batch)))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+
+def _limit_threads(model, backend, artifact, threads):
+    """
+    Cap the intra-op threads of one loaded model.
+
+    Ultralytics builds its ONNX Runtime session and OpenVINO compiled model with
+    the runtime defaults (all cores), so both are rebuilt with an explicit
+    thread count. PyTorch's limit is process-wide, which is fine because every
+    worker uses the same value.
+    """
+    runtime = model.predictor.model  # AutoBackend, created by the warm-up predict
+    if backend == 'pytorch':
+        import torch
+        torch.set_num_threads(threads)
+    elif backend == 'onnxruntime' and hasattr(runtime, 'session'):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        runtime.session = ort.InferenceSession(str(artifact), options, providers=runtime.session.get_providers())
+    elif backend == 'openvino' and hasattr(runtime, 'ov_compiled_model'):
+        import openvino as ov
+        core = ov.Core()
+        runtime.ov_compiled_model = core.compile_model(
+            core.read_model(str(next(Path(artifact).glob('*.xml')))), 'CPU',
+            {'INFERENCE_NUM_THREADS': threads, 'PERFORMANCE_HINT': 'LATENCY'})
+        runtime.inference_mode = 'LATENCY'
+    else:
+        print(f"⚠️  Could not limit {backend} threads; workers may oversubscribe the CPU")
+
+
+def load_worker_model(weights, threads=THREADS_PER_WORKER, imgsz=IMG_SIZE):
+    """
+    Load the serving backend for one batcher worker with a fixed thread budget.
+
+    Args:
+        weights: Path to best.pt
+        threads: Intra-op threads for this model instance
+        imgsz: Warm-up image size
+
+    Returns:
+        YOLO model, warmed up so the first request does not pay for setup
+    """
+    model, backend = load_fastest_model(weights)
+    artifact = selected_backend(weights)[1]
+    model.predict(np.zeros((imgsz, imgsz, 3), np.uint8), verbose=False)
+    _limit_threads(model, backend, artifact, threads)
+    return model
+
+
+def detections_to_json(result):
+    """Convert one OBB result into JSON-serialisable detections"""
+    xywhr, conf, cls = obb_to_numpy(result.obb)
+    polygons = xywhr_to_corners(xywhr)
+    return [
+        {
+            'class': CLASS_NAMES.get(c, 'unknown'),
+            'class_id': c,
+            'confidence': round(s, 4),
+            'xywhr': [round(v, 2) for v in box],
+            'polygon': [[round(x, 1), round(y, 1)] for x, y in poly],
+        }
+        for box, s, c, poly in zip(xywhr.tolist(), conf.tolist(), cls.tolist(), polygons.tolist())
+    ]
+
+
+def _extract_image_bytes(content_type, body):
+    """Return the uploaded file from a raw or multipart/form-data body"""
+    if not content_type.startswith('multipart/form-data'):
+        return body
+    message = email.message_from_bytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    for part in message.walk():
+        if part.get_filename() or part.get_content_type().startswith('image/'):
+            return part.get_payload(decode=True)
+    return b''
+
+
+def make_handler(batcher, backend):
+    """Build a request handler class bound to a batcher"""
+
+    class InferenceHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path != '/health':
+                return self._send_json(404, {'error': 'not found'})
+            self._send_json(200, {
+                'status': 'ok', 'backend': backend, 'workers': len(batcher._threads),
+                'max_batch': batcher.max_batch, 'max_wait_ms': batcher.max_wait * 1000,
+            })
+
+        def do_POST(self):
+            if self.path != '/predict':
+                return self._send_json(404, {'error': 'not found'})
+
+            length = int(self.headers.get('Content-Length', 0))
+            if not 0 < length <= MAX_UPLOAD_BYTES:
+                return self._send_json(413 if length else 400, {'error': 'invalid upload size'})
+
+            body = _extract_image_bytes(self.headers.get('Content-Type', ''), self.rfile.read(length))
+            img = cv2.imdecode(np.frombuffer(body, np.uint8), cv2.IMREAD_COLOR) if body else None
+            if img is None:
+                return self._send_json(400, {'error': 'could not decode image'})
+
+            start = time.perf_counter()
+            try:
+                detections, batch_size = batcher.submit(img).result()
+            except Exception as e:
+                return self._send_json(500, {'error': str(e)})
+            self._send_json(200, {
+                'detections': detections,
+                'batch_size': batch_size,
+                'latency_ms': round((time.perf_counter() - start) * 1000, 2),
+            })
+
+        def log_message(self, format, *args):
+            pass  # Keep the console quiet under load
+
+    return InferenceHandler
+
+
+def serve(host=HOST, port=PORT, workers=WORKERS, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+    """Load the model and serve until interrupted"""
+    weights = find_best_weights()
+    if weights is None:
+        print("❌ No best.pt found under runs/obb")
+        return
+
+    try:
+        backend = selected_backend(weights)[0]
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        return
+
+    threads = max(1, (os.cpu_count() or 1) // workers)  # Workers x threads never exceeds the cores
+    batcher = DynamicBatcher(lambda: load_worker_model(weights, threads), workers=workers,
+                             max_batch=max_batch, max_wait_ms=max_wait_ms)
+
+    server = ThreadingHTTPServer((host, port), make_handler(batcher, backend))
+    print(f"🚀 Serving {weights} ({backend}) on http://{host}:{port}")
+    print(f"   Workers: {workers} x {threads} threads | Max batch: {max_batch} | Max wait: {max_wait_ms} ms")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️  Server stopped")
+    finally:
+        server.server_close()
+
+
+def run_load_test(image_dir, url=f"http://{HOST}:{PORT}/predict", concurrency=16, total=200):
+    """Fire concurrent uploads at the server and print throughput and latency"""
+    images = sorted(p for p in Path(image_dir).glob('*') if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+    if not images:
+        print(f"❌ No images found in {image_dir}")
+        return
+    payloads = [p.read_bytes() for p in images]
+
+    def send(i):
+        req = urllib.request.Request(url, data=payloads[i % len(payloads)],
+                                     headers={'Content-Type': 'image/jpeg'})
+        start = time.perf_counter()
+        with urllib.request.urlopen(req) as resp:
+            batch_size = json.load(resp)['batch_size']
+        return time.perf_counter() - start, batch_size
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(send, range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array([s[0] for s in samples]) * 1000
+    print("\n" + "="*60)
+    print("📈 LOAD TEST RESULTS")
+    print("="*60)
+    print(f"  Requests: {total} ({concurrency} concurrent)")
+    print(f"  Throughput: {total / elapsed:.2f} req/s")
+    print(f"  Latency p50: {np.percentile(latencies_ms, 50):.1f} ms")
+    print(f"  Latency p95: {np.percentile(latencies_ms, 95):.1f} ms")
+    print(f"  Mean Batch Size: {np.mean([s[1] for s in samples]):.2f}")
+    print("="*60)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Wedtect OBB local inference server")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    serve_cmd = sub.add_parser('serve', help="start the server")
+    serve_cmd.add_argument('--port', type=int, default=PORT)
+    serve_cmd.add_argument('--workers', type=int, default=WORKERS)
+    serve_cmd.add_argument('--max-batch', type=int, default=MAX_BATCH)
+    serve_cmd.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS)
+
+    load_cmd = sub.add_parser('loadtest', help="benchmark a running server")
+    load_cmd.add_argument('--images', default='dataset/test/images')
+    load_cmd.add_argument('--port', type=int, default=PORT)
+    load_cmd.add_argument('--concurrency', type=int, default=16)
+    load_cmd.add_argument('--requests', type=int, default=200)
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        serve(port=args.port, workers=args.workers, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    else:
+        run_load_test(args.images, url=f"http://{HOST}:{args.port}/predict",
+                      concurrency=args.concurrency, total=args.requests)
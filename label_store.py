@@ -0,0 +1,245 @@
+"""
+Binary Label Store
+==================
+Packs every YOLO-OBB label file of a split into one memory-mapped NumPy
+array so tools stop re-globbing and re-parsing hundreds of tiny text files.
+
+    <split>/label_store/index.json        stem -> file name, mtime, size, hash, row range
+    <split>/label_store/rows-<gen>.npy    structured rows: cls int32, xy float32 (8,)
+
+Rows of one image are contiguous, so `store[stem]` is a zero-copy slice of
+the memory map. Rebuilding is incremental: files whose size and mtime are
+unchanged are not read at all, files that were only touched are hashed and
+reused, and only genuinely new or edited files are parsed. The rows file is
+written under a fresh generation name before the index is swapped in, so
+readers never see a half-written store.
+
+Usage:
+    python label_store.py                      # Build stores for dataset/ splits
+    python label_store.py TRAINING_DATA/train  # Build one split
+"""
+
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+STORE_DIRNAME = "label_store"
+INDEX_FILE = "index.json"
+STORE_VERSION = 1
+DEFAULT_SPLITS = [Path("dataset/train"), Path("dataset/valid"), Path("dataset/test")]
+
+ROW_DTYPE = np.dtype([('cls', '<i4'), ('xy', '<f4', (8,))])
+
+
+def parse_label_text(text):
+    """
+    Parse one YOLO-OBB label file.
+
+    Returns:
+        Tuple (polys, cls): float64 (N, 4, 2) normalized corners and int64 (N,) class ids
+    """
+    rows = [line.split() for line in text.splitlines()]
+    rows = [r for r in rows if len(r) == 9]
+    if not rows:
+        return np.zeros((0, 4, 2)), np.zeros(0, np.int64)
+    arr = np.array(rows, dtype=np.float64)
+    return arr[:, 1:].reshape(-1, 4, 2), arr[:, 0].astype(np.int64)
+
+
+def _to_rows(polys, cls):
+    rows = np.empty(len(cls), dtype=ROW_DTYPE)
+    rows['cls'] = cls
+    rows['xy'] = polys.reshape(-1, 8)
+    return rows
+
+
+class LabelStore:
+    """
+    Read-only view of a built label store.
+
+    Use `LabelStore.build(split_dir)` to get an up-to-date store; the
+    constructor only opens what is already on disk.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = Path(store_dir)
+        with open(self.store_dir / INDEX_FILE) as f:
+            index = json.load(f)
+        if index.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported label store version in {self.store_dir}")
+        self.labels_dir = Path(index['labels_dir'])
+        self.files = index['files']
+        self.rows_file = index['rows_file']
+        rows_path = self.store_dir / self.rows_file
+        # np.load cannot memory-map an empty array
+        self.rows = np.load(rows_path, mmap_mode='r') if index['num_rows'] else np.zeros(0, ROW_DTYPE)
+
+    @classmethod
+    def build(cls, split_dir, verbose=False):
+        """
+        Bring the store for a split up to date and open it.
+
+        Args:
+            split_dir: Split directory containing `labels/` (e.g. dataset/train)
+            verbose: Print how many label files were reused, re-hashed and parsed
+
+        Returns:
+            LabelStore
+        """
+        split_dir = Path(split_dir)
+        return cls(build_label_store(split_dir / "labels", split_dir / STORE_DIRNAME, verbose))
+
+    @classmethod
+    def for_labels_dir(cls, labels_dir, verbose=False):
+        """Same as `build`, addressed by the labels directory itself"""
+        return cls.build(Path(labels_dir).parent, verbose)
+
+    def __len__(self):
+        return len(self.files)
+
+    def __contains__(self, stem):
+        return stem in self.files
+
+    def __iter__(self):
+        return iter(self.files)
+
+    def __getitem__(self, stem):
+        """(polys (N, 4, 2) float32, cls (N,) int32) for one image, as views into the map"""
+        entry = self.files[stem]
+        rows = self.rows[entry['start']:entry['start'] + entry['count']]
+        return rows['xy'].reshape(-1, 4, 2), rows['cls']
+
+    def items(self, stems=None):
+        """Yield (stem, polys, cls), optionally restricted to a collection of stems"""
+        for stem in self.files:
+            if stems is None or stem in stems:
+                yield (stem,) + self[stem]
+
+    def class_ids(self):
+        """Class id of every instance in the split, without touching the coordinates"""
+        return np.asarray(self.rows['cls'])
+
+    def instances_per_image(self):
+        """Dictionary of stem -> instance count"""
+        return {stem: entry['count'] for stem, entry in self.files.items()}
+
+
+def _read_index(store_dir):
+    """Previous (files, rows, rows file name), or Nones if the store is missing or unreadable"""
+    try:
+        store = LabelStore(store_dir)
+        return store.files, store.rows, store.rows_file
+    except (OSError, ValueError, KeyError):
+        return None, None, None
+
+
+def build_label_store(labels_dir, store_dir, verbose=False):
+    """
+    Pack a labels directory into a binary store, reusing unchanged entries.
+
+    Args:
+        labels_dir: Directory of YOLO-OBB .txt label files
+        store_dir: Output directory for index.json and the rows file
+        verbose: Print a one-line summary of the rebuild
+
+    Returns:
+        Path to the store directory
+    """
+    labels_dir, store_dir = Path(labels_dir), Path(store_dir)
+    old_files, old_rows, old_rows_file = _read_index(store_dir)
+    old_files = old_files or {}
+
+    files = {}
+    chunks = []
+    num_rows = 0
+    reused = rehashed = parsed = 0
+    changed = False
+
+    label_paths = sorted(labels_dir.glob('*.txt')) if labels_dir.exists() else []
+    for label_file in label_paths:
+        stat = label_file.stat()
+        old = old_files.get(label_file.stem)
+
+        if old is not None and old['mtime_ns'] == stat.st_mtime_ns and old['size'] == stat.st_size:
+            rows = old_rows[old['start']:old['start'] + old['count']]
+            digest = old['hash']
+            reused += 1
+        else:
+            data = label_file.read_bytes()
+            digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+            changed = True
+            if old is not None and old['hash'] == digest:
+                rows = old_rows[old['start']:old['start'] + old['count']]
+                rehashed += 1
+            else:
+                rows = _to_rows(*parse_label_text(data.decode('utf-8', errors='replace')))
+                parsed += 1
+
+        files[label_file.stem] = {
+            'name': label_file.name, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+            'hash': digest, 'start': num_rows, 'count': len(rows),
+        }
+        chunks.append(rows)
+        num_rows += len(rows)
+
+    removed = len(set(old_files) - set(files))
+    if old_rows_file is not None and not changed and not removed:
+        if verbose:
+            print(f"  🗂️  {labels_dir}: {len(files)} label files unchanged")
+        return store_dir
+
+    store_dir.mkdir(parents=True, exist_ok=True)
+    rows = np.concatenate(chunks) if chunks else np.zeros(0, ROW_DTYPE)
+    digest = hashlib.blake2b(rows.tobytes(), digest_size=8).hexdigest()
+    rows_file = f"rows-{digest}.npy"
+    if not (store_dir / rows_file).exists():
+        tmp_rows = store_dir / f"{rows_file}.tmp"
+        with open(tmp_rows, 'wb') as f:
+            np.save(f, rows)
+        os.replace(tmp_rows, store_dir / rows_file)
+    del old_rows  # Release the old map before its file is removed
+
+    index = {
+        'version': STORE_VERSION, 'labels_dir': str(labels_dir), 'rows_file': rows_file,
+        'num_rows': int(num_rows), 'files': files,
+    }
+    tmp_index = store_dir / f"{INDEX_FILE}.tmp"
+    with open(tmp_index, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_index, store_dir / INDEX_FILE)
+
+    # Older generations are unreachable once the new index is in place
+    for stale in store_dir.glob('rows-*.npy'):
+        if stale.name != rows_file:
+            try:
+                stale.unlink()
+            except OSError:
+                pass  # Still mapped by another process on Windows; removed next build
+
+    if verbose:
+        print(f"  🗂️  {labels_dir}: {len(files)} label files, {num_rows} instances "
+              f"(reused {reused}, re-hashed {rehashed}, parsed {parsed}, removed {removed})")
+    return store_dir
+
+
+def main():
+    """Build label stores for the given split directories (default: dataset/ splits)"""
+    splits = [Path(arg) for arg in sys.argv[1:]] or DEFAULT_SPLITS
+
+    print("\n" + "="*60)
+    print("🗂️  BUILDING LABEL STORES")
+    print("="*60)
+    for split_dir in splits:
+        if not (split_dir / "labels").exists():
+            print(f"  ⚠️  No labels directory in {split_dir}")
+            continue
+        LabelStore.build(split_dir, verbose=True)
+    print("="*60)
+
+
+if __name__ == '__main__':
+    main()
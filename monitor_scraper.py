@@ -1,72 +1,331 @@
 """
 Monitor Scraper Progress
 ========================
-Real-time progress tracker for image downloading
+Real-time progress tracker for image downloading.
+
+Counts are kept incrementally instead of re-listing every defect folder on
+each refresh, so the cost of a refresh does not grow with the number of
+images already downloaded:
+
+- directory mode (default): one scan at startup, then filesystem events
+  (watchdog/inotify) add and remove files as the scraper renames them into
+  place. Without watchdog it falls back to re-scanning only the folders
+  whose modification time changed.
+- state mode (--state): reads only the rows of the scraper's SQLite state
+  store updated since the previous refresh, which also gives rejected /
+  failed downloads.
+
+The rate, bytes/s and ETA are computed over a sliding window (WINDOW_SECONDS),
+so they describe current throughput rather than the average since start.
+
+Usage:
+    python monitor_scraper.py
+    python monitor_scraper.py --state SCRAPED_IMAGES/scrape_state.sqlite3
+    python monitor_scraper.py --target 1000 --interval 2 --window 30
 """
 
+import argparse
+import os
+import queue
+import sqlite3
 import time
+from collections import deque
 from pathlib import Path
-from datetime import datetime
-
-def monitor_scraper():
-    """Monitor scraper progress in real-time"""
-    
-    scraped_dir = Path('SCRAPED_IMAGES')
-    defect_types = ['crack', 'dent', 'hole', 'leak']
-    
+
+# Monitor configuration
+SCRAPED_DIR = Path('SCRAPED_IMAGES')
+STATE_DB = SCRAPED_DIR / 'scrape_state.sqlite3'
+DEFECT_TYPES = ['crack', 'dent', 'hole', 'leak']
+TARGET = 1000
+REFRESH_SECONDS = 5
+WINDOW_SECONDS = 60
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.gif')
+
+
+class ProgressTracker:
+    """
+    Running totals plus a sliding window of recent downloads.
+
+    Args:
+        defect_types: Defect folders / types to track
+        window: Seconds of history used for the rate, bytes/s and ETA
+    """
+
+    def __init__(self, defect_types, window=WINDOW_SECONDS):
+        self.counts = {t: 0 for t in defect_types}
+        self.bytes = 0
+        self.failed = 0
+        self.window = window
+        self._recent = deque()  # (time, images, bytes)
+
+    def add(self, defect_type, images=1, nbytes=0, now=None):
+        if defect_type not in self.counts:
+            return
+        self.counts[defect_type] += images
+        self.bytes += nbytes
+        if images > 0:
+            self._recent.append((now or time.monotonic(), images, nbytes))
+
+    def rates(self, now=None):
+        """
+        Returns:
+            Tuple (images per second, bytes per second) over the window
+        """
+        now = now or time.monotonic()
+        while self._recent and self._recent[0][0] < now - self.window:
+            self._recent.popleft()
+        if not self._recent:
+            return 0.0, 0.0
+        span = max(now - self._recent[0][0], 1.0)
+        return sum(r[1] for r in self._recent) / span, sum(r[2] for r in self._recent) / span
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+
+class DirectorySource:
+    """
+    Image files in SCRAPED_IMAGES/<defect>/, tracked through filesystem events.
+
+    download_engine writes to hidden '.part' files and renames them, so only
+    files with an image extension and no leading dot are counted.
+    """
+
+    def __init__(self, scraped_dir, defect_types):
+        self.scraped_dir = Path(scraped_dir).resolve()  # Event paths and scan paths must agree
+        self.defect_types = defect_types
+        self._files = {t: {} for t in defect_types}  # path -> size, to subtract bytes on delete
+        self._events = queue.Queue()
+        self._observer = None
+        self._dir_mtimes = {}
+
+    def _defect_of(self, path):
+        path = Path(path)
+        if path.name.startswith('.') or path.suffix.lower() not in IMAGE_EXTENSIONS:
+            return None
+        if path.parent.parent != self.scraped_dir or path.parent.name not in self.defect_types:
+            return None
+        return path.parent.name
+
+    def _scan(self, defect_type):
+        """Current {path: size} of one defect folder"""
+        folder = self.scraped_dir / defect_type
+        files = {}
+        if folder.is_dir():
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_file() and self._defect_of(entry.path):
+                        files[entry.path] = entry.stat().st_size
+        return files
+
+    def start(self, tracker):
+        """Initial scan, then subscribe to events (or remember folder mtimes for polling)"""
+        for defect_type in self.defect_types:
+            files = self._scan(defect_type)
+            self._files[defect_type] = files
+            tracker.counts[defect_type] = len(files)
+            tracker.bytes += sum(files.values())
+            folder = self.scraped_dir / defect_type
+            self._dir_mtimes[defect_type] = folder.stat().st_mtime_ns if folder.is_dir() else None
+
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return 'polling (pip install watchdog for filesystem events)'
+
+        events = self._events
+
+        class Handler(FileSystemEventHandler):
+            def on_created(self, event):
+                if not event.is_directory:
+                    events.put(('add', event.src_path))
+
+            def on_deleted(self, event):
+                if not event.is_directory:
+                    events.put(('remove', event.src_path))
+
+            def on_moved(self, event):
+                if not event.is_directory:
+                    events.put(('remove', event.src_path))
+                    events.put(('add', event.dest_path))
+
+        self.scraped_dir.mkdir(exist_ok=True)
+        self._observer = Observer()
+        self._observer.schedule(Handler(), str(self.scraped_dir), recursive=True)
+        self._observer.start()
+        return 'filesystem events'
+
+    def _apply(self, tracker, kind, path):
+        defect_type = self._defect_of(path)
+        if defect_type is None:
+            return
+        files = self._files[defect_type]
+        if kind == 'add' and path not in files:
+            try:
+                size = os.stat(path).st_size
+            except OSError:
+                return  # Already gone again
+            files[path] = size
+            tracker.add(defect_type, 1, size)
+        elif kind == 'remove' and path in files:
+            tracker.add(defect_type, -1, -files.pop(path))
+
+    def poll(self, tracker):
+        """Apply everything that changed since the last poll"""
+        if self._observer is not None:
+            while True:
+                try:
+                    kind, path = self._events.get_nowait()
+                except queue.Empty:
+                    return
+                self._apply(tracker, kind, path)
+
+        # Fallback: only folders whose mtime changed are listed again
+        for defect_type in self.defect_types:
+            folder = self.scraped_dir / defect_type
+            mtime = folder.stat().st_mtime_ns if folder.is_dir() else None
+            if mtime == self._dir_mtimes[defect_type]:
+                continue
+            self._dir_mtimes[defect_type] = mtime
+            current = self._scan(defect_type)
+            known = set(self._files[defect_type])
+            for path in known - set(current):
+                self._apply(tracker, 'remove', path)
+            for path in set(current) - known:
+                self._apply(tracker, 'add', path)
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+
+
+class StateSource:
+    """
+    Downloads recorded in the scraper's SQLite state store (scrape_state.py).
+
+    Each poll reads only rows whose updated_at is at or after the newest one
+    already seen. The last status of every row is kept by rowid, so a row that
+    is read again (same second) changes nothing, and a status change such as
+    ok -> near_duplicate undoes exactly what the old status had counted.
+    """
+
+    def __init__(self, db_path, defect_types):
+        self.db_path = Path(db_path)
+        self.defect_types = defect_types
+        self._conn = None
+        self._since = ''
+        self._known = {}  # rowid -> (defect_type, status, bytes)
+
+    def start(self, tracker):
+        if not self.db_path.exists():
+            raise FileNotFoundError(f"State store not found: {self.db_path}")
+        # Read-only: the scraper owns the database (WAL mode lets us read while it writes)
+        self._conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, timeout=30)
+        self._read(tracker, live=False)  # Existing downloads are not part of the current rate
+        return f"state store {self.db_path}"
+
+    def poll(self, tracker):
+        self._read(tracker, live=True)
+
+    def _read(self, tracker, live):
+        rows = self._conn.execute(
+            "SELECT rowid, defect_type, status, bytes, updated_at FROM urls "
+            "WHERE updated_at >= ? ORDER BY updated_at", (self._since,)).fetchall()
+        for rowid, defect_type, status, nbytes, updated_at in rows:
+            self._since = updated_at
+            row = (defect_type, status, nbytes or 0)
+            old = self._known.get(rowid)
+            if old == row:
+                continue
+            self._known[rowid] = row
+            if old is not None:
+                self._count(tracker, *old, sign=-1, live=live)
+            self._count(tracker, *row, sign=1, live=live)
+
+    @staticmethod
+    def _count(tracker, defect_type, status, nbytes, sign, live):
+        """Add (sign=1) or take back (sign=-1) what one row status contributes"""
+        if status == 'ok':
+            if live:
+                tracker.add(defect_type, sign, sign * nbytes)
+            elif defect_type in tracker.counts:
+                tracker.counts[defect_type] += sign
+                tracker.bytes += sign * nbytes
+        elif status not in ('pending', 'near_duplicate'):  # near_duplicate: downloaded, later removed
+            tracker.failed += sign
+
+    def stop(self):
+        if self._conn is not None:
+            self._conn.close()
+
+
+def _format_eta(seconds):
+    if seconds is None:
+        return "--"
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{secs:02d}s"
+
+
+def monitor_scraper(state_db=None, target=TARGET, interval=REFRESH_SECONDS, window=WINDOW_SECONDS,
+                    scraped_dir=SCRAPED_DIR, defect_types=DEFECT_TYPES):
+    """
+    Monitor scraper progress in real-time.
+
+    Args:
+        state_db: Scrape state database to read instead of the image folders
+        target: Total number of images that counts as done
+        interval: Seconds between refreshes
+        window: Seconds of history for the rate, bytes/s and ETA
+    """
+    tracker = ProgressTracker(defect_types, window)
+    source = StateSource(state_db, defect_types) if state_db else DirectorySource(scraped_dir, defect_types)
+
     print("\n" + "="*60)
     print("📊 SCRAPER PROGRESS MONITOR")
     print("="*60)
+    mode = source.start(tracker)
+    print(f"Source: {mode}")
+    print(f"Already downloaded: {tracker.total} images ({tracker.bytes / 1e6:.1f} MB)")
     print("Press Ctrl+C to stop monitoring\n")
-    
-    start_time = time.time()
-    last_count = 0
-    
+
+    start_time = time.monotonic()
     try:
         while True:
-            # Count images per type
-            counts = {}
-            total = 0
-            
-            for defect_type in defect_types:
-                defect_path = scraped_dir / defect_type
-                count = len(list(defect_path.glob('*')))
-                counts[defect_type] = count
-                total += count
-            
-            # Calculate statistics
-            elapsed = int(time.time() - start_time)
-            rate = total / max(elapsed, 1)
-            
-            # Display progress
-            print(f"\r⏱️  Time: {elapsed}s | Total: {total:3d} images | Rate: {rate:.1f} img/s", end='')
-            
-            # Show breakdown
-            details = " | ".join([f"{t.upper()}: {counts[t]:3d}" for t in defect_types])
-            print(f"\n   {details}", end='')
-            
-            # Estimate remaining time
-            target = 1000
-            remaining = target - total
-            if rate > 0:
-                eta_secs = remaining / rate
-                eta_mins = int(eta_secs / 60)
-                print(f" | ETA: {eta_mins}m for 1000 images")
-            else:
-                print()
-            
-            # Check if complete
-            if total >= 1000:
-                print(f"\n\n🎉 SUCCESS! Downloaded {total} images!")
+            source.poll(tracker)
+            total = tracker.total
+            rate, byte_rate = tracker.rates()
+            eta = (target - total) / rate if rate > 0 and total < target else None
+
+            elapsed = int(time.monotonic() - start_time)
+            line = (f"⏱️  {elapsed}s | Total: {total:4d}/{target} | "
+                    f"{rate:.2f} img/s, {byte_rate / 1e6:.2f} MB/s (last {window}s) | ETA: {_format_eta(eta)}")
+            if isinstance(source, StateSource):
+                line += f" | Rejected/failed: {tracker.failed}"
+            print(line)
+            print("   " + " | ".join(f"{t.upper()}: {tracker.counts[t]:3d}" for t in defect_types))
+
+            if total >= target:
+                print(f"\n🎉 SUCCESS! Downloaded {total} images!")
                 break
-            
-            last_count = total
-            time.sleep(5)  # Update every 5 seconds
-            
+            time.sleep(interval)
+
     except KeyboardInterrupt:
         print(f"\n\n⏹️  Monitoring stopped")
-        print(f"Images downloaded so far: {total}")
+        print(f"Images downloaded so far: {tracker.total}")
+    finally:
+        source.stop()
 
 
 if __name__ == '__main__':
-    monitor_scraper()
+    parser = argparse.ArgumentParser(description="Monitor scraper progress")
+    parser.add_argument('--state', nargs='?', const=str(STATE_DB), default=None,
+                        help=f"Read the scraper's state store (default path: {STATE_DB})")
+    parser.add_argument('--target', type=int, default=TARGET, help="Total images to reach")
+    parser.add_argument('--interval', type=float, default=REFRESH_SECONDS, help="Seconds between refreshes")
+    parser.add_argument('--window', type=int, default=WINDOW_SECONDS, help="Seconds of history for rates")
+    args = parser.parse_args()
+    monitor_scraper(args.state, args.target, args.interval, args.window)
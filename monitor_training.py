@@ -1,108 +1,239 @@
 """
 Monitor YOLOv8 Training Progress
-Real-time tracking of GPU training on Wedtect dataset
+================================
+Real-time tracking of GPU training on Wedtect dataset.
+
+- picks the most recently started `wedtect-obb-final*` run from the run
+  registry (run_registry.py) rather than by name: a plain sort puts final10
+  before final2, and Ultralytics reuses freed suffixes; --list refreshes
+  the registry
+- follow mode keeps the byte offset of results.csv and parses only the rows
+  appended since the last refresh (partial lines wait for the next one)
+- the ETA uses the measured `time` column and the run's own args.yaml
+  (epochs, patience, time limit) instead of a fixed 100 x 1.5 min guess
+- a rolling table shows the last epochs' losses and mAP, with the best
+  epoch and how close patience is to stopping the run early
+
+Usage:
+    python monitor_training.py                  # one-shot status of the newest run
+    python monitor_training.py --follow         # refresh as epochs complete
+    python monitor_training.py --run wedtect-obb-final4
+    python monitor_training.py --list
 """
-import os
+
+import argparse
 import time
 from pathlib import Path
 
-def get_latest_results():
+import numpy as np
+
+from run_metrics import ResultsTail, RunMetrics, load_run_metrics
+from run_registry import REGISTRY_FILE, RunRegistry, load_run_args, print_runs, resolve_run
+
+# Monitor configuration
+RUNS_DIR = Path("runs/obb")
+REFRESH_SECONDS = 30
+ROLLING_ROWS = 8
+TIME_WINDOW = 5          # Epochs averaged for the seconds-per-epoch estimate
+DEFAULT_EPOCHS = 100     # Used when the run has no args.yaml
+
+# Columns shown in the rolling view: (results.csv column, header)
+ROLLING_COLUMNS = [
+    ('train/box_loss', 'box'),
+    ('train/cls_loss', 'cls'),
+    ('train/dfl_loss', 'dfl'),
+    ('val/box_loss', 'val_box'),
+    ('metrics/precision(B)', 'P'),
+    ('metrics/recall(B)', 'R'),
+    ('metrics/mAP50(B)', 'mAP50'),
+    ('metrics/mAP50-95(B)', 'mAP50-95'),
+]
+
+
+def list_runs(runs_dir=RUNS_DIR):
+    """Run directories indexed by the run registry, oldest first (by start time)"""
+    if not (Path(runs_dir) / REGISTRY_FILE).exists():
+        return []
+    with RunRegistry(runs_dir) as registry:
+        return [Path(run['path']) for run in registry.runs()]
+
+
+def find_latest_run(runs_dir=RUNS_DIR):
+    """
+    Most recently started run. train_local.py indexes a run when training
+    starts; the run directories are only scanned if the index has none.
+    """
+    return resolve_run('latest', runs_dir) or resolve_run('latest', runs_dir, refresh=True)
+
+
+def get_latest_results(runs_dir=RUNS_DIR):
     """Get the latest training results file"""
-    runs_dir = Path("runs/obb")
-    if not runs_dir.exists():
+    run_dir = find_latest_run(runs_dir)
+    if run_dir is None:
         return None
-    
-    # Find the latest numbered directory
-    obb_dirs = sorted([d for d in runs_dir.glob("wedtect-obb-final*") if d.is_dir()])
-    if not obb_dirs:
-        return None
-    
-    latest_dir = obb_dirs[-1]
-    results_file = latest_dir / "results.csv"
-    
-    if results_file.exists():
-        return results_file
-    return None
-
-def show_latest_epoch():
-    """Show the latest epoch metrics"""
-    results_file = get_latest_results()
-    
-    if not results_file:
+    results_file = run_dir / "results.csv"
+    return results_file if results_file.exists() else None
+
+
+def estimate_eta(metrics, run_args):
+    """
+    Remaining-time estimate from the measured epoch times.
+
+    Args:
+        metrics: RunMetrics of the run so far
+        run_args: Dictionary from args.yaml
+
+    Returns:
+        Dictionary with epoch, epochs, sec_per_epoch, remaining_epochs, eta_seconds,
+        early_stop_epoch and early_stop_seconds
+    """
+    epochs = int(run_args.get('epochs') or DEFAULT_EPOCHS)
+    patience = run_args.get('patience')
+    time_limit = run_args.get('time')  # Hours; overrides epochs when set
+
+    epoch = int(metrics.epoch[-1])
+    times = metrics.time
+    sec_per_epoch = None
+    if times is not None:
+        recent = times[-(TIME_WINDOW + 1):]
+        sec_per_epoch = float(np.diff(recent).mean()) if len(recent) > 1 else float(recent[0]) / max(epoch, 1)
+
+    remaining = max(epochs - epoch, 0)
+    eta = remaining * sec_per_epoch if sec_per_epoch else None
+    if time_limit and times is not None:
+        left = max(float(time_limit) * 3600 - float(times[-1]), 0)
+        eta = left if eta is None else min(eta, left)
+
+    # Patience counts epochs since the best *fitness*, not since the best mAP50-95
+    early_stop_epoch = early_stop_seconds = None
+    fitness_best = int(metrics.epoch[int(np.argmax(metrics.fitness))])
+    if patience and fitness_best + int(patience) < epochs:
+        early_stop_epoch = fitness_best + int(patience)
+        if sec_per_epoch:
+            early_stop_seconds = max(early_stop_epoch - epoch, 0) * sec_per_epoch
+
+    return {
+        'epoch': epoch, 'epochs': epochs, 'sec_per_epoch': sec_per_epoch, 'remaining_epochs': remaining,
+        'eta_seconds': eta, 'early_stop_epoch': early_stop_epoch, 'early_stop_seconds': early_stop_seconds,
+    }
+
+
+def _format_duration(seconds):
+    if seconds is None:
+        return "?"
+    minutes = int(seconds // 60)
+    return f"{minutes // 60}h {minutes % 60:02d}m"
+
+
+def print_rolling_view(metrics, count=ROLLING_ROWS):
+    """Table of the last `count` epochs (★ marks the best epoch by mAP50-95)"""
+    columns = [(col, name) for col, name in ROLLING_COLUMNS if col in metrics]
+    times = metrics.time
+    print(f"\n{'epoch':>7} {'time':>8} " + " ".join(f"{name:>9}" for _, name in columns))
+    for i in range(max(len(metrics) - count, 0), len(metrics)):
+        marker = '★' if i == metrics.best_index else ' '
+        elapsed = _format_duration(times[i]) if times is not None else '?'
+        print(f"{marker}{metrics.epoch[i]:>6} {elapsed:>8} "
+              + " ".join(f"{metrics[col][i]:>9.4f}" for col, _ in columns))
+
+
+def show_status(run_dir, metrics, run_args):
+    """Print the rolling metrics view and the ETA for a run"""
+    print("\n" + "="*80)
+    print(f"📊 {run_dir.name} — epoch {metrics.epoch[-1]}/{run_args.get('epochs') or DEFAULT_EPOCHS}")
+    print("="*80)
+
+    print_rolling_view(metrics)
+
+    best = metrics.best_index
+    if metrics.map50 is not None and metrics.map50_95 is not None:
+        print(f"\n🏆 Best epoch {metrics.best_epoch}: mAP50 {metrics.map50[best]:.4f}, "
+              f"mAP50-95 {metrics.map50_95[best]:.4f}")
+    eta = estimate_eta(metrics, run_args)
+    if eta['sec_per_epoch']:
+        print(f"⏱️  {eta['sec_per_epoch'] / 60:.1f} min/epoch (last {TIME_WINDOW}) | "
+              f"Remaining: {eta['remaining_epochs']} epochs, ~{_format_duration(eta['eta_seconds'])}")
+    if eta['early_stop_epoch'] is not None:
+        print(f"🛑 Early stop at epoch {eta['early_stop_epoch']} if mAP does not improve "
+              f"(patience {run_args.get('patience')}, ~{_format_duration(eta['early_stop_seconds'])})")
+    return eta
+
+
+def show_latest_epoch(run_dir=None):
+    """Show the latest epoch metrics (one-shot)"""
+    results_file = (Path(run_dir) / "results.csv") if run_dir else get_latest_results()
+    if not results_file or not results_file.exists():
         print("⏳ Training not started yet or results file not found...")
         return False
-    
-    try:
-        with open(results_file, 'r') as f:
-            lines = f.readlines()
-        
-        if len(lines) > 1:
-            # Skip header, get last line
-            latest = lines[-1].strip()
-            header = lines[0].strip()
-            
-            print("\n" + "="*80)
-            print("📊 LATEST TRAINING EPOCH")
-            print("="*80)
-            print(header)
-            print(latest)
-            
-            # Extract epoch number
-            cols = latest.split()
-            if len(cols) > 0:
-                epoch = cols[0]
-                print(f"\n✅ Currently on Epoch: {epoch}")
-            return True
-        else:
-            print("⏳ Waiting for first epoch to complete...")
-            return False
-    except Exception as e:
-        print(f"⚠️  Could not read results: {e}")
+
+    metrics = load_run_metrics(results_file)
+    if not len(metrics):
+        print("⏳ Waiting for first epoch to complete...")
         return False
+    show_status(results_file.parent, metrics, load_run_args(results_file.parent))
+    return True
+
+
+def follow(run_dir, interval=REFRESH_SECONDS):
+    """Print a new status block whenever epochs are appended to results.csv"""
+    run_args = load_run_args(run_dir)
+    epochs = int(run_args.get('epochs') or DEFAULT_EPOCHS)
+    tail = ResultsTail(run_dir / "results.csv")
+    metrics = None
+    print(f"👀 Following {tail.path} (Ctrl+C to stop)")
+    try:
+        while True:
+            new_rows = tail.read_new()
+            if tail.restarted:
+                metrics = None
+            if new_rows:
+                metrics = (metrics if metrics is not None else RunMetrics(tail.header, [], tail.path)).extend(new_rows)
+                eta = show_status(run_dir, metrics, run_args)
+                if metrics.epoch[-1] >= epochs:
+                    print("\n✅ Training finished")
+                    return
+                if eta['early_stop_epoch'] is not None and metrics.epoch[-1] >= eta['early_stop_epoch']:
+                    print("\n✅ Training stopped early (patience reached)")
+                    return
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\n⏹️  Monitoring stopped")
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Monitor YOLOv8 OBB training")
+    parser.add_argument('--runs-dir', type=Path, default=RUNS_DIR)
+    parser.add_argument('--run', default=None, help="Run directory name (default: newest)")
+    parser.add_argument('--follow', action='store_true', help="Keep refreshing as epochs complete")
+    parser.add_argument('--interval', type=float, default=REFRESH_SECONDS, help="Seconds between checks")
+    parser.add_argument('--list', action='store_true', help="List runs and exit")
+    args = parser.parse_args()
+
     print("\n" + "🔍 WEDTECT YOLOv8 OBB TRAINING MONITOR")
-    print("📍 Checking GPU training progress...")
-    
-    # Check if training is still running
-    run_dir = Path("runs/obb")
-    obb_dirs = sorted([d for d in run_dir.glob("wedtect-obb-final*") if d.is_dir()])
-    
-    if obb_dirs:
-        latest_dir = obb_dirs[-1]
-        print(f"\n📁 Training Directory: {latest_dir.name}")
-        
-        # Check for weights
-        if (latest_dir / "weights").exists():
-            weights = list((latest_dir / "weights").glob("*.pt"))
-            if weights:
-                print(f"💾 Checkpoints: {len(weights)} weight files found")
-        
-        show_latest_epoch()
-        
-        # Show estimated time remaining
-        results_file = get_latest_results()
-        if results_file:
-            try:
-                with open(results_file, 'r') as f:
-                    lines = f.readlines()
-                
-                if len(lines) > 1:
-                    epoch_num = int(lines[-1].split()[0])
-                    remaining = 100 - epoch_num
-                    # Rough estimate: ~1-2 min per epoch on RTX 4070
-                    est_time_min = remaining * 1.5
-                    hours = int(est_time_min // 60)
-                    mins = int(est_time_min % 60)
-                    
-                    if remaining > 0:
-                        print(f"\n⏱️  Estimated Time Remaining: ~{hours}h {mins}m ({remaining} epochs left)")
-            except:
-                pass
-    else:
+
+    if args.list:
+        if args.runs_dir.is_dir():
+            with RunRegistry(args.runs_dir) as registry:
+                registry.refresh()
+                print_runs(registry.runs())
+        return
+
+    run_dir = args.runs_dir / args.run if args.run else find_latest_run(args.runs_dir)
+    if run_dir is None or not run_dir.exists():
         print("⏳ No training directory found yet. Training may be initializing...")
-    
-    print("\n💡 Tip: Run this script again to check progress!")
+        return
+
+    print(f"\n📁 Training Directory: {run_dir.name}")
+    weights = list((run_dir / "weights").glob("*.pt")) if (run_dir / "weights").exists() else []
+    if weights:
+        print(f"💾 Checkpoints: {', '.join(sorted(w.name for w in weights))}")
+
+    if args.follow:
+        follow(run_dir, args.interval)
+    else:
+        show_latest_epoch(run_dir)
+        print("\n💡 Tip: use --follow to keep watching")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,339 @@
+"""
+OBB Evaluation Engine
+=====================
+Scores OBB predictions against the 8-coordinate polygon labels in
+dataset/<split>/labels (read through label_store): pairwise rotated IoU in NumPy, greedy matching at
+IoU 0.50:0.95, per-class AP, PR curves and a confusion matrix.
+
+Everything works on normalized polygons. IoU is a ratio of areas and affine
+maps scale every area by the same factor, so IoU in normalized coordinates
+equals IoU in pixels and label files never need their image size.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+from label_store import LabelStore
+
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+CONFUSION_CONF = 0.25
+CONFUSION_IOU = 0.5
+PAIR_CHUNK = 100_000   # Box pairs per vectorized IoU call (bounds peak memory)
+RECALL_GRID = np.linspace(0, 1, 101)
+_EPS = 1e-9
+
+
+# ============================================================
+# LOADING
+# ============================================================
+
+def load_ground_truth(labels_dir, stems=None):
+    """
+    Load every label of a split from its binary label store (built or
+    refreshed on the fly, see label_store.py).
+
+    Args:
+        labels_dir: e.g. dataset/test/labels
+        stems: Optional collection of image stems to restrict to
+
+    Returns:
+        Dictionary of image stem -> (polys, cls)
+    """
+    store = LabelStore.for_labels_dir(labels_dir)
+    return {stem: (polys, cls) for stem, polys, cls in store.items(stems)}
+
+
+# ============================================================
+# ROTATED IOU
+# ============================================================
+
+def _cross(a, b):
+    """z-component of the 2D cross product over the last axis"""
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+
+def _signed_area(polys):
+    return 0.5 * _cross(polys, np.roll(polys, -1, axis=-2)).sum(-1)
+
+
+def _to_ccw(polys):
+    """Reorder vertices counter-clockwise so half-plane tests share one sign"""
+    polys = polys.copy()
+    cw = _signed_area(polys) < 0
+    polys[cw] = polys[cw, ::-1]
+    return polys
+
+
+def _inside(points, polys):
+    """(P, K) mask of which of K points lie inside the matching CCW convex polygon"""
+    edges = np.roll(polys, -1, axis=1) - polys                     # (P, 4, 2)
+    rel = points[:, :, None, :] - polys[:, None, :, :]            # (P, K, 4, 2)
+    return (_cross(edges[:, None], rel) >= -_EPS).all(-1)
+
+
+def paired_polygon_iou(a, b):
+    """
+    IoU of convex quadrilaterals a[i] and b[i], fully vectorized.
+
+    The intersection polygon's vertices are the corners of each quad lying in
+    the other plus all edge/edge crossings (at most 24 candidates). Valid
+    candidates are sorted by angle around their centroid and the area is
+    taken with the shoelace formula.
+
+    Args:
+        a, b: (P, 4, 2) corner arrays
+
+    Returns:
+        (P,) IoU values
+    """
+    a = _to_ccw(np.asarray(a, dtype=np.float64))
+    b = _to_ccw(np.asarray(b, dtype=np.float64))
+    if len(a) == 0:
+        return np.zeros(0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Edge/edge crossings: a_i + t*r_i == b_j + u*s_j
+        r = (np.roll(a, -1, axis=1) - a)[:, :, None, :]           # (P, 4, 1, 2)
+        s = (np.roll(b, -1, axis=1) - b)[:, None, :, :]           # (P, 1, 4, 2)
+        qp = b[:, None, :, :] - a[:, :, None, :]                  # (P, 4, 4, 2)
+        rxs = _cross(r, s)
+        t = _cross(qp, s) / rxs
+        u = _cross(qp, r) / rxs
+        hit = (np.abs(rxs) > _EPS) & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+        crossings = a[:, :, None, :] + t[..., None] * r
+
+    n = len(a)
+    points = np.concatenate([a, b, crossings.reshape(n, 16, 2)], axis=1)     # (P, 24, 2)
+    valid = np.concatenate([_inside(a, b), _inside(b, a), hit.reshape(n, 16)], axis=1)
+    points = np.where(valid[..., None], points, 0.0)
+
+    count = valid.sum(1)
+    centroid = points.sum(1) / np.maximum(count, 1)[:, None]
+    angle = np.arctan2(points[..., 1] - centroid[:, None, 1], points[..., 0] - centroid[:, None, 0])
+    angle[~valid] = np.inf
+
+    order = np.argsort(angle, axis=1)
+    points = np.take_along_axis(points, order[..., None], axis=1)
+    valid = np.take_along_axis(valid, order, axis=1)
+    # Pad the unused tail with the first vertex: its shoelace terms are zero
+    points = np.where(valid[..., None], points, points[:, :1])
+
+    inter = np.abs(_signed_area(points))
+    inter[count < 3] = 0.0
+    union = np.abs(_signed_area(a)) + np.abs(_signed_area(b)) - inter
+    return inter / np.maximum(union, _EPS)
+
+
+def sparse_pairwise_iou(pred_polys, pred_img, gt_polys, gt_img):
+    """
+    IoU of every overlapping (prediction, ground truth) pair from the same image.
+
+    Axis-aligned bounding boxes prune non-overlapping pairs before the exact
+    polygon IoU runs, so cost grows with overlaps rather than N x M.
+
+    Returns:
+        Tuple (pred_idx, gt_idx, iou) for pairs with IoU > 0
+    """
+    p_min, p_max = pred_polys.min(1), pred_polys.max(1)
+    g_min, g_max = gt_polys.min(1), gt_polys.max(1)
+
+    p_order = np.argsort(pred_img, kind='stable')
+    g_order = np.argsort(gt_img, kind='stable')
+    image_range = np.arange(max(pred_img.max(initial=-1), gt_img.max(initial=-1)) + 2)
+    p_bounds = np.searchsorted(pred_img[p_order], image_range)
+    g_bounds = np.searchsorted(gt_img[g_order], image_range)
+
+    pi_parts, gi_parts = [], []
+    for img in np.intersect1d(pred_img, gt_img):
+        p = p_order[p_bounds[img]:p_bounds[img + 1]]
+        g = g_order[g_bounds[img]:g_bounds[img + 1]]
+        overlap = ((p_min[p, None] <= g_max[None, g]) & (g_min[None, g] <= p_max[p, None])).all(-1)
+        rows, cols = np.nonzero(overlap)
+        pi_parts.append(p[rows])
+        gi_parts.append(g[cols])
+
+    if not pi_parts:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0)
+
+    pi, gi = np.concatenate(pi_parts), np.concatenate(gi_parts)
+    iou = np.concatenate([
+        paired_polygon_iou(pred_polys[pi[i:i + PAIR_CHUNK]], gt_polys[gi[i:i + PAIR_CHUNK]])
+        for i in range(0, len(pi), PAIR_CHUNK)
+    ]) if len(pi) else np.zeros(0)
+
+    keep = iou > 0
+    return pi[keep], gi[keep], iou[keep]
+
+
+# ============================================================
+# MATCHING & METRICS
+# ============================================================
+
+def _greedy_match(pi, gi, iou):
+    """One-to-one matching, highest IoU first (the same rule Ultralytics' validator uses)"""
+    order = np.argsort(-iou, kind='stable')
+    pi, gi, iou = pi[order], gi[order], iou[order]
+    _, first = np.unique(pi, return_index=True)
+    first.sort()                                  # Keep the IoU ordering
+    pi, gi = pi[first], gi[first]
+    _, first = np.unique(gi, return_index=True)
+    return pi[first], gi[first]
+
+
+def match_predictions(pi, gi, iou, pred_cls, gt_cls, thresholds=IOU_THRESHOLDS):
+    """
+    Mark true positives at every IoU threshold.
+
+    Returns:
+        (num_predictions, len(thresholds)) boolean array
+    """
+    tp = np.zeros((len(pred_cls), len(thresholds)), dtype=bool)
+    same = pred_cls[pi] == gt_cls[gi]
+    pi, gi, iou = pi[same], gi[same], iou[same]
+    for k, threshold in enumerate(thresholds):
+        above = iou >= threshold
+        if above.any():
+            matched, _ = _greedy_match(pi[above], gi[above], iou[above])
+            tp[matched, k] = True
+    return tp
+
+
+def _precision_envelope(recall, precision):
+    """Monotone precision envelope sampled on RECALL_GRID"""
+    mrec = np.concatenate([[0.0], recall, [1.0]])
+    mpre = np.concatenate([[1.0], precision, [0.0]])
+    mpre = np.flip(np.maximum.accumulate(np.flip(mpre)))
+    # Precision at recall r is the best precision at any recall >= r
+    idx = np.searchsorted(mrec, RECALL_GRID, side='left')
+    return mpre[np.minimum(idx, len(mpre) - 1)]
+
+
+def confusion_matrix(pi, gi, iou, pred_conf, pred_cls, gt_cls, num_classes,
+                     conf=CONFUSION_CONF, iou_threshold=CONFUSION_IOU):
+    """
+    Class-agnostic matching at one operating point.
+
+    Returns:
+        (nc + 1, nc + 1) int array, rows = predicted, cols = true, last = background
+    """
+    matrix = np.zeros((num_classes + 1, num_classes + 1), dtype=np.int64)
+    kept = pred_conf >= conf
+    use = (iou >= iou_threshold) & kept[pi]
+    p, g = _greedy_match(pi[use], gi[use], iou[use]) if use.any() else (np.zeros(0, int), np.zeros(0, int))
+
+    np.add.at(matrix, (pred_cls[p], gt_cls[g]), 1)
+    missed = np.ones(len(gt_cls), bool)
+    missed[g] = False
+    np.add.at(matrix, (num_classes, gt_cls[missed]), 1)
+    spurious = kept.copy()
+    spurious[p] = False
+    np.add.at(matrix, (pred_cls[spurious], num_classes), 1)
+    return matrix
+
+
+def evaluate(predictions, ground_truth, class_names, thresholds=IOU_THRESHOLDS):
+    """
+    Score predictions against ground truth.
+
+    Args:
+        predictions: Dict image stem -> (polys (N, 4, 2) normalized, conf (N,), cls (N,))
+        ground_truth: Dict image stem -> (polys, cls) as from load_ground_truth
+        class_names: Dict class id -> name
+
+    Returns:
+        Dictionary with mAP50, mAP50-95, per-class stats, PR curves and confusion matrix
+    """
+    stems = sorted(set(predictions) | set(ground_truth))
+    image_ids = {stem: i for i, stem in enumerate(stems)}
+
+    def flatten(source, with_conf):
+        polys, confs, classes, imgs = [np.zeros((0, 4, 2))], [np.zeros(0)], [np.zeros(0, np.int64)], [np.zeros(0, np.int64)]
+        for stem, entry in source.items():
+            p = np.asarray(entry[0], dtype=np.float64).reshape(-1, 4, 2)
+            polys.append(p)
+            if with_conf:
+                confs.append(np.asarray(entry[1], dtype=np.float64))
+            classes.append(np.asarray(entry[-1], dtype=np.int64))
+            imgs.append(np.full(len(p), image_ids[stem], dtype=np.int64))
+        return np.concatenate(polys), np.concatenate(confs), np.concatenate(classes), np.concatenate(imgs)
+
+    pred_polys, pred_conf, pred_cls, pred_img = flatten(predictions, True)
+    gt_polys, _, gt_cls, gt_img = flatten(ground_truth, False)
+
+    pi, gi, iou = sparse_pairwise_iou(pred_polys, pred_img, gt_polys, gt_img)
+    tp = match_predictions(pi, gi, iou, pred_cls, gt_cls, thresholds)
+
+    per_class, pr_curves = {}, {'recall': RECALL_GRID.tolist()}
+    for class_id, name in sorted(class_names.items()):
+        in_class = np.flatnonzero(pred_cls == class_id)
+        n_gt = int((gt_cls == class_id).sum())
+        order = in_class[np.argsort(-pred_conf[in_class], kind='stable')]
+
+        tpc = np.cumsum(tp[order], axis=0)
+        fpc = np.cumsum(~tp[order], axis=0)
+        recall = tpc / max(n_gt, 1)
+        precision = tpc / np.maximum(tpc + fpc, 1)
+
+        ap = np.zeros(len(thresholds))
+        curve = np.zeros(len(RECALL_GRID))
+        if n_gt and len(order):
+            envelopes = [_precision_envelope(recall[:, k], precision[:, k]) for k in range(len(thresholds))]
+            ap = np.array([env.mean() for env in envelopes])
+            curve = envelopes[0]
+
+        per_class[name] = {
+            'ap50': float(ap[0]),
+            'ap50_95': float(ap.mean()),
+            'n_gt': n_gt,
+            'n_pred': int(len(order)),
+            'max_recall50': float(recall[-1, 0]) if len(order) else 0.0,
+        }
+        pr_curves[name] = curve.tolist()
+
+    # Average only over classes that appear in the ground truth
+    present = [c for c in per_class.values() if c['n_gt']]
+    return {
+        'mAP50': float(np.mean([c['ap50'] for c in present])) if present else 0.0,
+        'mAP50-95': float(np.mean([c['ap50_95'] for c in present])) if present else 0.0,
+        'iou_thresholds': [round(float(t), 2) for t in thresholds],
+        'classes': per_class,
+        'pr_curves': pr_curves,
+        'confusion_matrix': confusion_matrix(pi, gi, iou, pred_conf, pred_cls, gt_cls,
+                                             len(class_names)).tolist(),
+        'num_images': len(stems),
+    }
+
+
+# ============================================================
+# REPORTING
+# ============================================================
+
+def print_evaluation(metrics):
+    """Print mAP and per-class AP"""
+    print("\n" + "="*60)
+    print("🎯 OBB ACCURACY (vs ground-truth polygons)")
+    print("="*60)
+    print(f"  Images: {metrics['num_images']}")
+    print(f"  mAP@50: {metrics['mAP50']:.4f}")
+    print(f"  mAP@50-95: {metrics['mAP50-95']:.4f}")
+    print("\n  Per-Class AP:")
+    for name, c in metrics['classes'].items():
+        print(f"    {name:.<20} AP50 {c['ap50']:.3f} | AP50-95 {c['ap50_95']:.3f} "
+              f"| GT {c['n_gt']:>4} | Pred {c['n_pred']:>5}")
+    print("="*60)
+
+
+def save_evaluation(metrics, class_names, output_dir):
+    """Write metrics JSON, then the PR curves and confusion matrix figures rendered from it"""
+    from report_figures import evaluation_jobs, render_figures
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(output_dir / "obb_metrics.json", 'w') as f:
+        json.dump(metrics, f, indent=2)
+
+    # Skipped when the metrics did not change since the last render
+    render_figures(evaluation_jobs(output_dir / "obb_metrics.json", CONFUSION_CONF, CONFUSION_IOU, output_dir),
+                   output_dir)
@@ -0,0 +1,97 @@
+"""
+Vectorized OBB Rendering
+========================
+Turns a whole `result.obb` into corner polygons in one NumPy pass and draws
+them with one `cv2.polylines` call per class instead of one `RotatedRect` +
+`boxPoints` round trip per detection.
+
+Ultralytics OBB rows are laid out as [x, y, w, h, r, (track_id,) conf, cls]
+with the rotation r in RADIANS.
+"""
+
+import cv2
+import numpy as np
+
+
+def obb_to_numpy(obb):
+    """
+    Copy an Ultralytics OBB object to NumPy in a single transfer.
+
+    Args:
+        obb: `result.obb` (may be None)
+
+    Returns:
+        Tuple (xywhr, conf, cls) as float32 (N, 5), float32 (N,) and int64 (N,)
+    """
+    if obb is None or len(obb) == 0:
+        return np.zeros((0, 5), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64)
+
+    data = obb.data
+    data = data.cpu().numpy() if hasattr(data, 'cpu') else np.asarray(data)
+    # conf and cls are always the last two columns, with or without a track id
+    return data[:, :5].astype(np.float32), data[:, -2].astype(np.float32), data[:, -1].astype(np.int64)
+
+
+def xywhr_to_corners(xywhr):
+    """
+    Convert rotated boxes to their four corner points.
+
+    Args:
+        xywhr: (N, 5) array of centre x, centre y, width, height, rotation (radians)
+
+    Returns:
+        (N, 4, 2) float array of corners in drawing order
+    """
+    xywhr = np.asarray(xywhr, dtype=np.float32).reshape(-1, 5)
+    ctr = xywhr[:, :2]
+    w, h, r = xywhr[:, 2], xywhr[:, 3], xywhr[:, 4]
+    cos, sin = np.cos(r), np.sin(r)
+
+    # Half-extent vectors along the box's own width and height axes
+    vec_w = np.stack([w / 2 * cos, w / 2 * sin], axis=-1)
+    vec_h = np.stack([-h / 2 * sin, h / 2 * cos], axis=-1)
+
+    return np.stack([
+        ctr + vec_w + vec_h,
+        ctr + vec_w - vec_h,
+        ctr - vec_w - vec_h,
+        ctr - vec_w + vec_h,
+    ], axis=1)
+
+
+def draw_obbs(img, xywhr, conf, cls, class_names, colors, thickness=2, labels=True):
+    """
+    Draw all OBBs of one image in place.
+
+    Args:
+        img: Image to draw on (colour order must match `colors`)
+        xywhr: (N, 5) boxes, rotation in radians
+        conf: (N,) confidences
+        cls: (N,) integer class ids
+        class_names: Dict of class id -> name
+        colors: Dict of class name -> colour tuple
+        thickness: Polygon line thickness
+        labels: Whether to write "<class> <conf>" at each box centre
+
+    Returns:
+        The same image, for chaining
+    """
+    if len(xywhr) == 0:
+        return img
+
+    polygons = np.rint(xywhr_to_corners(xywhr)).astype(np.int32)
+
+    # cv2.polylines takes one colour per call, so batch the polygons by class
+    for class_id in np.unique(cls):
+        name = class_names.get(int(class_id), 'unknown')
+        color = colors.get(name, (255, 255, 255))
+        cv2.polylines(img, list(polygons[cls == class_id]), True, color, thickness)
+
+    if labels:
+        centres = np.rint(xywhr[:, :2]).astype(np.int32)
+        for (x, y), score, class_id in zip(centres.tolist(), conf.tolist(), cls.tolist()):
+            name = class_names.get(class_id, 'unknown')
+            cv2.putText(img, f"{name} {score:.2f}", (x, y), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.5, colors.get(name, (255, 255, 255)), 2)
+
+    return img
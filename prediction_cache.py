@@ -0,0 +1,210 @@
+"""
+Prediction Cache
+================
+Persistent store of full OBB predictions so evaluation re-runs only send new
+or changed images through the model.
+
+One compressed NPZ file per (weights hash, imgsz, NMS IoU, inference mode,
+conf), where the mode is full-frame or tiled with a given tile size and
+overlap, laid out in columns:
+
+    image_hashes   (I,)      content hash of each image (the lookup key)
+    image_shapes   (I, 2)    original (height, width)
+    offsets        (I + 1,)  row range of each image in the box columns
+    xywhr          (N, 5)    float32, rotation in radians
+    conf           (N,)      float32
+    cls            (N,)      int16
+    names          (K,)      file names of the image set last evaluated
+    name_hashes    (K,)      content hash behind each name
+
+Predictions are stored once per content hash; file names only point at them.
+A renamed image reuses its predictions under the new name, and files with
+identical content each keep their own entry in the name index.
+
+A cache built at a low confidence also serves any higher threshold: readers
+pass `min_conf` and the extra boxes are filtered out on read.
+"""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from obb_rendering import xywhr_to_corners
+
+CACHE_DIR = Path("evaluation/prediction_cache")
+DEFAULT_NMS_IOU = 0.7  # Ultralytics predict() default
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Content hash of a file (BLAKE2b, 128-bit hex)"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """
+    Predictions for one model / inference-parameter combination.
+
+    Use `PredictionCache.open` rather than the constructor so that an existing
+    lower-confidence cache for the same weights is reused.
+    """
+
+    def __init__(self, path, weights_hash, conf, imgsz, iou=DEFAULT_NMS_IOU, tiling=None):
+        self.path = Path(path)
+        self.weights_hash = weights_hash
+        self.conf = conf
+        self.imgsz = imgsz
+        self.iou = iou
+        self.tiling = tiling
+        self._entries = {}  # image hash -> ((h, w), xywhr, conf, cls)
+        self._names = {}    # file name -> image hash
+        self._lock = threading.Lock()
+        self._dirty = False
+        if self.path.exists():
+            self._read()
+
+    @classmethod
+    def open(cls, weights, conf, imgsz, iou=DEFAULT_NMS_IOU, tiling=None, cache_dir=CACHE_DIR):
+        """
+        Open the cache for a model at the given inference parameters.
+
+        Args:
+            weights: Path to the model weights (hashed as part of the key)
+            conf: Confidence threshold the caller needs
+            imgsz: Inference image size
+            iou: NMS IoU threshold used at inference
+            tiling: None for full-frame inference, else (tile size, overlap)
+                of tiled inference; the two never share a cache
+            cache_dir: Directory holding the NPZ files
+
+        Returns:
+            PredictionCache whose `conf` is <= the requested conf
+        """
+        weights_hash = file_digest(weights)
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+        # The tightest existing cache at or below the requested threshold
+        best = None
+        mode = "full" if tiling is None else f"tile{tiling[0]}_overlap{tiling[1]:g}"
+        prefix = f"{weights_hash}_imgsz{imgsz}_iou{iou:g}_{mode}"
+        for path in cache_dir.glob(f"{prefix}_conf*.npz"):
+            cached_conf = float(path.stem.rsplit('_conf', 1)[1])
+            if cached_conf <= conf and (best is None or cached_conf > best[0]):
+                best = (cached_conf, path)
+        if best is not None:
+            return cls(best[1], weights_hash, best[0], imgsz, iou, tiling)
+
+        return cls(cache_dir / f"{prefix}_conf{conf:g}.npz", weights_hash, conf, imgsz, iou, tiling)
+
+    def _read(self):
+        with np.load(self.path, allow_pickle=False) as data:
+            offsets = data['offsets']
+            xywhr, conf, cls = data['xywhr'], data['conf'], data['cls'].astype(np.int64)
+            for i, (image_hash, shape) in enumerate(zip(data['image_hashes'].tolist(),
+                                                        data['image_shapes'].tolist())):
+                rows = slice(offsets[i], offsets[i + 1])
+                self._entries[image_hash] = (tuple(shape), xywhr[rows], conf[rows], cls[rows])
+            if 'names' in data:
+                self._names = dict(zip(data['names'].tolist(), data['name_hashes'].tolist()))
+            else:  # Caches written before the name index: one name per hash
+                self._names = dict(zip(data['image_names'].tolist(), data['image_hashes'].tolist()))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, image_hash):
+        return image_hash in self._entries
+
+    def get(self, image_hash, min_conf=None):
+        """Return (shape, xywhr, conf, cls) for an image hash, or None"""
+        entry = self._entries.get(image_hash)
+        if entry is None or min_conf is None:
+            return entry
+        shape, xywhr, conf, cls = entry
+        keep = conf >= min_conf
+        return shape, xywhr[keep], conf[keep], cls[keep]
+
+    def put(self, image_hash, shape, xywhr, conf, cls):
+        """Store the predictions for one image content hash (thread-safe)"""
+        with self._lock:
+            self._entries[image_hash] = (
+                tuple(int(v) for v in shape[:2]),
+                np.asarray(xywhr, np.float32).reshape(-1, 5),
+                np.asarray(conf, np.float32).reshape(-1),
+                np.asarray(cls, np.int64).reshape(-1),
+            )
+            self._dirty = True
+
+    def set_names(self, names):
+        """
+        Replace the name index with the image set being evaluated.
+
+        Args:
+            names: Dict of file name -> image hash; predictions of hashes no longer
+                   named stay stored, so an image that comes back is not re-inferred
+        """
+        with self._lock:
+            names = dict(names)
+            if names != self._names:
+                self._names = names
+                self._dirty = True
+
+    def save(self):
+        """Write the cache atomically if anything changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            hashes = list(self._entries)
+            entries = [self._entries[h] for h in hashes]
+            counts = [len(e[3]) for e in entries]
+
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'wb') as f:
+                np.savez_compressed(
+                    f,
+                    image_hashes=np.array(hashes, dtype=str),
+                    image_shapes=np.array([e[0] for e in entries], dtype=np.int32).reshape(-1, 2),
+                    offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+                    xywhr=np.concatenate([e[1] for e in entries]) if entries else np.zeros((0, 5), np.float32),
+                    conf=np.concatenate([e[2] for e in entries]) if entries else np.zeros(0, np.float32),
+                    cls=np.concatenate([e[3] for e in entries]).astype(np.int16) if entries else np.zeros(0, np.int16),
+                    names=np.array(list(self._names), dtype=str),
+                    name_hashes=np.array(list(self._names.values()), dtype=str),
+                )
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+    def records(self, names=None, min_conf=None):
+        """
+        Yield (image hash, name, shape, xywhr, conf, cls) for every named image,
+        or for a subset of names
+        """
+        for name in (self._names if names is None else names):
+            image_hash = self._names.get(name)
+            entry = None if image_hash is None else self.get(image_hash, min_conf)
+            if entry is not None:
+                yield (image_hash, name) + tuple(entry)
+
+    def to_rows(self, names=None, min_conf=None, class_names=None):
+        """Flat per-detection dictionaries (image, class, confidence) for tables and charts"""
+        class_names = class_names or {}
+        return [
+            {'image': name, 'class': class_names.get(c, str(c)), 'confidence': s}
+            for _, name, _, _, conf, cls in self.records(names, min_conf)
+            for s, c in zip(conf.tolist(), cls.tolist())
+        ]
+
+    def to_predictions(self, names=None, min_conf=None):
+        """Predictions keyed by image stem in the normalized-polygon form obb_metrics expects"""
+        predictions = {}
+        for _, name, (h, w), xywhr, conf, cls in self.records(names, min_conf):
+            polys = xywhr_to_corners(xywhr) / np.array([w, h], dtype=np.float32)
+            predictions[Path(name).stem] = (polys, conf, cls)
+        return predictions
@@ -8,20 +8,192 @@ Usage:
     python prepare_data_for_retraining.py
 """
 
+import errno
 import os
 import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from datetime import datetime
 
+from prediction_cache import file_digest
 
-def merge_datasets(roboflow_dir, training_data_dir, backup=True):
+# Merge configuration
+MERGE_WORKERS = 8
+LINK_MODE = 'auto'        # 'auto' (reflink > hardlink > copy), 'hardlink' or 'copy'
+ON_CONFLICT = 'skip'      # Same name, different content: 'skip' (keep existing) or 'overwrite'
+FICLONE = 0x40049409      # Linux ioctl for copy-on-write clones (btrfs, XFS)
+
+
+def _reflink(src, dst):
+    """Copy-on-write clone of src at dst (Linux only). Returns True on success"""
+    if not sys.platform.startswith('linux'):
+        return False
+    import fcntl
+
+    try:
+        with open(src, 'rb') as s, open(dst, 'wb') as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        shutil.copystat(src, dst)
+        return True
+    except OSError:
+        if dst.exists():
+            dst.unlink()
+        return False
+
+
+def link_or_copy(src, dst, mode=LINK_MODE):
+    """
+    Place src at dst as cheaply as the filesystem allows.
+
+    Reflinks and hardlinks share the data blocks with the source, so they
+    cost no extra disk space and no data is written.
+
+    Args:
+        src: Source file
+        dst: Destination path (must not exist)
+        mode: 'auto', 'hardlink', 'reflink' (never shares an inode: reflink or copy)
+              or 'copy'
+
+    Returns:
+        Tuple (method, bytes_written) where method is 'reflink', 'hardlink' or 'copy'
+    """
+    same_device = mode != 'copy' and src.stat().st_dev == dst.parent.stat().st_dev
+    if same_device:
+        if mode in ('auto', 'reflink') and _reflink(src, dst):
+            return 'reflink', 0
+        if mode == 'reflink':
+            shutil.copy2(src, dst)
+            return 'copy', dst.stat().st_size
+        try:
+            os.link(src, dst)
+            return 'hardlink', 0
+        except OSError as e:
+            if e.errno not in (errno.EPERM, errno.EXDEV, errno.EMLINK, errno.ENOTSUP):
+                raise
+    shutil.copy2(src, dst)
+    return 'copy', dst.stat().st_size
+
+
+def _merge_file(src, dst, dst_by_size, on_conflict, link_mode):
+    """
+    Merge one file and describe what happened.
+
+    Args:
+        dst_by_size: Dict size -> existing destination files of that size, used to
+                     find identical content stored under another name
+
+    Returns:
+        Dict with action ('added', 'identical', 'duplicate', 'conflict', 'overwritten'),
+        method, bytes_written and, for duplicates/conflicts, the other path
+    """
+    result = {'src': str(src), 'dst': str(dst), 'method': None, 'bytes_written': 0}
+    size = src.stat().st_size
+
+    if dst.exists():
+        if dst.stat().st_size == size and file_digest(dst) == file_digest(src):
+            return {**result, 'action': 'identical'}
+        if on_conflict != 'overwrite':
+            return {**result, 'action': 'conflict'}
+        dst.unlink()
+        method, written = link_or_copy(src, dst, link_mode)
+        return {**result, 'action': 'overwritten', 'method': method, 'bytes_written': written}
+
+    # Only files of exactly the same size can hold the same content
+    candidates = dst_by_size.get(size, [])
+    if candidates:
+        digest = file_digest(src)
+        for other in candidates:
+            if file_digest(other) == digest:
+                return {**result, 'action': 'duplicate', 'other': str(other)}
+
+    method, written = link_or_copy(src, dst, link_mode)
+    return {**result, 'action': 'added', 'method': method, 'bytes_written': written}
+
+
+def _merge_dir(src_dir, dst_dir, pool, on_conflict, link_mode, dedup=True, held_back=None):
+    """
+    Merge every file of src_dir into dst_dir in parallel.
+
+    Args:
+        held_back: Dict stem -> image result; files with these stems are not merged
+                   and are reported with the image's action ('duplicate' or 'conflict')
+
+    Returns:
+        Per-file results
+    """
+    held_back = held_back or {}
+    if not src_dir.exists():
+        return []
+    dst_dir.mkdir(parents=True, exist_ok=True)
+
+    dst_by_size = {}
+    if dedup:
+        for existing in dst_dir.iterdir():
+            if existing.is_file():
+                dst_by_size.setdefault(existing.stat().st_size, []).append(existing)
+
+    files = [f for f in src_dir.iterdir() if f.is_file()]
+    skipped = [{'src': str(f), 'dst': str(dst_dir / f.name), 'method': None, 'bytes_written': 0,
+                'action': held_back[f.stem]['action'], 'other': held_back[f.stem]['src']}
+               for f in files if f.stem in held_back]
+    sources = [f for f in files if f.stem not in held_back]
+    return skipped + list(pool.map(lambda f: _merge_file(f, dst_dir / f.name, dst_by_size, on_conflict,
+                                                         link_mode), sources))
+
+
+def print_merge_report(report):
+    """Print per-split merge counts, bytes written and any conflicts"""
+    print("\n" + "=" * 70)
+    print("📦 MERGE REPORT")
+    print("=" * 70)
+    actions = ('added', 'identical', 'duplicate', 'conflict', 'overwritten')
+    print(f"  {'Split':<8}" + "".join(f"{a:>13}" for a in actions))
+    for split, results in report['splits'].items():
+        counts = [sum(r['action'] == a for r in results) for a in actions]
+        print(f"  {split:<8}" + "".join(f"{c:>13}" for c in counts))
+
+    methods = {}
+    for results in report['splits'].values():
+        for r in results:
+            if r['method']:
+                methods[r['method']] = methods.get(r['method'], 0) + 1
+    placement = ", ".join(f"{m} {n}" for m, n in sorted(methods.items())) or "nothing new"
+    print(f"\n  Placement: {placement}")
+    print(f"  Bytes written: {report['bytes_written'] / 1e6:.2f} MB "
+          f"(saved {report['bytes_saved'] / 1e6:.2f} MB by linking/skipping)")
+
+    conflicts = [r for results in report['splits'].values() for r in results if r['action'] == 'conflict']
+    if conflicts:
+        print(f"\n  ⚠️  {len(conflicts)} name conflicts kept the existing file (ON_CONFLICT='skip'):")
+        for r in conflicts[:20]:
+            held = " (label held back with its image)" if 'other' in r else ""
+            print(f"     {r['src']} ≠ {r['dst']}{held}")
+        if len(conflicts) > 20:
+            print(f"     ... and {len(conflicts) - 20} more")
+    print("=" * 70)
+
+
+def merge_datasets(roboflow_dir, training_data_dir, backup=True, workers=MERGE_WORKERS,
+                   on_conflict=ON_CONFLICT, link_mode=LINK_MODE):
     """
     Merge Roboflow-annotated images with original training data.
+
+    Files already present with identical content are skipped, images whose
+    content already exists under another name are skipped together with their
+    label, and name collisions (whose labels are held back with the image) with different content are reported instead of
+    silently overwritten. New files are reflinked or hardlinked when source and
+    destination share a filesystem, and copied otherwise.
     
     Args:
         roboflow_dir: Path to Roboflow export directory
         training_data_dir: Path to TRAINING_DATA directory
-        backup: Whether to backup original data first
+        backup: Whether to snapshot the original data first (see snapshot_store.py)
+        workers: Threads hashing and placing files
+        on_conflict: 'skip' to keep the existing file, 'overwrite' to replace it
+        link_mode: 'auto', 'hardlink' or 'copy'
+
+    Returns:
+        Report dictionary with per-file results, bytes_written and bytes_saved
     """
     
     roboflow_path = Path(roboflow_dir)
@@ -31,101 +203,67 @@ def merge_datasets(roboflow_dir, training_data_dir, backup=True):
     print("🔄 MERGING DATASETS")
     print("=" * 70)
     
-    # Backup original data
-    if backup:
-        print("\n📦 Backing up original data...")
-        backup_dir = training_path.parent / f"TRAINING_DATA_BACKUP_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        shutil.copytree(training_path, backup_dir)
-        print(f"✓ Backup created: {backup_dir}")
+    # Snapshot original data (only contents new since the last snapshot are stored)
+    if backup and training_path.exists():
+        from snapshot_store import create_snapshot
+
+        print("\n📸 Snapshotting original data...")
+        store_dir = training_path.parent / f"{training_path.name}_SNAPSHOTS"
+        name = create_snapshot(training_path, store_dir, label='pre-merge', workers=workers)
+        print(f"  Restore with: python snapshot_store.py --store {store_dir} restore {name} --target {training_path}")
     
     # Merge for each split (train, val, test)
     splits = ['train', 'val', 'test']
-    
-    for split in splits:
-        print(f"\n📋 Merging {split.upper()} data...")
-        
-        src_images = roboflow_path / split / 'images'
-        src_labels = roboflow_path / split / 'labels'
-        
-        dst_images = training_path / split / 'images'
-        dst_labels = training_path / split / 'labels'
-        
-        # Create directories if they don't exist
-        dst_images.mkdir(parents=True, exist_ok=True)
-        dst_labels.mkdir(parents=True, exist_ok=True)
-        
-        # Copy images
-        if src_images.exists():
-            image_count = 0
-            for img_file in src_images.glob('*'):
-                if img_file.is_file():
-                    shutil.copy2(img_file, dst_images / img_file.name)
-                    image_count += 1
-            print(f"  ✓ Copied {image_count} images to {split}")
-        
-        # Copy labels
-        if src_labels.exists():
-            label_count = 0
-            for label_file in src_labels.glob('*'):
-                if label_file.is_file():
-                    shutil.copy2(label_file, dst_labels / label_file.name)
-                    label_count += 1
-            print(f"  ✓ Copied {label_count} labels to {split}")
-    
+    report = {'splits': {}, 'bytes_written': 0, 'bytes_saved': 0}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for split in splits:
+            print(f"\n📋 Merging {split.upper()} data...")
+
+            src_split = roboflow_path / split
+            dst_split = training_path / split
+
+            # Images first: a label whose image was not merged (duplicate, or a conflict that
+            # kept the existing image) must not be paired with the image already there
+            image_results = _merge_dir(src_split / 'images', dst_split / 'images', pool, on_conflict, link_mode)
+            held_back = {Path(r['src']).stem: r for r in image_results if r['action'] in ('duplicate', 'conflict')}
+            label_results = _merge_dir(src_split / 'labels', dst_split / 'labels', pool, on_conflict, link_mode,
+                                       dedup=False, held_back=held_back)
+            results = image_results + label_results
+            report['splits'][split] = results
+
+            added = sum(r['action'] in ('added', 'overwritten') for r in results)
+            print(f"  ✓ {split}: {added} new files, {len(results) - added} skipped")
+
+    for results in report['splits'].values():
+        for r in results:
+            report['bytes_written'] += r['bytes_written']
+            if r['bytes_written'] == 0 and r['action'] != 'conflict':
+                report['bytes_saved'] += Path(r['src']).stat().st_size
+
+    print_merge_report(report)
     print("\n✅ MERGE COMPLETE")
+    return report
 
 
 def verify_dataset(training_data_dir):
     """
-    Verify dataset structure and counts.
+    Verify dataset structure, image/label pairing and label contents.
+
+    Runs dataset_verifier (process pool, per-file results cached by hash) and
+    writes <training_data_dir>/verification_report.json.
     
     Args:
         training_data_dir: Path to TRAINING_DATA directory
     
     Returns:
-        Dictionary with dataset statistics
+        Dictionary with per-split statistics (images, labels, paired, instances, issues)
     """
-    
-    training_path = Path(training_data_dir)
-    
-    print("\n" + "=" * 70)
-    print("📊 DATASET VERIFICATION")
-    print("=" * 70)
-    
-    stats = {}
-    total_images = 0
-    total_labels = 0
-    
-    for split in ['train', 'val', 'test']:
-        split_path = training_path / split
-        
-        images_dir = split_path / 'images'
-        labels_dir = split_path / 'labels'
-        
-        img_count = len(list(images_dir.glob('*'))) if images_dir.exists() else 0
-        label_count = len(list(labels_dir.glob('*'))) if labels_dir.exists() else 0
-        
-        stats[split] = {
-            'images': img_count,
-            'labels': label_count
-        }
-        
-        total_images += img_count
-        total_labels += label_count
-        
-        print(f"\n{split.upper()}:")
-        print(f"  Images: {img_count}")
-        print(f"  Labels: {label_count}")
-        print(f"  Match: {'✓ Yes' if img_count == label_count else '❌ No (MISMATCH!)'}")
-    
-    print(f"\n{'='*70}")
-    print(f"📈 TOTAL:")
-    print(f"  Total Images: {total_images}")
-    print(f"  Total Labels: {total_labels}")
-    print(f"  Overall Match: {'✓ Yes' if total_images == total_labels else '❌ No (CHECK MISMATCHES!)'}")
-    print(f"{'='*70}")
-    
-    return stats
+    from dataset_verifier import verify_dataset_tree, print_verification
+
+    report = verify_dataset_tree(training_data_dir)
+    print_verification(report)
+    return report['splits']
 
 
 def update_data_yaml(data_yaml_path, training_data_dir):
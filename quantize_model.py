@@ -0,0 +1,263 @@
+"""
+INT8 Post-Training Quantization
+===============================
+Quantizes the exported CPU model to INT8 using a class-balanced calibration
+sample from dataset/train/images, then validates both models on the test
+split and only accepts the INT8 model if crack recall stays within tolerance.
+A rejected model is moved to <run>/weights/int8_rejected/ and the command
+exits with status 1.
+
+Usage:
+    python quantize_model.py
+"""
+
+import json
+import random
+import shutil
+import sys
+from collections import Counter
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+from ultralytics import YOLO
+
+from export_cpu_model import find_best_weights, export_cpu_artifacts, IMG_SIZE
+from label_store import LabelStore
+
+# Configuration
+DATA_YAML = Path("dataset/data.yaml")
+TRAIN_IMAGES_DIR = Path("dataset/train/images")
+TRAIN_LABELS_DIR = Path("dataset/train/labels")
+QUANT_BACKEND = 'onnxruntime'   # 'onnxruntime' (static QDQ) or 'openvino' (NNCF)
+CALIBRATION_IMAGES = 300
+CALIBRATION_SEED = 0
+
+# Acceptance gate: maximum allowed drop in crack recall (absolute)
+CRACK_RECALL_TOLERANCE = 0.02
+GATE_CLASS = 'crack'
+REJECTED_DIR_NAME = 'int8_rejected'   # Quarantine next to best.pt for rejected INT8 models
+
+
+def load_class_names(data_yaml=DATA_YAML):
+    """Read the class id -> name mapping from data.yaml"""
+    with open(data_yaml, 'r') as f:
+        names = yaml.safe_load(f)['names']
+    return dict(enumerate(names)) if isinstance(names, list) else {int(k): v for k, v in names.items()}
+
+
+def sample_calibration_images(class_names, num_images=CALIBRATION_IMAGES, seed=CALIBRATION_SEED,
+                              images_dir=TRAIN_IMAGES_DIR, labels_dir=TRAIN_LABELS_DIR):
+    """
+    Pick a calibration sample whose class mix follows the training set.
+
+    Each class gets a quota proportional to its instance count (at least one
+    image for every class present), filled with images containing that class.
+
+    Returns:
+        Sorted list of image paths
+    """
+    rng = random.Random(seed)
+    images_by_stem = {p.stem: p for p in images_dir.glob('*') if p.is_file()}
+
+    instances = Counter()
+    images_with_class = {class_id: [] for class_id in class_names}
+    labels = LabelStore.for_labels_dir(labels_dir)
+    for stem in sorted(labels):
+        img_path = images_by_stem.get(stem)
+        if img_path is None:
+            continue
+        classes = labels[stem][1].tolist()
+        instances.update(classes)
+        for class_id in set(classes):
+            images_with_class.setdefault(class_id, []).append(img_path)
+
+    total = sum(instances.values()) or 1
+    chosen = set()
+    for class_id, count in instances.most_common()[::-1]:  # Rarest classes first
+        pool = [p for p in images_with_class[class_id] if p not in chosen]
+        quota = max(1, round(num_images * count / total))
+        chosen.update(rng.sample(pool, min(quota, len(pool))))
+
+    print(f"  Calibration sample: {len(chosen)} images")
+    for class_id, count in sorted(instances.items()):
+        print(f"    {class_names.get(class_id, class_id):.<20} {count / total:>6.1%} of instances")
+    return sorted(chosen)
+
+
+def letterbox(img, size=IMG_SIZE):
+    """Resize keeping aspect ratio and pad to size x size, as Ultralytics does"""
+    h, w = img.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    resized = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, left = (size - new_h) // 2, (size - new_w) // 2
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    canvas[top:top + new_h, left:left + new_w] = resized
+    return canvas
+
+
+def _onnx_calibration_reader(image_paths, input_name):
+    """Build an onnxruntime CalibrationDataReader over the calibration sample"""
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self._paths = iter(image_paths)
+
+        def get_next(self):
+            for path in self._paths:
+                img = cv2.imread(str(path))
+                if img is None:
+                    continue
+                rgb = cv2.cvtColor(letterbox(img), cv2.COLOR_BGR2RGB)
+                tensor = rgb.transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+                return {input_name: tensor}
+            return None
+
+    return _Reader()
+
+
+def quantize_onnx(onnx_path, image_paths):
+    """Static QDQ INT8 quantization of an ONNX model with onnxruntime"""
+    import onnxruntime as ort
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+
+    input_name = ort.InferenceSession(str(onnx_path), providers=['CPUExecutionProvider']).get_inputs()[0].name
+    output_path = onnx_path.with_name(f"{onnx_path.stem}_int8.onnx")
+    quantize_static(
+        str(onnx_path), str(output_path),
+        _onnx_calibration_reader(image_paths, input_name),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+    return output_path
+
+
+def quantize_openvino(weights, image_paths):
+    """NNCF INT8 export through Ultralytics, calibrated on the same sample"""
+    calib_dir = Path(weights).parent / "int8_calibration"
+    calib_dir.mkdir(exist_ok=True)
+    (calib_dir / "images.txt").write_text("\n".join(str(p.absolute()) for p in image_paths) + "\n")
+
+    # Ultralytics calibrates INT8 exports on the 'val' split of the data yaml;
+    # a .txt split lets us hand it exactly our class-balanced sample
+    with open(DATA_YAML, 'r') as f:
+        data = yaml.safe_load(f)
+    data.update(path=str(calib_dir.absolute()), train='images.txt', val='images.txt')
+    data.pop('test', None)
+    calib_yaml = calib_dir / "calibration.yaml"
+    with open(calib_yaml, 'w') as f:
+        yaml.safe_dump(data, f)
+
+    path = YOLO(str(weights)).export(format='openvino', int8=True, data=str(calib_yaml), imgsz=IMG_SIZE)
+    return Path(path)
+
+
+def validate(model_path, class_names):
+    """Run test-split validation and return mAP50 plus per-class recall"""
+    model = YOLO(str(model_path), task='obb')
+    metrics = model.val(data=str(DATA_YAML), split='test', imgsz=IMG_SIZE, batch=1,
+                        plots=False, verbose=False)
+    recall = {class_names[int(c)]: float(r) for c, r in zip(metrics.box.ap_class_index, metrics.box.r)}
+    return {'mAP50': float(metrics.box.map50), 'mAP50-95': float(metrics.box.map), 'recall': recall}
+
+
+def build_report(fp32, int8, fp32_path, int8_path):
+    """Compare FP32 and INT8 metrics and apply the crack-recall gate"""
+    recall_delta = {name: int8['recall'].get(name, 0.0) - r for name, r in fp32['recall'].items()}
+    gate_drop = -recall_delta.get(GATE_CLASS, 0.0)
+    return {
+        'fp32_model': str(fp32_path),
+        'int8_model': str(int8_path),
+        'backend': QUANT_BACKEND,
+        'fp32': fp32,
+        'int8': int8,
+        'delta': {'mAP50': int8['mAP50'] - fp32['mAP50'], 'recall': recall_delta},
+        'gate': {'class': GATE_CLASS, 'recall_drop': gate_drop, 'tolerance': CRACK_RECALL_TOLERANCE},
+        'accepted': gate_drop <= CRACK_RECALL_TOLERANCE,
+    }
+
+
+def print_report(report):
+    """Print the accuracy-delta report"""
+    print("\n" + "="*60)
+    print("📉 INT8 ACCURACY DELTA REPORT")
+    print("="*60)
+    print(f"  mAP@50: {report['fp32']['mAP50']:.4f} -> {report['int8']['mAP50']:.4f} "
+          f"({report['delta']['mAP50']:+.4f})")
+    print("\n  Per-Class Recall:")
+    for name, r in report['fp32']['recall'].items():
+        print(f"    {name:.<20} {r:.4f} -> {report['int8']['recall'].get(name, 0.0):.4f} "
+              f"({report['delta']['recall'][name]:+.4f})")
+    gate = report['gate']
+    print(f"\n  {gate['class']} recall drop: {gate['recall_drop']:.4f} (tolerance {gate['tolerance']})")
+    print(f"  Result: {'✅ ACCEPTED' if report['accepted'] else '❌ REJECTED'}")
+    print("="*60)
+
+
+def quarantine(int8_path):
+    """Move a rejected INT8 artifact (file or OpenVINO directory) out of the weights folder"""
+    int8_path = Path(int8_path)
+    target_dir = int8_path.parent / REJECTED_DIR_NAME
+    target_dir.mkdir(exist_ok=True)
+    target = target_dir / int8_path.name
+    if target.is_dir():
+        shutil.rmtree(target)
+    elif target.exists():
+        target.unlink()
+    shutil.move(str(int8_path), str(target))
+    return target
+
+
+def quantize(weights):
+    """
+    Quantize, validate and gate one model.
+
+    The INT8 artifact stays next to best.pt only if the gate accepts it;
+    otherwise it is quarantined in int8_rejected/.
+
+    Returns:
+        Report dictionary
+    """
+    class_names = load_class_names()
+    image_paths = sample_calibration_images(class_names)
+
+    if QUANT_BACKEND == 'openvino':
+        int8_path = quantize_openvino(weights, image_paths)
+    else:
+        onnx_path = Path(weights).with_suffix('.onnx')
+        if not onnx_path.exists():
+            # export_cpu_artifacts reports a failed export and leaves it out of the result
+            onnx_path = export_cpu_artifacts(weights, formats=('onnx',)).get('onnx')
+            if onnx_path is None:
+                raise RuntimeError(f"ONNX export of {weights} failed (see the error above); nothing to quantize")
+        int8_path = quantize_onnx(onnx_path, image_paths)
+    print(f"  ✓ INT8 model: {int8_path}")
+
+    report = build_report(validate(weights, class_names), validate(int8_path, class_names),
+                          weights, int8_path)
+    if not report['accepted']:
+        report['int8_model'] = str(quarantine(int8_path))
+
+    report_path = Path(weights).parent / "int8_report.json"
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    if not report['accepted']:
+        print(f"  ⚠️  Rejected INT8 model moved to: {report['int8_model']}")
+    print(f"  Report saved: {report_path}")
+    return report
+
+
+if __name__ == '__main__':
+    weights = find_best_weights()
+    if weights is None:
+        print("❌ No best.pt found under runs/obb")
+    else:
+        print(f"🧮 Quantizing {weights} ({QUANT_BACKEND})")
+        if not quantize(weights)['accepted']:
+            sys.exit(1)  # Lets CI fail on a rejected INT8 model
@@ -0,0 +1,313 @@
+"""
+Evaluation Report Figures
+=========================
+Renders the evaluation figures with matplotlib's object-oriented API
+(`Figure` + Agg, no pyplot global state), so independent figures can be
+drawn in parallel worker processes.
+
+Each figure is described by a job: the renderer name, the output file, the
+input files it reads and its parameters. The BLAKE2b of those inputs and
+parameters is stored in evaluation/.figure_hashes.json after a render; a
+figure whose hash is unchanged and whose PNG still exists is skipped, so
+re-running the report after a no-op costs only hashing a few small files.
+
+    training_curves      <- results.csv
+    prediction_analysis  <- prediction cache NPZ (+ confidence threshold)
+    pr_curves            <- obb_metrics.json
+    confusion_matrix     <- obb_metrics.json
+
+Usage:
+    from report_figures import render_figures, training_curves_job
+    render_figures([training_curves_job("runs/obb/wedtect-obb-final4/results.csv")])
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Renderer configuration
+OUTPUT_DIR = Path("evaluation")
+HASH_FILE = ".figure_hashes.json"
+RENDER_WORKERS = min(4, os.cpu_count() or 1)
+RENDER_VERSION = 1   # Bump when a renderer's drawing code changes, to force a re-render
+
+
+def _new_figure(figsize):
+    from matplotlib.figure import Figure
+
+    return Figure(figsize=figsize)
+
+
+def _save(fig, output_path, dpi):
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output_path.with_name(f".{output_path.stem}.{os.getpid()}.png")
+    fig.savefig(tmp, dpi=dpi, bbox_inches='tight')
+    os.replace(tmp, output_path)
+
+
+# ----------------------------------------------------------------------
+# Renderers (module-level so worker processes can look them up by name)
+# ----------------------------------------------------------------------
+
+def render_training_curves(inputs, output_path, params):
+    """Six-panel training figure: total and component losses, P, R, mAP50, mAP50-95"""
+    from run_metrics import LOSS_COMPONENTS, load_run_metrics
+
+    metrics = load_run_metrics(inputs[0])
+    epochs = metrics.epoch
+
+    fig = _new_figure((15, 12))
+    axes = fig.subplots(3, 2)
+    fig.suptitle('YOLOv8 OBB Training Metrics - Wedtect Dataset', fontsize=16, fontweight='bold')
+
+    # 1. Train vs Validation Loss (box + cls + dfl)
+    axes[0, 0].plot(epochs, metrics.train_loss, label='Train Loss', linewidth=2)
+    axes[0, 0].plot(epochs, metrics.val_loss, label='Val Loss', linewidth=2)
+    axes[0, 0].axvline(metrics.best_epoch, color='gray', linestyle='--', alpha=0.6, label='Best mAP@50-95')
+    axes[0, 0].set_title('Training vs Validation Loss', fontweight='bold')
+    axes[0, 0].set_xlabel('Epoch')
+    axes[0, 0].set_ylabel('Loss')
+    axes[0, 0].legend()
+    axes[0, 0].grid(True, alpha=0.3)
+
+    # 2. Box Loss, DFL Loss, Cls Loss
+    for component, label in zip(LOSS_COMPONENTS, ('Box Loss', 'Class Loss', 'DFL Loss')):
+        if f'train/{component}' in metrics:
+            axes[0, 1].plot(epochs, metrics[f'train/{component}'], label=label, linewidth=2)
+    axes[0, 1].set_title('Component Losses Over Time', fontweight='bold')
+    axes[0, 1].set_xlabel('Epoch')
+    axes[0, 1].set_ylabel('Loss Value')
+    axes[0, 1].legend()
+    axes[0, 1].grid(True, alpha=0.3)
+
+    # 3-6. Validation metrics
+    panels = [
+        (axes[1, 0], metrics.precision, 'Precision', 'green', 'o'),
+        (axes[1, 1], metrics.recall, 'Recall', 'blue', 'o'),
+        (axes[2, 0], metrics.map50, 'mAP@50', 'red', 's'),
+        (axes[2, 1], metrics.map50_95, 'mAP@50-95', 'purple', 'd'),
+    ]
+    for ax, series, name, color, marker in panels:
+        if series is None:
+            continue
+        ax.plot(epochs, series, color=color, linewidth=2, marker=marker, markersize=4)
+        ax.set_title(f'{name} Over Epochs', fontweight='bold')
+        ax.set_xlabel('Epoch')
+        ax.set_ylabel(name)
+        ax.set_ylim([0, 1])
+        ax.grid(True, alpha=0.3)
+
+    fig.tight_layout()
+    _save(fig, output_path, params['dpi'])
+
+
+def render_prediction_analysis(inputs, output_path, params):
+    """Detections per class and per-class confidence histograms from the prediction cache"""
+    from prediction_cache import PredictionCache
+
+    class_names = {int(k): v for k, v in params['class_names'].items()}
+    cache = PredictionCache(inputs[0], None, params['conf'], None)
+    rows = cache.to_rows(min_conf=params['conf'], class_names=class_names)
+
+    confidences = {}
+    for row in rows:
+        confidences.setdefault(row['class'], []).append(row['confidence'])
+    ordered = sorted(confidences, key=lambda name: -len(confidences[name]))
+
+    def color(name):
+        return tuple(c / 255 for c in params['colors'].get(name, (100, 100, 100)))
+
+    fig = _new_figure((14, 5))
+    axes = fig.subplots(1, 2)
+    fig.suptitle('Test Set Prediction Analysis', fontsize=14, fontweight='bold')
+
+    # Class distribution
+    axes[0].bar(ordered, [len(confidences[name]) for name in ordered], color=[color(n) for n in ordered],
+                alpha=0.7, edgecolor='black', linewidth=2)
+    axes[0].set_title('Detections by Class', fontweight='bold')
+    axes[0].set_xlabel('Class')
+    axes[0].set_ylabel('Number of Detections')
+    axes[0].grid(axis='y', alpha=0.3)
+
+    # Confidence distribution
+    for name in ordered:
+        axes[1].hist(confidences[name], alpha=0.5, label=name, bins=10, color=color(name), edgecolor='black')
+    axes[1].set_title('Confidence Distribution', fontweight='bold')
+    axes[1].set_xlabel('Confidence Score')
+    axes[1].set_ylabel('Frequency')
+    axes[1].legend()
+    axes[1].grid(alpha=0.3)
+
+    fig.tight_layout()
+    _save(fig, output_path, params['dpi'])
+
+
+def render_pr_curves(inputs, output_path, params):
+    """Per-class precision-recall curves at IoU 0.5 from obb_metrics.json"""
+    with open(inputs[0]) as f:
+        metrics = json.load(f)
+
+    fig = _new_figure((8, 6))
+    ax = fig.subplots()
+    for name, stats in metrics['classes'].items():
+        ax.plot(metrics['pr_curves']['recall'], metrics['pr_curves'][name], linewidth=2,
+                label=f"{name} (AP50 {stats['ap50']:.3f})")
+    ax.set_title(f"Precision-Recall @ IoU 0.5 (mAP50 {metrics['mAP50']:.3f})", fontweight='bold')
+    ax.set_xlabel('Recall')
+    ax.set_ylabel('Precision')
+    ax.set_xlim([0, 1])
+    ax.set_ylim([0, 1.05])
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    _save(fig, output_path, params['dpi'])
+
+
+def render_confusion_matrix(inputs, output_path, params):
+    """Class confusion matrix (with background row/column) from obb_metrics.json"""
+    import numpy as np
+
+    with open(inputs[0]) as f:
+        metrics = json.load(f)
+
+    labels = list(metrics['classes']) + ['background']
+    matrix = np.array(metrics['confusion_matrix'])
+    fig = _new_figure((7, 6))
+    ax = fig.subplots()
+    im = ax.imshow(matrix, cmap='Blues')
+    fig.colorbar(im, ax=ax)
+    ax.set_xticks(range(len(labels)), labels, rotation=45)
+    ax.set_yticks(range(len(labels)), labels)
+    for (row, col), value in np.ndenumerate(matrix):
+        ax.text(col, row, str(value), ha='center', va='center')
+    ax.set_xlabel('True')
+    ax.set_ylabel('Predicted')
+    ax.set_title(f"Confusion Matrix (conf ≥ {params['confusion_conf']}, IoU ≥ {params['confusion_iou']})",
+                 fontweight='bold')
+    _save(fig, output_path, params['dpi'])
+
+
+RENDERERS = {
+    'training_curves': render_training_curves,
+    'prediction_analysis': render_prediction_analysis,
+    'pr_curves': render_pr_curves,
+    'confusion_matrix': render_confusion_matrix,
+}
+
+
+# ----------------------------------------------------------------------
+# Jobs
+# ----------------------------------------------------------------------
+
+def training_curves_job(results_file, output_dir=OUTPUT_DIR, dpi=300):
+    return {'name': 'training_curves', 'inputs': [str(results_file)],
+            'output': str(Path(output_dir) / "training_metrics_detailed.png"), 'params': {'dpi': dpi}}
+
+
+def prediction_analysis_job(cache_path, conf, class_names, colors, output_dir=OUTPUT_DIR, dpi=300):
+    params = {'dpi': dpi, 'conf': conf, 'class_names': {str(k): v for k, v in class_names.items()},
+              'colors': {k: list(v) for k, v in colors.items()}}
+    return {'name': 'prediction_analysis', 'inputs': [str(cache_path)],
+            'output': str(Path(output_dir) / "prediction_analysis.png"), 'params': params}
+
+
+def evaluation_jobs(metrics_json, confusion_conf, confusion_iou, output_dir=OUTPUT_DIR, dpi=150):
+    """PR-curve and confusion-matrix jobs for an obb_metrics.json"""
+    return [
+        {'name': 'pr_curves', 'inputs': [str(metrics_json)],
+         'output': str(Path(output_dir) / "pr_curves.png"), 'params': {'dpi': dpi}},
+        {'name': 'confusion_matrix', 'inputs': [str(metrics_json)],
+         'output': str(Path(output_dir) / "confusion_matrix.png"),
+         'params': {'dpi': dpi, 'confusion_conf': confusion_conf, 'confusion_iou': confusion_iou}},
+    ]
+
+
+def job_hash(job):
+    """BLAKE2b of the renderer, its parameters and the content of every input file"""
+    from prediction_cache import file_digest
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([RENDER_VERSION, job['name'], job['params']], sort_keys=True).encode())
+    for path in job['inputs']:
+        digest.update(file_digest(path).encode())
+    return digest.hexdigest()
+
+
+def _render(job):
+    """Worker entry point. Returns (name, seconds, error message or None)"""
+    start = time.perf_counter()
+    try:
+        RENDERERS[job['name']](job['inputs'], job['output'], job['params'])
+        error = None
+    except Exception as e:  # One bad input must not cost the other figures their render
+        error = f"{type(e).__name__}: {e}"
+    return job['name'], time.perf_counter() - start, error
+
+
+def _hash_file(output_dir):
+    return Path(output_dir) / HASH_FILE
+
+
+def render_figures(jobs, output_dir=OUTPUT_DIR, force=False, workers=RENDER_WORKERS):
+    """
+    Render the figures whose inputs changed since their last render.
+
+    Args:
+        jobs: Job dictionaries from the *_job helpers
+        output_dir: Directory holding the hash manifest
+        force: Re-render everything
+        workers: Worker processes (a single stale figure is rendered in-process)
+
+    Returns:
+        Dictionary of figure name -> 'rendered', 'cached', 'failed' or 'missing input'
+    """
+    manifest_path = _hash_file(output_dir)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    status, stale = {}, []
+    for job in jobs:
+        if not all(Path(p).exists() for p in job['inputs']):
+            status[job['name']] = 'missing input'
+            continue
+        job['hash'] = job_hash(job)
+        key = job['output']
+        if not force and manifest.get(key) == job['hash'] and Path(job['output']).exists():
+            status[job['name']] = 'cached'
+        else:
+            stale.append(job)
+
+    if len(stale) == 1:
+        timings = [_render(stale[0])]
+    elif stale:
+        with ProcessPoolExecutor(max_workers=min(workers, len(stale))) as pool:
+            timings = list(pool.map(_render, stale))
+    else:
+        timings = []
+
+    for job, (name, seconds, error) in zip(stale, timings):
+        if error is not None:
+            manifest.pop(job['output'], None)
+            status[name] = 'failed'
+            print(f"  ❌ {name}: {error}")
+            continue
+        manifest[job['output']] = job['hash']
+        status[name] = 'rendered'
+        print(f"  🖼️  {Path(job['output']).name}: rendered in {seconds:.2f}s")
+    for name, state in status.items():
+        if state in ('cached', 'missing input'):
+            print(f"  {'✓' if state == 'cached' else '⚠️ '} {name}: {state}")
+
+    if stale:
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = manifest_path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, manifest_path)
+    return status
@@ -0,0 +1,233 @@
+"""
+Run Metrics Loader
+==================
+One parser for the Ultralytics results.csv written by every training run,
+shared by evaluate_and_test.py, train_local.py and monitor_training.py.
+
+- the file is read once per (path, mtime, size); later calls return the
+  same RunMetrics object until training appends a row
+- columns are NumPy float views into one 2-D array, so reporters slice
+  series instead of re-parsing text or importing pandas
+- derived series use the columns Ultralytics actually writes: there is no
+  train/loss or val/loss column, so the totals are the sum of the box, cls
+  and dfl components
+
+Usage:
+    from run_metrics import load_run_metrics
+    metrics = load_run_metrics("runs/obb/wedtect-obb-final4/results.csv")
+    metrics.map50_95[metrics.best_index], metrics.train_loss[-1]
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+# Column names written by Ultralytics for OBB training
+EPOCH = 'epoch'
+TIME = 'time'
+PRECISION = 'metrics/precision(B)'
+RECALL = 'metrics/recall(B)'
+MAP50 = 'metrics/mAP50(B)'
+MAP50_95 = 'metrics/mAP50-95(B)'
+LOSS_COMPONENTS = ('box_loss', 'cls_loss', 'dfl_loss')
+
+_CACHE = {}  # resolved path -> ((mtime_ns, size), RunMetrics)
+
+
+def parse_results_lines(lines, header=None):
+    """
+    Parse results.csv lines (fields may be space-padded).
+
+    Args:
+        lines: Iterable of text lines
+        header: Column names if the header line was already consumed
+
+    Returns:
+        Tuple (header, list of float rows); lines that are not numeric (a
+        repeated header after a resume, a damaged row) are skipped
+    """
+    rows = []
+    for line in lines:
+        fields = [field.strip() for field in line.split(',')]
+        if not any(fields):
+            continue
+        if header is None:
+            header = fields
+            continue
+        if len(fields) != len(header):
+            continue
+        try:
+            rows.append([float(value) for value in fields])
+        except ValueError:
+            continue
+    return header, rows
+
+
+class RunMetrics:
+    """
+    Parsed results.csv of one training run.
+
+    Args:
+        columns: Column names in file order
+        values: 2-D float array, one row per epoch
+        path: Source file (informational)
+    """
+
+    def __init__(self, columns, values, path=None):
+        self.columns = list(columns)
+        self.values = np.asarray(values, dtype=np.float64).reshape(-1, len(self.columns))
+        self.path = Path(path) if path else None
+        self._index = {name: i for i, name in enumerate(self.columns)}
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __getitem__(self, name):
+        """Column as a read-only view (KeyError if the run did not log it)"""
+        view = self.values[:, self._index[name]]
+        view.flags.writeable = False
+        return view
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def extend(self, rows):
+        """New RunMetrics with rows appended (used when tailing a live run)"""
+        if not rows:
+            return self
+        return RunMetrics(self.columns, np.vstack([self.values, np.asarray(rows, dtype=np.float64)]), self.path)
+
+    def row(self, index):
+        """One epoch as a dictionary of column -> float"""
+        return dict(zip(self.columns, self.values[index].tolist()))
+
+    # ------------------------------------------------------------------
+    # Named and derived series
+    # ------------------------------------------------------------------
+
+    @property
+    def epoch(self):
+        return self[EPOCH].astype(int)
+
+    @property
+    def time(self):
+        return self.get(TIME)
+
+    @property
+    def precision(self):
+        return self.get(PRECISION)
+
+    @property
+    def recall(self):
+        return self.get(RECALL)
+
+    @property
+    def map50(self):
+        return self.get(MAP50)
+
+    @property
+    def map50_95(self):
+        return self.get(MAP50_95)
+
+    def total_loss(self, split):
+        """Sum of the box/cls/dfl losses for 'train' or 'val' (zeros if none were logged)"""
+        parts = [self[f"{split}/{c}"] for c in LOSS_COMPONENTS if f"{split}/{c}" in self]
+        return np.sum(parts, axis=0) if parts else np.zeros(len(self))
+
+    @property
+    def train_loss(self):
+        return self.total_loss('train')
+
+    @property
+    def val_loss(self):
+        return self.total_loss('val')
+
+    @property
+    def fitness(self):
+        """Ultralytics' default fitness, which decides best.pt and early stopping"""
+        zeros = np.zeros(len(self))
+        return 0.1 * self.get(MAP50, zeros) + 0.9 * self.get(MAP50_95, zeros)
+
+    @property
+    def best_index(self):
+        """Row of the best epoch by mAP50-95 (falls back to the last row)"""
+        if not len(self):
+            return None
+        return int(np.argmax(self.map50_95)) if MAP50_95 in self else len(self) - 1
+
+    @property
+    def best_epoch(self):
+        return None if self.best_index is None else int(self.epoch[self.best_index])
+
+
+def load_run_metrics(path):
+    """
+    Load a results.csv, reusing the parsed copy while the file is unchanged.
+
+    Args:
+        path: results.csv, or a run directory containing one
+
+    Returns:
+        RunMetrics (raises FileNotFoundError if the file does not exist)
+    """
+    path = Path(path)
+    if path.is_dir():
+        path = path / "results.csv"
+    stat = path.stat()
+    key, stamp = str(path.resolve()), (stat.st_mtime_ns, stat.st_size)
+
+    cached = _CACHE.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    with open(path, encoding='utf-8', errors='replace') as f:
+        header, rows = parse_results_lines(f)
+    metrics = RunMetrics(header or [EPOCH], rows, path)
+    _CACHE[key] = (stamp, metrics)
+    return metrics
+
+
+class ResultsTail:
+    """
+    Incremental reader for a results.csv that is being appended to.
+
+    Each call to `read_new` seeks to the previous offset and parses only the
+    complete lines written since. If the file shrinks or is replaced (a new
+    run reusing the directory), it starts over from the header and sets
+    `restarted`.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.offset = 0
+        self.header = None
+        self._inode = None
+        self.restarted = False
+
+    def read_new(self):
+        """
+        Returns:
+            List of float rows (in `header` column order) appended since the last call
+        """
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return []
+        self.restarted = self._inode is not None and (stat.st_ino != self._inode or stat.st_size < self.offset)
+        if stat.st_ino != self._inode or stat.st_size < self.offset:
+            self.offset, self.header, self._inode = 0, None, stat.st_ino
+        if stat.st_size == self.offset:
+            return []
+
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1  # Keep a half-written last line for next time
+        self.offset += end
+
+        self.header, rows = parse_results_lines(data[:end].decode('utf-8', errors='replace').splitlines(),
+                                                self.header)
+        return rows
@@ -0,0 +1,408 @@
+"""
+Run Registry
+============
+SQLite index of the training runs under runs/obb, so tools stop hard-coding
+`wedtect-obb-final4` or picking the "latest" run by its name. Name order is
+not creation order: a lexical sort puts final10 before final4, and
+Ultralytics reuses the first free suffix, so after final3 is deleted the
+next run is written to final3 even though final10 exists.
+
+For every `wedtect-obb-final*` directory it records the args.yaml, final and
+best-epoch metrics from results.csv, wall time, whether the run completed
+(all epochs, early stop by patience or the time limit) and the BLAKE2b of
+weights/best.pt, plus when the run started (args.yaml is written when
+training starts), which is what "latest" means.
+
+Refreshing is explicit: train_local.py after training, `monitor_training.py
+--list` and this script's CLI. A refresh only stats each run's three files;
+a run is re-parsed (and its weights re-hashed) only when one of them
+changed. Lookups (resolve_run / resolve_weights) never walk runs/obb: they
+are single indexed queries such as "best run by mAP50-95".
+
+    runs/obb/run_registry.sqlite3
+        runs (name, path, stem, seq, started_at, args, epochs, epochs_done, completed,
+              final_*, best_*, wall_time_s, weights, weights_hash, stamp, indexed_at)
+
+Usage:
+    python run_registry.py                  # refresh and list runs
+    python run_registry.py --best           # path of the best completed run's weights
+    python run_registry.py --latest         # most recently started run
+    python run_registry.py --rebuild        # re-index every run from scratch
+
+    from run_registry import resolve_run, resolve_weights
+    run_dir = resolve_run('best')           # or 'latest', 'latest-completed', a run name
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+RUNS_DIR = Path("runs/obb")
+RUN_PATTERN = "wedtect-obb-final*"
+REGISTRY_FILE = "run_registry.sqlite3"
+DEFAULT_EPOCHS = 100     # Used when a run has no args.yaml
+
+# Columns best() may rank by
+RANKING_METRICS = ('best_map50_95', 'best_map50', 'best_fitness', 'final_map50_95', 'final_map50')
+
+# Symbolic names accepted by resolve(); anything else is a run directory name
+SELECTORS = ('latest', 'latest-completed', 'best')
+
+SCHEMA_VERSION = 2   # The index is rebuilt from the run directories when this changes
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    name            TEXT PRIMARY KEY,
+    path            TEXT NOT NULL,
+    stem            TEXT NOT NULL,
+    seq             INTEGER NOT NULL,
+    started_at      TEXT NOT NULL,
+    args            TEXT,
+    epochs          INTEGER,
+    epochs_done     INTEGER NOT NULL DEFAULT 0,
+    completed       INTEGER NOT NULL DEFAULT 0,
+    final_precision REAL,
+    final_recall    REAL,
+    final_map50     REAL,
+    final_map50_95  REAL,
+    best_epoch      INTEGER,
+    best_map50      REAL,
+    best_map50_95   REAL,
+    best_fitness    REAL,
+    wall_time_s     REAL,
+    weights         TEXT,
+    weights_hash    TEXT,
+    stamp           TEXT NOT NULL,
+    indexed_at      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_start ON runs (started_at);
+CREATE INDEX IF NOT EXISTS runs_by_map ON runs (completed, best_map50_95);
+"""
+
+
+def natural_key(name):
+    """Sort key for Ultralytics run names: 'final' < 'final2' < 'final10' (no suffix counts as 1)"""
+    stem, number = re.match(r'^(.*?)(\d*)$', name).groups()
+    return stem, int(number or 1)
+
+
+def load_run_args(run_dir):
+    """Training arguments saved by Ultralytics (args.yaml), or {} if missing"""
+    args_file = Path(run_dir) / "args.yaml"
+    if not args_file.exists():
+        return {}
+    import yaml
+
+    with open(args_file) as f:
+        return yaml.safe_load(f) or {}
+
+
+def _stamp(path):
+    """(mtime_ns, size) of a file, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def is_complete(metrics, run_args):
+    """
+    Whether a run stopped on its own: all epochs done, patience exhausted
+    since the best fitness, or the time limit (hours) reached.
+    """
+    import numpy as np
+
+    if not len(metrics):
+        return False
+    epoch = int(metrics.epoch[-1])
+    if epoch >= int(run_args.get('epochs') or DEFAULT_EPOCHS):
+        return True
+    patience = run_args.get('patience')
+    if patience and epoch - int(metrics.epoch[int(np.argmax(metrics.fitness))]) >= int(patience):
+        return True
+    time_limit = run_args.get('time')
+    times = metrics.time
+    if time_limit and times is not None:
+        last_epoch_s = float(times[-1] - times[-2]) if len(times) > 1 else float(times[-1])
+        return float(times[-1]) + last_epoch_s > float(time_limit) * 3600
+    return False
+
+
+def index_run(run_dir):
+    """
+    Registry row for one run directory.
+
+    Returns:
+        Dictionary of column -> value (without stamp / indexed_at)
+    """
+    run_dir = Path(run_dir)
+    stem, seq = natural_key(run_dir.name)
+    run_args = load_run_args(run_dir)
+    # args.yaml is written when training starts and never touched again
+    started = next((path.stat().st_mtime for path in (run_dir / "args.yaml", run_dir / "results.csv")
+                    if path.exists()), run_dir.stat().st_mtime)
+    row = {
+        'name': run_dir.name, 'path': str(run_dir), 'stem': stem, 'seq': seq,
+        'started_at': datetime.fromtimestamp(started).isoformat(timespec='seconds'),
+        'args': json.dumps(run_args, default=str) if run_args else None,
+        'epochs': int(run_args.get('epochs') or DEFAULT_EPOCHS),
+    }
+
+    results_file = run_dir / "results.csv"
+    if results_file.exists():
+        from run_metrics import load_run_metrics
+
+        metrics = load_run_metrics(results_file)
+        if len(metrics):
+            best = metrics.best_index
+            value = lambda series, i: None if series is None else round(float(series[i]), 6)
+            row.update({
+                'epochs_done': int(metrics.epoch[-1]),
+                'completed': int(is_complete(metrics, run_args)),
+                'final_precision': value(metrics.precision, -1),
+                'final_recall': value(metrics.recall, -1),
+                'final_map50': value(metrics.map50, -1),
+                'final_map50_95': value(metrics.map50_95, -1),
+                'best_epoch': metrics.best_epoch,
+                'best_map50': value(metrics.map50, best),
+                'best_map50_95': value(metrics.map50_95, best),
+                'best_fitness': round(float(metrics.fitness.max()), 6),
+                'wall_time_s': value(metrics.time, -1),
+            })
+
+    weights = run_dir / "weights" / "best.pt"
+    if weights.exists():
+        from prediction_cache import file_digest
+
+        row.update({'weights': str(weights), 'weights_hash': file_digest(weights)})
+    return row
+
+
+class RunRegistry:
+    """
+    Handle on the run registry database.
+
+    Args:
+        runs_dir: Directory holding the Ultralytics run folders
+        db_path: SQLite file (default: runs_dir / REGISTRY_FILE)
+    """
+
+    def __init__(self, runs_dir=RUNS_DIR, db_path=None, pattern=RUN_PATTERN):
+        self.runs_dir = Path(runs_dir)
+        self.pattern = pattern
+        self.db_path = Path(db_path) if db_path else self.runs_dir / REGISTRY_FILE
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")  # Monitors can read while a refresh writes
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                self._conn.execute("DROP TABLE IF EXISTS runs")  # Only an index; the next refresh rebuilds it
+                self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def index(self, run_dir, known_stamp=None):
+        """
+        Index (or re-index) one run directory, e.g. a run that just started
+        or finished, without walking runs_dir.
+
+        Returns:
+            False if the run's files match `known_stamp` and nothing was done
+        """
+        run_dir = Path(run_dir)
+        stamp = json.dumps([_stamp(run_dir / name) for name in ("results.csv", "args.yaml", "weights/best.pt")])
+        if stamp == known_stamp:
+            return False
+        row = index_run(run_dir)
+        row.update({'stamp': stamp, 'indexed_at': datetime.now().isoformat(timespec='seconds')})
+        with self._conn:
+            self._conn.execute("DELETE FROM runs WHERE name = ?", (row['name'],))
+            self._conn.execute(f"INSERT INTO runs ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+                               tuple(row.values()))
+        return True
+
+    def refresh(self, rebuild=False):
+        """
+        Bring the index up to date with the run directories.
+
+        Only runs whose results.csv, args.yaml or best.pt changed (by mtime and
+        size) are parsed again; runs whose directory disappeared are dropped.
+
+        Returns:
+            Dictionary with the number of runs 'indexed', 'unchanged' and 'removed'
+        """
+        known = {} if rebuild else {r['name']: r['stamp'] for r in self._conn.execute("SELECT name, stamp FROM runs")}
+        counts = {'indexed': 0, 'unchanged': 0, 'removed': 0}
+        present = set()
+        for run_dir in self.runs_dir.glob(self.pattern):
+            if not run_dir.is_dir():
+                continue
+            present.add(run_dir.name)
+            if self.index(run_dir, known.get(run_dir.name)):
+                counts['indexed'] += 1
+            else:
+                counts['unchanged'] += 1
+
+        stale = [name for (name,) in self._conn.execute("SELECT name FROM runs")] if rebuild else list(known)
+        stale = [name for name in stale if name not in present]
+        with self._conn:
+            self._conn.executemany("DELETE FROM runs WHERE name = ?", [(name,) for name in stale])
+        counts['removed'] = len(stale)
+        return counts
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _row(self, row):
+        if row is None:
+            return None
+        run = dict(row)
+        run['args'] = json.loads(run['args']) if run['args'] else {}
+        run['completed'] = bool(run['completed'])
+        return run
+
+    def runs(self):
+        """Every indexed run, oldest first (by start time)"""
+        return [self._row(r) for r in self._conn.execute("SELECT * FROM runs ORDER BY started_at, stem, seq")]
+
+    def get(self, name):
+        return self._row(self._conn.execute("SELECT * FROM runs WHERE name = ?", (name,)).fetchone())
+
+    def latest(self, completed=False, with_weights=False):
+        """Most recently started run, optionally only completed runs / runs with best.pt"""
+        where = " AND ".join(["1"] + ["completed = 1"] * completed + ["weights IS NOT NULL"] * with_weights)
+        return self._row(self._conn.execute(
+            f"SELECT * FROM runs WHERE {where} ORDER BY started_at DESC, stem DESC, seq DESC LIMIT 1").fetchone())
+
+    def best(self, metric='best_map50_95', completed=True, with_weights=True):
+        """
+        Highest-scoring run by a metric column (ties go to the newer run).
+
+        Args:
+            metric: One of RANKING_METRICS
+            completed: Only consider runs that finished
+            with_weights: Only consider runs that have a best.pt
+        """
+        if metric not in RANKING_METRICS:
+            raise ValueError(f"Unknown metric {metric!r}; expected one of {', '.join(RANKING_METRICS)}")
+        where = " AND ".join([f"{metric} IS NOT NULL"] + ["completed = 1"] * completed
+                             + ["weights IS NOT NULL"] * with_weights)
+        return self._row(self._conn.execute(
+            f"SELECT * FROM runs WHERE {where} ORDER BY {metric} DESC, started_at DESC LIMIT 1").fetchone())
+
+    def resolve(self, selector='latest'):
+        """
+        Run for a selector: 'latest', 'latest-completed', 'best' (by mAP50-95,
+        completed runs first) or a run directory name.
+        """
+        if selector == 'latest':
+            return self.latest()
+        if selector == 'latest-completed':
+            return self.latest(completed=True)
+        if selector == 'best':
+            return self.best() or self.best(completed=False)
+        return self.get(selector)
+
+
+def register_run(run_dir):
+    """Index one run in the registry of its parent directory (e.g. as soon as training starts)"""
+    run_dir = Path(run_dir)
+    with RunRegistry(run_dir.parent) as registry:
+        registry.index(run_dir)
+
+
+def _open_existing(runs_dir):
+    """RunRegistry for runs_dir if its database exists, else None (lookups never create it)"""
+    if not (Path(runs_dir) / REGISTRY_FILE).exists():
+        return None
+    return RunRegistry(runs_dir)
+
+
+def resolve_run(selector='latest', runs_dir=RUNS_DIR, refresh=False):
+    """
+    Directory of the run matching a selector (see RunRegistry.resolve), or None.
+
+    Args:
+        selector: 'latest', 'latest-completed', 'best' or a run directory name
+        runs_dir: Directory holding the run folders
+        refresh: Re-index runs_dir first; by default only the index is read,
+            so runs trained since the last refresh are not seen
+    """
+    registry = RunRegistry(runs_dir) if refresh and Path(runs_dir).is_dir() else _open_existing(runs_dir)
+    if registry is None:
+        return None
+    with registry:
+        if refresh:
+            registry.refresh()
+        run = registry.resolve(selector)
+    return Path(run['path']) if run else None
+
+
+def resolve_weights(selector='best', runs_dir=RUNS_DIR, refresh=False):
+    """best.pt of the run matching a selector, or None if it has no weights (see resolve_run)"""
+    registry = RunRegistry(runs_dir) if refresh and Path(runs_dir).is_dir() else _open_existing(runs_dir)
+    if registry is None:
+        return None
+    with registry:
+        if refresh:
+            registry.refresh()
+        run = registry.resolve(selector)
+        if selector == 'latest' and (run is None or not run['weights']):
+            run = registry.latest(with_weights=True)
+    return Path(run['weights']) if run and run['weights'] else None
+
+
+def _fmt(value, spec=".4f"):
+    return "-" if value is None else format(value, spec)
+
+
+def print_runs(runs):
+    """Table of indexed runs"""
+    print(f"\n{'run':<26} {'epochs':>9} {'done':>5} {'best ep':>8} {'mAP50':>8} {'mAP50-95':>9} "
+          f"{'time':>8} {'weights':>10}")
+    for run in runs:
+        wall = f"{run['wall_time_s'] / 3600:.1f}h" if run['wall_time_s'] else "-"
+        print(f"{run['name']:<26} {str(run['epochs_done']) + '/' + str(run['epochs']):>9} "
+              f"{'✓' if run['completed'] else '…':>5} {_fmt(run['best_epoch'], 'd'):>8} "
+              f"{_fmt(run['best_map50']):>8} {_fmt(run['best_map50_95']):>9} {wall:>8} "
+              f"{(run['weights_hash'] or '-')[:10]:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index training runs under runs/obb")
+    parser.add_argument('--runs-dir', type=Path, default=RUNS_DIR)
+    parser.add_argument('--rebuild', action='store_true', help="Re-index every run")
+    parser.add_argument('--best', action='store_true', help="Print the best completed run's weights")
+    parser.add_argument('--latest', action='store_true', help="Print the most recently started run directory")
+    args = parser.parse_args()
+
+    if not args.runs_dir.is_dir():
+        print(f"❌ Runs directory not found: {args.runs_dir}")
+    else:
+        with RunRegistry(args.runs_dir) as registry:
+            counts = registry.refresh(rebuild=args.rebuild)
+            if args.best:
+                run = registry.resolve('best')
+                print(run['weights'] if run else "")
+            elif args.latest:
+                run = registry.latest()
+                print(run['path'] if run else "")
+            else:
+                print(f"🗂️  {registry.db_path}: {counts['indexed']} indexed, {counts['unchanged']} unchanged, "
+                      f"{counts['removed']} removed")
+                print_runs(registry.runs())
@@ -2,20 +2,24 @@
 Defect Image Web Scraper
 ========================
 Downloads ~1000 defect images (cracks, dents, holes, leaks) from Bing Image Search.
-Uses reliable methods with error handling and rate limiting.
+Downloads run concurrently through download_engine (connection pooling,
+per-host limits, token-bucket rate limiting, retries).
 
 Usage:
     python scrape_defect_images.py
 """
 
 import os
-import time
 import requests
 from pathlib import Path
 from urllib.parse import quote
 import json
 from datetime import datetime
 
+from download_engine import DownloadEngine, extension_for, summarize
+from image_dedup import dedupe_scraped_images
+from scrape_state import ScrapeState
+
 # Configuration
 DEFECT_TYPES = {
     'crack': 250,        # ~250 images per type
@@ -26,8 +30,9 @@ DEFECT_TYPES = {
 
 OUTPUT_DIR = Path('SCRAPED_IMAGES')
 LOG_FILE = OUTPUT_DIR / 'scraping_log.txt'
+STATE_DB = OUTPUT_DIR / 'scrape_state.sqlite3'
 
-# Headers to avoid being blocked
+# Headers to avoid being blocked (image downloads use download_engine.HEADERS)
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
 }
@@ -106,50 +111,14 @@ def get_bing_image_urls(search_query, num_images=250):
     return urls
 
 
-def download_image(url, defect_type, image_num):
-    """
-    Download a single image from URL.
-    
-    Args:
-        url: Image URL
-        defect_type: Type of defect (crack, dent, hole, leak)
-        image_num: Image number for naming
-    
-    Returns:
-        True if successful, False otherwise
-    """
-    try:
-        response = requests.get(url, headers=HEADERS, timeout=10)
-        response.raise_for_status()
-        
-        # Determine file format from content type
-        content_type = response.headers.get('content-type', 'image/jpeg')
-        if 'png' in content_type:
-            ext = '.png'
-        elif 'gif' in content_type:
-            ext = '.gif'
-        elif 'webp' in content_type:
-            ext = '.webp'
-        else:
-            ext = '.jpg'
-        
-        # Save image
-        filename = f"{defect_type}_scraped_{image_num:04d}{ext}"
-        filepath = OUTPUT_DIR / defect_type / filename
-        
-        with open(filepath, 'wb') as f:
-            f.write(response.content)
-        
-        # Verify file size (skip very small files)
-        file_size = filepath.stat().st_size
-        if file_size < 5000:  # Less than 5KB is likely broken
-            filepath.unlink()
-            return False
-        
-        return True
-        
-    except Exception as e:
-        return False
+def _image_namer(defect_type, state):
+    """File-name callback for the download engine: numbers come from the scrape state store"""
+    prefix = f"{defect_type}_scraped_"
+
+    def name_fn(url, content_type):
+        number = state.claim_number(prefix, OUTPUT_DIR / defect_type)
+        return f"{prefix}{number:04d}{extension_for(content_type)}"
+    return name_fn
 
 
 def scrape_defect_images():
@@ -164,6 +133,8 @@ def scrape_defect_images():
     log_message("")
     
     total_downloaded = 0
+    state = ScrapeState(STATE_DB)
+    engine = DownloadEngine(known_hash=state.known_hash)  # Skip content already saved from another URL
     search_queries = {
         'crack': [
             'surface crack concrete',
@@ -198,38 +169,48 @@ def scrape_defect_images():
     for defect_type, target_count in DEFECT_TYPES.items():
         log_message(f"\n📥 Scraping {defect_type.upper()} images (target: {target_count})")
         
-        downloaded = 0
+        # Resume: images saved by earlier runs count towards the target
+        downloaded = state.count(defect_type)
+        if downloaded:
+            log_message(f"  ↩️  Resuming with {downloaded} images already downloaded")
         queries = search_queries.get(defect_type, [defect_type])
         
         for query in queries:
             if downloaded >= target_count:
                 break
             
-            # Get URLs
-            urls = get_bing_image_urls(query, num_images=100)
+            # Get URLs (search results are stored, so a restart does not search again)
+            urls = state.cached_urls(defect_type, query)
+            if urls is None:
+                urls = get_bing_image_urls(query, num_images=100)
+                if urls:
+                    state.add_urls(defect_type, query, urls)
             
             if not urls:
                 log_message(f"  ⚠️  No URLs found for query: '{query}'")
                 continue
+
+            urls = state.pending_urls(defect_type, query)
+            if not urls:
+                continue
             
-            # Download images
-            for idx, url in enumerate(urls):
-                if downloaded >= target_count:
-                    break
-                
-                try:
-                    if download_image(url, defect_type, downloaded + 1):
-                        downloaded += 1
-                        if downloaded % 10 == 0:
-                            log_message(f"  ✓ {downloaded}/{target_count} images downloaded")
-                    
-                    # Rate limiting - be respectful
-                    time.sleep(0.5)
-                    
-                except Exception as e:
-                    continue
-            
-            time.sleep(2)  # Delay between queries
+            # Download concurrently; the engine stops once the target is reached
+            progress = {'done': downloaded}
+
+            def report(result):
+                state.record(result)
+                if result['status'] == 'ok':
+                    progress['done'] += 1
+                    if progress['done'] % 10 == 0:
+                        log_message(f"  ✓ {progress['done']}/{target_count} images downloaded")
+
+            results = engine.download_all(urls, _image_namer(defect_type, state),
+                                          OUTPUT_DIR / defect_type, limit=target_count - downloaded,
+                                          on_result=report)
+            stats = summarize(results)
+            downloaded += stats.get('ok', 0)
+            log_message(f"  '{query}': {stats.get('ok', 0)} saved, "
+                        f"{len(results) - stats.get('ok', 0)} skipped/failed, {stats['bytes'] / 1e6:.1f} MB")
         
         log_message(f"  ✅ Completed: {downloaded} images for {defect_type}")
         total_downloaded += downloaded
@@ -251,34 +232,11 @@ def scrape_defect_images():
     
     log_message(f"\n🎉 Total files in SCRAPED_IMAGES: {sum(actual_counts.values())}")
     log_message("✓ Log file saved to: " + str(LOG_FILE))
+    state.close()
     
     return total_downloaded
 
 
-def cleanup_corrupted_images():
-    """Remove corrupted or invalid image files."""
-    log_message("\n🧹 Checking for corrupted images...")
-    
-    removed = 0
-    for defect_type in DEFECT_TYPES.keys():
-        defect_dir = OUTPUT_DIR / defect_type
-        
-        for img_file in defect_dir.glob('*'):
-            try:
-                # Try to open and verify it's a valid image
-                from PIL import Image
-                img = Image.open(img_file)
-                img.verify()
-            except Exception:
-                img_file.unlink()
-                removed += 1
-    
-    if removed > 0:
-        log_message(f"Removed {removed} corrupted images")
-    else:
-        log_message("No corrupted images found")
-
-
 def organize_scraped_images():
     """Organize scraped images for training."""
     log_message("\n📁 Creating organized dataset structure...")
@@ -298,8 +256,8 @@ if __name__ == '__main__':
         # Start scraping
         downloaded = scrape_defect_images()
         
-        # Cleanup (optional)
-        # cleanup_corrupted_images()
+        # Drop near-duplicates (resized/re-encoded copies, images already in TRAINING_DATA)
+        dedupe_scraped_images()
         
         # Organize
         organize_scraped_images()
@@ -1,14 +1,47 @@
 """
 Image Scraper - Using iCrawler (PROVEN WORKING)
 ================================================
-This uses Google Images through icrawler - reliable and tested
+This uses Google Images through icrawler - reliable and tested.
+icrawler finds the image URLs; download_engine fetches them concurrently.
+Progress lives in the scrape state store (scrape_state.py), shared with the
+Bing scrapers, so an interrupted run resumes where it stopped.
 """
 
 import os
+import tempfile
 from pathlib import Path
-import time
-from PIL import Image
-import io
+
+from download_engine import DownloadEngine, extension_for, summarize
+from scrape_state import ScrapeState
+
+TARGET_PER_TYPE = 250
+
+def collect_google_urls(crawler_cls, keyword, max_num=60):
+    """
+    Run an icrawler crawler for its URL parsing only.
+
+    The crawler's downloader is swapped for one that records each image URL
+    instead of fetching it, so the actual downloads go through download_engine.
+
+    Returns:
+        List of image URLs
+    """
+    from icrawler import ImageDownloader
+
+    urls = []
+
+    class UrlCollector(ImageDownloader):
+        def download(self, task, default_ext, timeout=5, max_retry=3, overwrite=False, **kwargs):
+            urls.append(task['file_url'])
+            with self.lock:
+                self.fetched_num += 1
+
+    with tempfile.TemporaryDirectory(prefix='icrawler_') as unused_dir:
+        crawler = crawler_cls(downloader_cls=UrlCollector, downloader_threads=1,
+                              storage={'root_dir': unused_dir})
+        crawler.crawl(keyword=keyword, max_num=max_num)
+    return list(dict.fromkeys(urls))
+
 
 def scrape_images_icrawler():
     """
@@ -58,6 +91,8 @@ def scrape_images_icrawler():
     }
     
     total_downloaded = 0
+    state = ScrapeState(output_dir / 'scrape_state.sqlite3')
+    engine = DownloadEngine(known_hash=state.known_hash)  # Skip content already saved from another URL
     
     for defect_type, searches in search_config.items():
         defect_dir = output_dir / defect_type
@@ -67,78 +102,51 @@ def scrape_images_icrawler():
         print(f"📥 Downloading {defect_type.upper()} images...")
         print(f"{'='*60}")
         
-        downloaded_for_type = 0
+        downloaded_for_type = state.count(defect_type)  # Includes earlier, interrupted runs
+
+        # File numbers come from the state store, never from listing the directory
+        def name_fn(url, content_type, defect_type=defect_type, defect_dir=defect_dir):
+            prefix = f"{defect_type}_google_"
+            return f"{prefix}{state.claim_number(prefix, defect_dir):06d}{extension_for(content_type)}"
         
         for search_query in searches:
+            if downloaded_for_type >= TARGET_PER_TYPE:
+                break
             print(f"\n🔍 Searching: '{search_query}'")
             
             try:
-                # Create crawler for this search
-                google_crawler = GoogleImageCrawler(storage={'root_dir': str(defect_dir)})
-                
-                # Crawl images
+                # icrawler only parses Google's result pages; the engine downloads
                 # num_images is approximate (Google limits per query)
-                google_crawler.crawl(keyword=search_query, max_num=60)
+                urls = state.cached_urls(defect_type, search_query)
+                if urls is None:
+                    urls = collect_google_urls(GoogleImageCrawler, search_query, max_num=60)
+                    if urls:
+                        state.add_urls(defect_type, search_query, urls)
+                pending = state.pending_urls(defect_type, search_query)
+                results = engine.download_all(pending, name_fn, defect_dir,
+                                              limit=TARGET_PER_TYPE - downloaded_for_type, on_result=state.record)
+                downloaded_for_type += summarize(results).get('ok', 0)
                 
-                # Count downloaded images
-                images_in_dir = len(list(defect_dir.glob('*.jpg'))) + len(list(defect_dir.glob('*.png')))
-                
-                print(f"  ✓ Downloaded for: {search_query}")
-                print(f"  📊 Total in folder: {images_in_dir}")
-                
-                # Stop if we have enough
-                if images_in_dir >= 250:
-                    break
-                
-                # Rate limiting to avoid blocking
-                time.sleep(1)
+                print(f"  ✓ Downloaded for: {search_query} ({len(urls or [])} URLs, {len(pending)} pending)")
+                print(f"  📊 Total for {defect_type}: {downloaded_for_type}")
                     
             except Exception as e:
                 print(f"  ⚠️  Error with '{search_query}': {str(e)[:100]}")
                 continue
         
-        final_count = len(list(defect_dir.glob('*.jpg'))) + len(list(defect_dir.glob('*.png')))
-        print(f"\n✅ Total for {defect_type}: {final_count} images")
-        total_downloaded += final_count
+        print(f"\n✅ Total for {defect_type}: {downloaded_for_type} images")
+        total_downloaded += downloaded_for_type
     
     print(f"\n\n{'='*60}")
     print(f"🎉 COMPLETE: Total {total_downloaded} images downloaded")
     print(f"{'='*60}")
     
-    # Verify images
-    verify_images(output_dir)
-    
+    # No post-hoc verify pass: download_engine rejects non-images, truncated
+    # headers and thumbnails while streaming, so only valid images reach disk
+    state.close()
     return total_downloaded > 0
 
 
-def verify_images(scraped_dir):
-    """
-    Verify downloaded images and clean up corrupt ones
-    """
-    print(f"\n🔍 Verifying images...")
-    
-    removed = 0
-    
-    for image_file in scraped_dir.rglob('*'):
-        if image_file.is_file():
-            try:
-                # Try to open each image
-                img = Image.open(image_file)
-                img.verify()
-            except Exception:
-                # Remove corrupt images
-                try:
-                    image_file.unlink()
-                    removed += 1
-                except:
-                    pass
-    
-    if removed > 0:
-        print(f"  ⚠️  Removed {removed} corrupt images")
-    else:
-        print(f"  ✅ All images verified")
-
-
 if __name__ == '__main__':
     print("="*60)
     print("🌐 Image Scraper - Google Images (iCrawler)")
@@ -4,13 +4,14 @@ Web Scraper - Working Version with Multiple Methods
 Uses Bing Image Search API + manual download capability
 """
 
-import os
 import requests
 from pathlib import Path
 from urllib.parse import quote
-import time
 import json
 
+from download_engine import DownloadEngine, summarize
+from scrape_state import ScrapeState
+
 def scrape_bing_direct():
     """
     Scrape images directly from Bing Image Search
@@ -28,6 +29,8 @@ def scrape_bing_direct():
     }
     
     total_downloaded = 0
+    state = ScrapeState(output_dir / 'scrape_state.sqlite3')
+    engine = DownloadEngine(known_hash=state.known_hash)  # Skip content already saved from another URL
     
     for defect_type, searches in defect_types.items():
         defect_dir = output_dir / defect_type
@@ -37,7 +40,11 @@ def scrape_bing_direct():
         print(f"📥 Downloading {defect_type.upper()} images...")
         print(f"{'='*60}")
         
-        downloaded_for_type = 0
+        downloaded_for_type = state.count(defect_type)  # Includes earlier, interrupted runs
+
+        # File numbers come from the state store, never from listing the directory
+        def name_fn(url, content_type, defect_type=defect_type, defect_dir=defect_dir):
+            return f"{defect_type}_{state.claim_number(f'{defect_type}_', defect_dir)}.jpg"
         
         for search_query in searches:
             print(f"\n🔍 Searching: {search_query}")
@@ -48,47 +55,27 @@ def scrape_bing_direct():
                 
                 # Alternative: Use direct image URLs
                 # This fetches image URLs from Bing without JavaScript
-                urls = scrape_bing_urls(search_query, num_images=50)
+                urls = state.cached_urls(defect_type, search_query)
+                if urls is None:
+                    urls = scrape_bing_urls(search_query, num_images=50)
+                    if urls:
+                        state.add_urls(defect_type, search_query, urls)
                 
                 if not urls:
                     print(f"  ⚠️  No URLs found for: {search_query}")
                     continue
                 
-                print(f"  Found {len(urls)} image URLs")
+                pending = state.pending_urls(defect_type, search_query)
+                print(f"  Found {len(urls)} image URLs ({len(pending)} not yet downloaded)")
                 
-                # Download each image
-                for idx, url in enumerate(urls, 1):
-                    try:
-                        filename = f"{defect_type}_{len(os.listdir(defect_dir)) + 1}.jpg"
-                        filepath = defect_dir / filename
-                        
-                        # Skip if already exists
-                        if filepath.exists():
-                            continue
-                        
-                        # Download image
-                        headers = {
-                            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                        }
-                        response = requests.get(url, headers=headers, timeout=10)
-                        
-                        if response.status_code == 200:
-                            with open(filepath, 'wb') as f:
-                                f.write(response.content)
-                            
-                            # Verify it's a valid image
-                            if filepath.stat().st_size > 5000:  # At least 5KB
-                                print(f"  ✓ Downloaded: {filename} ({response.stat().st_size // 1024}KB)")
-                                downloaded_for_type += 1
-                                total_downloaded += 1
-                            else:
-                                filepath.unlink()  # Delete if too small
-                        
-                    except Exception as e:
-                        continue
-                    
-                    # Rate limiting
-                    time.sleep(0.2)
+                # Download concurrently through the shared engine
+                results = engine.download_all(pending, name_fn, defect_dir, on_result=state.record)
+                for result in results:
+                    if result['status'] == 'ok':
+                        print(f"  ✓ Downloaded: {result['path'].name} ({result['bytes'] // 1024}KB)")
+                ok = summarize(results).get('ok', 0)
+                downloaded_for_type += ok
+                total_downloaded += ok
                 
                 # Stop if we have enough for this search
                 if downloaded_for_type >= 250:
@@ -103,7 +90,9 @@ def scrape_bing_direct():
     print(f"\n\n{'='*60}")
     print(f"🎉 COMPLETE: Total {total_downloaded} images downloaded")
     print(f"{'='*60}")
-    return total_downloaded > 0
+    any_images = state.count() > 0
+    state.close()
+    return any_images
 
 
 def scrape_bing_urls(query, num_images=50):
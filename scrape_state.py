@@ -0,0 +1,210 @@
+"""
+Scrape State Store
+==================
+SQLite record of every scrape: which URLs each search query returned and
+what happened to each of them (status, content hash, saved path). Scrapers
+use it to resume exactly where an interrupted run stopped:
+
+- search results are stored, so a restart does not re-query Bing/Google
+- URLs already downloaded or permanently failed are never fetched again
+- file numbers come from a counter in the store, not from listing the
+  output directory, so restarts never overwrite earlier downloads
+
+    SCRAPED_IMAGES/scrape_state.sqlite3
+        queries   (id, defect_type, query, searched_at)
+        urls      (url, query_id, defect_type, status, hash, path, bytes, attempts, error, updated_at)
+        counters  (name, next_num)
+"""
+
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+STATE_DB = Path('SCRAPED_IMAGES') / 'scrape_state.sqlite3'
+
+# Statuses that are final; anything else is retried on the next run
+DONE_STATUSES = ('ok', 'http_error', 'not_image', 'low_resolution', 'too_small', 'too_large', 'duplicate',
+                 'near_duplicate')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    id          INTEGER PRIMARY KEY,
+    defect_type TEXT NOT NULL,
+    query       TEXT NOT NULL,
+    searched_at TEXT NOT NULL,
+    UNIQUE (defect_type, query)
+);
+CREATE TABLE IF NOT EXISTS urls (
+    url         TEXT PRIMARY KEY,
+    query_id    INTEGER NOT NULL REFERENCES queries(id),
+    defect_type TEXT NOT NULL,
+    position    INTEGER NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'pending',
+    hash        TEXT,
+    path        TEXT,
+    bytes       INTEGER NOT NULL DEFAULT 0,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    error       TEXT,
+    updated_at  TEXT
+);
+CREATE INDEX IF NOT EXISTS urls_by_query ON urls (query_id, status);
+CREATE INDEX IF NOT EXISTS urls_by_type ON urls (defect_type, status);
+CREATE INDEX IF NOT EXISTS urls_by_hash ON urls (hash);
+CREATE INDEX IF NOT EXISTS urls_by_path ON urls (path);  -- image_dedup
+CREATE INDEX IF NOT EXISTS urls_by_update ON urls (updated_at);  -- monitor_scraper --state
+CREATE TABLE IF NOT EXISTS counters (
+    name     TEXT PRIMARY KEY,
+    next_num INTEGER NOT NULL
+);
+"""
+
+
+class ScrapeState:
+    """
+    Thread-safe handle on the scrape state database.
+
+    Args:
+        db_path: SQLite file (created with its parent directory if missing)
+    """
+
+    def __init__(self, db_path=STATE_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")  # Lets monitors read while we write
+            self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _now(self):
+        return datetime.now().isoformat(timespec='seconds')
+
+    # ------------------------------------------------------------------
+    # Frontier
+    # ------------------------------------------------------------------
+
+    def cached_urls(self, defect_type, query):
+        """URLs stored for a query by an earlier run, or None if it was never searched"""
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM queries WHERE defect_type = ? AND query = ?",
+                                     (defect_type, query)).fetchone()
+            if row is None:
+                return None
+            return [r['url'] for r in self._conn.execute(
+                "SELECT url FROM urls WHERE query_id = ? ORDER BY position", (row['id'],))]
+
+    def add_urls(self, defect_type, query, urls):
+        """
+        Record the search results of a query.
+
+        URLs already known (from any query) keep their existing row, so the
+        same image found by two searches is only downloaded once.
+
+        Returns:
+            Number of URLs that were new
+        """
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO queries (defect_type, query, searched_at) VALUES (?, ?, ?)",
+                               (defect_type, query, self._now()))
+            query_id = self._conn.execute("SELECT id FROM queries WHERE defect_type = ? AND query = ?",
+                                          (defect_type, query)).fetchone()['id']
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO urls (url, query_id, defect_type, position) VALUES (?, ?, ?, ?)",
+                [(url, query_id, defect_type, i) for i, url in enumerate(urls)])
+            return self._conn.total_changes - before
+
+    def pending_urls(self, defect_type, query):
+        """URLs of a query that still need downloading, in search-result order"""
+        placeholders = ", ".join("?" * len(DONE_STATUSES))
+        with self._lock:
+            return [r['url'] for r in self._conn.execute(
+                f"""SELECT u.url FROM urls u JOIN queries q ON q.id = u.query_id
+                    WHERE q.defect_type = ? AND q.query = ? AND u.status NOT IN ({placeholders})
+                    ORDER BY u.position""", (defect_type, query, *DONE_STATUSES))]
+
+    def record(self, result):
+        """Store the outcome of one download_engine result"""
+        path = str(result['path']) if result.get('path') else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                """UPDATE urls SET status = ?, hash = ?, path = ?, bytes = ?,
+                       attempts = attempts + ?, error = ?, updated_at = ?
+                   WHERE url = ?""",
+                (result['status'], result.get('hash'), path, result.get('bytes', 0),
+                 result.get('attempts', 1), result.get('error'), self._now(), result['url']))
+
+    def mark_near_duplicates(self, removed):
+        """
+        Mark saved images that image_dedup moved aside or deleted, so they no
+        longer count towards the per-type targets.
+
+        Args:
+            removed: Dict of saved path (as recorded) -> new path, or None if deleted
+
+        Returns:
+            Number of URLs updated
+        """
+        now = self._now()
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "UPDATE urls SET status = 'near_duplicate', path = ?, updated_at = ? WHERE path = ? AND status = 'ok'",
+                [(str(new) if new else None, now, str(old)) for old, new in removed.items()])
+            return self._conn.total_changes - before
+
+    # ------------------------------------------------------------------
+    # Counts and naming
+    # ------------------------------------------------------------------
+
+    def count(self, defect_type=None, status='ok'):
+        """Number of URLs with a status, for one defect type or overall"""
+        with self._lock:
+            if defect_type is None:
+                sql, args = "SELECT COUNT(*) FROM urls WHERE status = ?", (status,)
+            else:
+                sql, args = "SELECT COUNT(*) FROM urls WHERE status = ? AND defect_type = ?", (status, defect_type)
+            return self._conn.execute(sql, args).fetchone()[0]
+
+    def status_counts(self):
+        """Dictionary of defect type -> {status: count}"""
+        counts = {}
+        with self._lock:
+            for row in self._conn.execute(
+                    "SELECT defect_type, status, COUNT(*) AS n FROM urls GROUP BY defect_type, status"):
+                counts.setdefault(row['defect_type'], {})[row['status']] = row['n']
+        return counts
+
+    def known_hash(self, digest):
+        """Saved path of an earlier download with identical content, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT path FROM urls WHERE hash = ? AND status = 'ok' LIMIT 1",
+                                     (digest,)).fetchone()
+        return row['path'] if row else None
+
+    def claim_number(self, prefix, directory):
+        """
+        Next free file number for names like '<prefix><number>.<ext>'.
+
+        The first claim for a prefix scans `directory` once so files from runs
+        before the store existed are never overwritten; after that numbers come
+        straight from the counter.
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT next_num FROM counters WHERE name = ?", (prefix,)).fetchone()
+            if row is None:
+                pattern = re.compile(rf"^{re.escape(prefix)}(\d+)\.")
+                existing = [int(m.group(1)) for p in Path(directory).glob(f"{prefix}*")
+                            if (m := pattern.match(p.name))]
+                number = max(existing, default=0) + 1
+            else:
+                number = row['next_num']
+            self._conn.execute("INSERT OR REPLACE INTO counters (name, next_num) VALUES (?, ?)", (prefix, number + 1))
+            return number
@@ -1,131 +1,353 @@
 """
-📊 VIEW GENERATED EVALUATION GRAPHS AND RESULTS
-Quick preview script to display all evaluation outputs
+📊 EVALUATION REPORT
+====================
+Builds the evaluation summary from the actual outputs of the last training
+and evaluation runs instead of hand-typed numbers:
+
+- training: final and best-epoch metrics from results.csv (run_metrics)
+- test set: detections per class and mean confidence from the prediction cache
+- accuracy: mAP and per-class AP from evaluation/obb_metrics.json
+- throughput: images/sec, batch latency and stage timings persisted by
+  `evaluate_and_test.py infer` (evaluation/inference_throughput.json)
+
+It writes evaluation/evaluation_report.txt, .json and a self-contained .html
+(figures embedded as data URIs). The BLAKE2b of every input is stored in the
+JSON; when nothing changed the existing report is kept, so CI can run this
+after every model build at almost no cost.
+
+Usage:
+    python show_evaluation_report.py              # regenerate if inputs changed, print text
+    python show_evaluation_report.py --force      # always regenerate
+    python show_evaluation_report.py --quiet      # CI: write files, print one line
+    python show_evaluation_report.py --open       # open the HTML report in a browser
+    python show_evaluation_report.py --tiled      # report tiled-inference predictions
+    python show_evaluation_report.py --run wedtect-obb-final4
 """
 
-from pathlib import Path
-import webbrowser
+import argparse
+import base64
+import hashlib
+import html
+import json
 import os
-import sys
-
-def print_report():
-    """Print comprehensive evaluation report"""
-    
-    report = """
-╔════════════════════════════════════════════════════════════════════════════════╗
-║                  🎯 WEDTECT YOLOv8 OBB - EVALUATION RESULTS                   ║
-╚════════════════════════════════════════════════════════════════════════════════╝
-
-📊 TRAINING PERFORMANCE METRICS
-═════════════════════════════════════════════════════════════════════════════════
-
-✅ Final Training Statistics:
-   • Total Epochs Trained: 100
-   • Final Training Loss: 0.0000 (fully converged)
-   • Final Validation Loss: 0.0000 (fully converged)
-   
-🎯 Detection Accuracy:
-   • Precision: 0.8392 (83.92% of detections correct)
-   • Recall: 0.8606 (86.06% of defects detected)
-   • mAP@50: 0.8722 (87.22% - excellent at IoU threshold 0.50)
-   • mAP@50-95: 0.6088 (60.88% - good across all IoU thresholds)
-
-📈 PERFORMANCE INTERPRETATION:
-   • High Precision (83.92%): Few false positives - reliable predictions
-   • High Recall (86.06%): Catches most defects - good coverage
-   • Excellent mAP@50: Strong bounding box accuracy at standard threshold
-   • Good mAP@50-95: Solid localization across all thresholds
-
-
-🧪 TEST SET INFERENCE RESULTS
-═════════════════════════════════════════════════════════════════════════════════
-
-✅ Test Execution:
-   • Test Images Processed: 20 samples (from 122 available)
-   • Total Detections: 20
-   • Images with Detections: 18
-
-📊 Detection Distribution by Class:
-   ┌─ CRACK:  19 detections (95%)
-   │          Average Confidence: 0.863 (86.3%)
-   │
-   └─ LEAK:   1 detection (5%)
-              Average Confidence: 0.346 (34.6%)
-
-🔍 INFERENCE ANALYSIS:
-   • Model successfully detects cracks with HIGH confidence
-   • Excellent specificity for primary defect type (crack)
-   • Some detection of secondary defects (leak)
-   • All predictions generated with annotated visualizations
-
-
-📁 GENERATED VISUALIZATION FILES
-═════════════════════════════════════════════════════════════════════════════════
-
-Located in: evaluation/ directory
-
-1️⃣  training_metrics_detailed.png
-    └─ Comprehensive 6-subplot figure showing:
-       • Training vs Validation Loss
-       • Component Losses (Box, DFL, Class)
-       • Precision Curve Over Epochs
-       • Recall Curve Over Epochs
-       • mAP@50 Progression
-       • mAP@50-95 Progression
-
-2️⃣  prediction_analysis.png
-    └─ 2-subplot analysis showing:
-       • Class Distribution Bar Chart (cracks vs leaks vs dents vs holes)
-       • Confidence Score Distribution Histogram
-
-3️⃣  test_predictions/ directory
-    └─ 20 Annotated Test Images with:
-       • Oriented Bounding Boxes (OBBs) drawn in color
-       • Class labels and confidence scores
-       • predictions_summary.csv with full prediction metadata
-
-
-🎨 COLOR CODING (OBB Visualizations)
-═════════════════════════════════════════════════════════════════════════════════
-   🟢 Green  = Crack (most common defect)
-   🔴 Red    = Dent
-   🔵 Blue   = Hole
-   🟠 Orange = Leak
-
-
-💡 NEXT STEPS & RECOMMENDATIONS
-═════════════════════════════════════════════════════════════════════════════════
-
-✅ Model Quality: EXCELLENT
-   • 83.92% Precision indicates highly reliable predictions
-   • 86.06% Recall means thorough defect detection
-   • Ready for production deployment
-
-📋 For Improved Performance:
-   1. Collect more varied crack samples (improve generalization)
-   2. Balance class distribution (more dent/hole/leak samples)
-   3. Augment training data with real-world variations
-   4. Fine-tune on edge cases (small/large cracks, multiple defects)
-
-🚀 Deployment Recommendations:
-   1. Use confidence threshold ≥ 0.5 for production (balance precision/recall)
-   2. Adjust threshold based on use case (0.7 for high precision, 0.3 for high recall)
-   3. Monitor predictions for drift over time
-   4. Archive model and test results for validation audit
-
-
-═════════════════════════════════════════════════════════════════════════════════
-✨ Evaluation Complete! Model is ready for deployment.
-═════════════════════════════════════════════════════════════════════════════════
-"""
-    
-    print(report)
+import webbrowser
+from datetime import datetime
+from pathlib import Path
+
+from evaluate_and_test import (CLASS_NAMES, CONF_THRESHOLD, EVALUATION_DIR, IMG_SIZE, NMS_IOU, RUN_SELECTOR,
+                               THROUGHPUT_FILE, TILED_INFERENCE, get_run_dir, inference_tiling, select_run)
+
+# Report configuration
+REPORT_TXT = EVALUATION_DIR / "evaluation_report.txt"
+REPORT_JSON = EVALUATION_DIR / "evaluation_report.json"
+REPORT_HTML = EVALUATION_DIR / "evaluation_report.html"
+METRICS_JSON = EVALUATION_DIR / "obb_metrics.json"
+FIGURES = ['training_metrics_detailed.png', 'prediction_analysis.png', 'pr_curves.png', 'confusion_matrix.png']
+REPORT_VERSION = 1   # Bump when the report layout changes, to force regeneration
+
+
+def _prediction_cache_path(model_path, tiled):
+    """NPZ holding the predictions evaluate_and_test.py would use, or None"""
+    if not model_path.exists():
+        return None
+    from prediction_cache import PredictionCache
+
+    path = PredictionCache.open(model_path, CONF_THRESHOLD, IMG_SIZE, NMS_IOU, inference_tiling(tiled)).path
+    return path if path.exists() else None
+
+
+def report_inputs(run_dir, tiled=TILED_INFERENCE):
+    """Dictionary of input name -> path for every input that exists"""
+    inputs = {
+        'results_csv': run_dir / "results.csv",
+        'obb_metrics': METRICS_JSON,
+        'throughput': THROUGHPUT_FILE,
+        'prediction_cache': _prediction_cache_path(run_dir / "weights" / "best.pt", tiled),
+    }
+    inputs.update({f"figure:{name}": EVALUATION_DIR / name for name in FIGURES})
+    return {key: Path(path) for key, path in inputs.items() if path is not None and Path(path).exists()}
+
+
+def inputs_hash(inputs, tiled=TILED_INFERENCE):
+    """BLAKE2b over the report version, settings and the content of every input"""
+    from prediction_cache import file_digest
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([REPORT_VERSION, CONF_THRESHOLD, bool(tiled), sorted(inputs)]).encode())
+    for key in sorted(inputs):
+        digest.update(file_digest(inputs[key]).encode())
+    return digest.hexdigest()
+
+
+# ----------------------------------------------------------------------
+# Sections
+# ----------------------------------------------------------------------
+
+def training_section(results_file):
+    from run_metrics import load_run_metrics
+
+    metrics = load_run_metrics(results_file)
+    if not len(metrics):
+        return None
+    best = metrics.best_index
+
+    def at(i):
+        return {
+            'epoch': int(metrics.epoch[i]),
+            'train_loss': round(float(metrics.train_loss[i]), 4),
+            'val_loss': round(float(metrics.val_loss[i]), 4),
+            'precision': round(float(metrics.precision[i]), 4),
+            'recall': round(float(metrics.recall[i]), 4),
+            'mAP50': round(float(metrics.map50[i]), 4),
+            'mAP50-95': round(float(metrics.map50_95[i]), 4),
+        }
+
+    section = {'run': Path(results_file).parent.name, 'epochs': len(metrics), 'final': at(-1), 'best': at(best)}
+    if metrics.time is not None:
+        section['train_time_min'] = round(float(metrics.time[-1]) / 60, 1)
+    return section
+
+
+def test_section(cache_path, tiled):
+    from prediction_cache import PredictionCache
+
+    cache = PredictionCache(cache_path, None, CONF_THRESHOLD, IMG_SIZE)
+    images = with_detections = 0
+    per_class = {}
+    for _, _, _, _, conf, cls in cache.records(min_conf=CONF_THRESHOLD):
+        images += 1
+        with_detections += bool(len(conf))
+        for score, class_id in zip(conf.tolist(), cls.tolist()):
+            entry = per_class.setdefault(CLASS_NAMES.get(class_id, str(class_id)), [0, 0.0])
+            entry[0] += 1
+            entry[1] += score
+    total = sum(count for count, _ in per_class.values())
+    return {
+        'conf_threshold': CONF_THRESHOLD,
+        'inference': 'tiled' if tiled else 'full frame',
+        'images': images,
+        'images_with_detections': with_detections,
+        'detections': total,
+        'classes': {
+            name: {'detections': count, 'share': round(count / total, 4), 'mean_conf': round(score_sum / count, 4)}
+            for name, (count, score_sum) in sorted(per_class.items(), key=lambda item: -item[1][0])
+        },
+    }
+
+
+def accuracy_section(metrics_json):
+    with open(metrics_json) as f:
+        metrics = json.load(f)
+    return {
+        'mAP50': metrics.get('mAP50'),
+        'mAP50-95': metrics.get('mAP50-95'),
+        'classes': {name: {k: v for k, v in stats.items() if not isinstance(v, (list, dict))}
+                    for name, stats in metrics.get('classes', {}).items()},
+    }
+
+
+def build_report(inputs, run_dir, tiled=TILED_INFERENCE):
+    """Report dictionary from the available inputs (missing inputs leave their section out)"""
+    report = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'model': str(run_dir / "weights" / "best.pt"),
+        'inputs_hash': inputs_hash(inputs, tiled),
+        'inputs': {key: str(path) for key, path in sorted(inputs.items())},
+    }
+    if 'results_csv' in inputs:
+        report['training'] = training_section(inputs['results_csv'])
+    if 'prediction_cache' in inputs:
+        report['test'] = test_section(inputs['prediction_cache'], tiled)
+    if 'obb_metrics' in inputs:
+        report['accuracy'] = accuracy_section(inputs['obb_metrics'])
+    if 'throughput' in inputs:
+        with open(inputs['throughput']) as f:
+            report['throughput'] = json.load(f)
+    report['figures'] = [key.split(':', 1)[1] for key in sorted(inputs) if key.startswith('figure:')]
+    return report
+
+
+# ----------------------------------------------------------------------
+# Renderers
+# ----------------------------------------------------------------------
+
+def _metric_rows(report):
+    """(label, final, best) rows of the training table"""
+    training = report['training']
+    labels = [('precision', 'Precision'), ('recall', 'Recall'), ('mAP50', 'mAP@50'), ('mAP50-95', 'mAP@50-95'),
+              ('train_loss', 'Train loss'), ('val_loss', 'Val loss')]
+    return [(label, training['final'][key], training['best'][key]) for key, label in labels]
+
+
+def render_text(report):
+    lines = ["="*80, "🎯 WEDTECT YOLOv8 OBB - EVALUATION RESULTS", "="*80,
+             f"Generated {report['generated_at']} | model {report['model']}"]
+
+    training = report.get('training')
+    if training:
+        lines += ["", "📊 TRAINING", "-"*80,
+                  f"  Run: {training['run']} | epochs: {training['epochs']}"
+                  + (f" | training time: {training['train_time_min']} min" if 'train_time_min' in training else ""),
+                  f"  {'':<14}{'final (ep ' + str(training['final']['epoch']) + ')':>16}"
+                  f"{'best (ep ' + str(training['best']['epoch']) + ')':>16}"]
+        lines += [f"  {label:.<14}{final:>16.4f}{best:>16.4f}" for label, final, best in _metric_rows(report)]
+
+    accuracy = report.get('accuracy')
+    if accuracy:
+        lines += ["", "🎯 TEST SET ACCURACY (OBB IoU)", "-"*80,
+                  f"  mAP@50: {accuracy['mAP50']:.4f} | mAP@50-95: {accuracy['mAP50-95']:.4f}"]
+        for name, stats in accuracy['classes'].items():
+            lines.append(f"  {name:.<14} " + " | ".join(f"{k} {v:.4f}" if isinstance(v, float) else f"{k} {v}"
+                                                         for k, v in stats.items()))
+
+    test = report.get('test')
+    if test:
+        lines += ["", f"🧪 TEST SET DETECTIONS (conf ≥ {test['conf_threshold']}, {test.get('inference', 'full frame')})", "-"*80,
+                  f"  Images: {test['images']} | with detections: {test['images_with_detections']} | "
+                  f"detections: {test['detections']}"]
+        for name, stats in test['classes'].items():
+            lines.append(f"  {name.upper():.<14} {stats['detections']:>5} ({stats['share']:.0%}) | "
+                         f"mean conf {stats['mean_conf']:.3f}")
+
+    throughput = report.get('throughput')
+    if throughput:
+        lines += ["", "⚡ INFERENCE THROUGHPUT", "-"*80,
+                  f"  {throughput['images_per_sec']:.2f} images/sec over {throughput['images']} images "
+                  f"(batch {throughput['batch_size']}{', tiled' if throughput.get('tiled') else ''}, "
+                  f"measured {throughput['measured_at']})",
+                  f"  Batch latency p50 {throughput['batch_latency_p50_ms']:.1f} ms | "
+                  f"p95 {throughput['batch_latency_p95_ms']:.1f} ms"]
+        for stage, stats in throughput.get('stages', {}).items():
+            lines.append(f"  {stage:.<14} total {stats['total_s']:>8.2f}s | mean {stats['mean_ms']:>8.1f} ms "
+                         f"x {stats['count']}")
+
+    if report['figures']:
+        lines += ["", f"📁 FIGURES ({EVALUATION_DIR}/)", "-"*80] + [f"  • {name}" for name in report['figures']]
+    missing = [s for s in ('training', 'accuracy', 'test', 'throughput') if not report.get(s)]
+    if missing:
+        lines += ["", f"⚠️  Not available yet: {', '.join(missing)} (run evaluate_and_test.py)"]
+    lines.append("="*80)
+    return "\n".join(lines) + "\n"
+
+
+def _html_table(headers, rows):
+    head = "".join(f"<th>{html.escape(str(h))}</th>" for h in headers)
+    body = "".join("<tr>" + "".join(f"<td>{html.escape(str(c))}</td>" for c in row) + "</tr>" for row in rows)
+    return f"<table><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>"
+
+
+def render_html(report):
+    """Single HTML file; figures are embedded so it can be archived or attached as one artifact"""
+    parts = [f"<h1>Wedtect YOLOv8 OBB &mdash; Evaluation Report</h1>",
+             f"<p class='meta'>Generated {html.escape(report['generated_at'])} &middot; "
+             f"model <code>{html.escape(report['model'])}</code></p>"]
+
+    training = report.get('training')
+    if training:
+        parts.append(f"<h2>Training</h2><p>Run <code>{html.escape(training['run'])}</code>, "
+                     f"{training['epochs']} epochs</p>")
+        parts.append(_html_table(['Metric', f"Final (epoch {training['final']['epoch']})",
+                                  f"Best (epoch {training['best']['epoch']})"],
+                                 [(label, f"{final:.4f}", f"{best:.4f}") for label, final, best in _metric_rows(report)]))
+    accuracy = report.get('accuracy')
+    if accuracy:
+        parts.append(f"<h2>Test set accuracy</h2><p>mAP@50 <b>{accuracy['mAP50']:.4f}</b> &middot; "
+                     f"mAP@50-95 <b>{accuracy['mAP50-95']:.4f}</b></p>")
+        keys = sorted({k for stats in accuracy['classes'].values() for k in stats})
+        parts.append(_html_table(['Class'] + keys, [
+            [name] + [f"{stats[k]:.4f}" if isinstance(stats.get(k), float) else stats.get(k, '') for k in keys]
+            for name, stats in accuracy['classes'].items()]))
+    test = report.get('test')
+    if test:
+        parts.append(f"<h2>Test set detections</h2><p>conf &ge; {test['conf_threshold']} &middot; "
+                     f"{html.escape(test.get('inference', 'full frame'))} inference &middot; "
+                     f"{test['images']} images, {test['images_with_detections']} with detections, "
+                     f"{test['detections']} detections</p>")
+        parts.append(_html_table(['Class', 'Detections', 'Share', 'Mean confidence'], [
+            (name, s['detections'], f"{s['share']:.0%}", f"{s['mean_conf']:.3f}") for name, s in test['classes'].items()]))
+    throughput = report.get('throughput')
+    if throughput:
+        parts.append(f"<h2>Inference throughput</h2><p><b>{throughput['images_per_sec']:.2f}</b> images/sec over "
+                     f"{throughput['images']} images (batch {throughput['batch_size']}), batch latency p50 "
+                     f"{throughput['batch_latency_p50_ms']:.1f} ms / p95 {throughput['batch_latency_p95_ms']:.1f} ms"
+                     f" &middot; measured {html.escape(throughput['measured_at'])}</p>")
+        parts.append(_html_table(['Stage', 'Total (s)', 'Mean (ms)', 'Count'], [
+            (stage, s['total_s'], s['mean_ms'], s['count']) for stage, s in throughput.get('stages', {}).items()]))
+    for name in report['figures']:
+        data = base64.b64encode((EVALUATION_DIR / name).read_bytes()).decode('ascii')
+        parts.append(f"<h3>{html.escape(name)}</h3><img alt='{html.escape(name)}' src='data:image/png;base64,{data}'>")
+
+    style = ("body{font-family:sans-serif;max-width:1100px;margin:2em auto;color:#222}"
+             "table{border-collapse:collapse;margin:.5em 0 1.5em}td,th{border:1px solid #ccc;padding:4px 10px;"
+             "text-align:right}td:first-child,th:first-child{text-align:left}img{max-width:100%}"
+             ".meta{color:#666}")
+    return (f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>Wedtect evaluation report</title>"
+            f"<style>{style}</style></head><body>{''.join(parts)}</body></html>\n")
+
+
+def _write(path, text):
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def generate_report(force=False, tiled=TILED_INFERENCE, run_dir=None):
+    """
+    Regenerate the text, JSON and HTML reports if any input changed.
+
+    Args:
+        force: Regenerate even if the inputs hash is unchanged
+        tiled: Report the predictions of tiled instead of full-frame inference
+        run_dir: Run to report on (default: evaluate_and_test's selected run)
+
+    Returns:
+        Tuple (report dictionary, regenerated flag)
+    """
+    run_dir = Path(run_dir) if run_dir else get_run_dir()
+    inputs = report_inputs(run_dir, tiled)
+    current = inputs_hash(inputs, tiled)
+    if not force and all(p.exists() for p in (REPORT_TXT, REPORT_JSON, REPORT_HTML)):
+        try:
+            with open(REPORT_JSON) as f:
+                previous = json.load(f)
+            if previous.get('inputs_hash') == current:
+                return previous, False
+        except (OSError, ValueError):
+            pass
+
+    report = build_report(inputs, run_dir, tiled)
+    EVALUATION_DIR.mkdir(parents=True, exist_ok=True)
+    _write(REPORT_TXT, render_text(report))
+    _write(REPORT_HTML, render_html(report))
+    _write(REPORT_JSON, json.dumps(report, indent=2) + "\n")  # Last: its hash marks the set complete
+    return report, True
+
+
+def print_report(force=False, tiled=TILED_INFERENCE):
+    """Print the evaluation report, regenerating it first if its inputs changed"""
+    report, regenerated = generate_report(force, tiled)
+    print(REPORT_TXT.read_text(encoding='utf-8'))
+    print(f"{'📝 Regenerated' if regenerated else '✓ Up to date'}: {REPORT_TXT}, {REPORT_JSON}, {REPORT_HTML}")
+    return report
+
 
 if __name__ == "__main__":
-    print_report()
-    
-    # Optionally open file explorer to visualization directory
-    eval_dir = Path("evaluation")
-    if eval_dir.exists():
-        print(f"\n📂 Opening evaluation results directory...\n")
-        os.startfile(str(eval_dir.absolute()))
+    parser = argparse.ArgumentParser(description="Generate the evaluation report from the latest outputs")
+    parser.add_argument('--force', action='store_true', help="Regenerate even if no input changed")
+    parser.add_argument('--quiet', action='store_true', help="Only print whether the report was regenerated")
+    parser.add_argument('--open', action='store_true', help="Open the HTML report in the default browser")
+    parser.add_argument('--tiled', action='store_true', default=TILED_INFERENCE,
+                        help="Report the predictions of tiled inference")
+    parser.add_argument('--run', default=RUN_SELECTOR,
+                        help="Run directory name, or best / latest / latest-completed from the run registry")
+    args = parser.parse_args()
+    select_run(args.run)
+
+    if args.quiet:
+        _, regenerated = generate_report(args.force, args.tiled)
+        print(f"{'Regenerated' if regenerated else 'Up to date'}: {REPORT_HTML}")
+    else:
+        print_report(args.force, args.tiled)
+    if args.open:
+        webbrowser.open(REPORT_HTML.absolute().as_uri())  # Cross-platform, unlike os.startfile
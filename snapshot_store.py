@@ -0,0 +1,316 @@
+"""
+Dataset Snapshot Store
+======================
+Content-addressed snapshots of TRAINING_DATA, replacing full
+TRAINING_DATA_BACKUP_<timestamp> copies.
+
+    TRAINING_DATA_SNAPSHOTS/objects/<h[:2]>/<hash>     one file per distinct content
+    TRAINING_DATA_SNAPSHOTS/manifests/<name>.json      path -> (size, hash, mtime_ns)
+
+A snapshot is just a manifest, so files that did not change since the last
+snapshot cost zero extra bytes. Files whose size and mtime match the
+previous manifest are not even re-hashed, which keeps snapshot creation to
+a directory walk. Objects are reflinked when the filesystem supports it and
+copied otherwise; they are never hardlinked, so editing a label in place can
+not corrupt a snapshot.
+
+Usage:
+    python snapshot_store.py create [--label pre-merge]
+    python snapshot_store.py list
+    python snapshot_store.py diff <old> [<new>]       # <new> defaults to the live tree
+    python snapshot_store.py restore <name> [--target DIR] [--clean]
+    python snapshot_store.py delete <name>
+    python snapshot_store.py gc
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from prediction_cache import file_digest
+from prepare_data_for_retraining import link_or_copy
+
+# Snapshot configuration
+TRAINING_DATA_DIR = Path("TRAINING_DATA")
+SNAPSHOT_DIR = Path("TRAINING_DATA_SNAPSHOTS")
+HASH_WORKERS = 8
+OBJECT_LINK_MODE = 'reflink'   # Objects must never share an inode with live files
+
+
+def _object_path(store_dir, digest):
+    return Path(store_dir) / "objects" / digest[:2] / digest
+
+
+def _manifest_path(store_dir, name):
+    return Path(store_dir) / "manifests" / f"{name}.json"
+
+
+def list_snapshots(store_dir=SNAPSHOT_DIR):
+    """Snapshot names, oldest first (names start with a sortable timestamp)"""
+    manifests = Path(store_dir) / "manifests"
+    return sorted(p.stem for p in manifests.glob('*.json')) if manifests.exists() else []
+
+
+def load_manifest(name, store_dir=SNAPSHOT_DIR):
+    """Manifest dictionary of a snapshot (raises FileNotFoundError if unknown)"""
+    with open(_manifest_path(store_dir, name)) as f:
+        return json.load(f)
+
+
+def scan_tree(root_dir, previous=None, workers=HASH_WORKERS):
+    """
+    Describe every file under a directory.
+
+    Args:
+        root_dir: Directory to scan
+        previous: Optional files dict of an earlier manifest; entries whose size and
+                  mtime are unchanged reuse its hash instead of re-reading the file
+        workers: Threads hashing changed files
+
+    Returns:
+        Tuple (files, hashed) where files maps POSIX relative path -> [size, hash, mtime_ns]
+        and hashed is the number of files that had to be read
+    """
+    root_dir = Path(root_dir)
+    previous = previous or {}
+    files, to_hash = {}, []
+
+    for dirpath, _, filenames in os.walk(root_dir):
+        for filename in filenames:
+            path = Path(dirpath) / filename
+            rel = path.relative_to(root_dir).as_posix()
+            stat = path.stat()
+            old = previous.get(rel)
+            if old is not None and old[0] == stat.st_size and old[2] == stat.st_mtime_ns:
+                files[rel] = old
+            else:
+                files[rel] = [stat.st_size, None, stat.st_mtime_ns]
+                to_hash.append(rel)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for rel, digest in zip(to_hash, pool.map(lambda r: file_digest(root_dir / r), to_hash)):
+            files[rel][1] = digest
+
+    return dict(sorted(files.items())), len(to_hash)
+
+
+def _store_object(store_dir, src, digest):
+    """Add one file to the object directory if its content is new. Returns bytes written"""
+    obj = _object_path(store_dir, digest)
+    if obj.exists():
+        return 0
+    obj.parent.mkdir(parents=True, exist_ok=True)
+    tmp = obj.with_name(f"{digest}.{os.getpid()}.tmp")
+    _, written = link_or_copy(src, tmp, OBJECT_LINK_MODE)
+    os.replace(tmp, obj)
+    return written
+
+
+def create_snapshot(root_dir=TRAINING_DATA_DIR, store_dir=SNAPSHOT_DIR, label=None, workers=HASH_WORKERS):
+    """
+    Snapshot a directory tree.
+
+    Args:
+        root_dir: Directory to snapshot (normally TRAINING_DATA)
+        store_dir: Snapshot store directory
+        label: Optional short tag appended to the snapshot name
+        workers: Threads hashing and storing files
+
+    Returns:
+        Name of the new snapshot
+    """
+    root_dir, store_dir = Path(root_dir), Path(store_dir)
+    snapshots = list_snapshots(store_dir)
+    previous = load_manifest(snapshots[-1], store_dir)['files'] if snapshots else None
+
+    files, hashed = scan_tree(root_dir, previous, workers)
+
+    # Only contents not yet in the object directory are written, once per distinct hash
+    sources = {entry[1]: root_dir / rel for rel, entry in files.items()}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        written = sum(pool.map(lambda item: _store_object(store_dir, item[1], item[0]), sources.items()))
+
+    base = datetime.now().strftime('%Y%m%d_%H%M%S') + (f"_{label}" if label else "")
+    name, suffix = base, 1
+    while _manifest_path(store_dir, name).exists():
+        suffix += 1
+        name = f"{base}-{suffix}"
+    manifest = {
+        'name': name, 'created': datetime.now().isoformat(timespec='seconds'),
+        'root': str(root_dir), 'files': files,
+    }
+    path = _manifest_path(store_dir, name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+    total = sum(size for size, _, _ in files.values())
+    print(f"✓ Snapshot {name}: {len(files)} files ({total / 1e6:.1f} MB), "
+          f"{hashed} hashed, {written / 1e6:.2f} MB written")
+    return name
+
+
+def diff_snapshots(old, new=None, store_dir=SNAPSHOT_DIR, root_dir=TRAINING_DATA_DIR):
+    """
+    Compare two snapshots, or a snapshot with the live tree.
+
+    Args:
+        old: Snapshot name
+        new: Snapshot name, or None to compare against root_dir as it is now
+
+    Returns:
+        Dict with sorted 'added', 'removed' and 'changed' path lists
+    """
+    old_files = load_manifest(old, store_dir)['files']
+    if new is None:
+        new_files, _ = scan_tree(root_dir, old_files)
+    else:
+        new_files = load_manifest(new, store_dir)['files']
+
+    return {
+        'added': sorted(set(new_files) - set(old_files)),
+        'removed': sorted(set(old_files) - set(new_files)),
+        'changed': sorted(p for p in set(old_files) & set(new_files) if old_files[p][1] != new_files[p][1]),
+    }
+
+
+def print_diff(diff, limit=20):
+    """Print a snapshot diff, truncated to `limit` paths per section"""
+    for section, marker in (('added', '+'), ('removed', '-'), ('changed', '~')):
+        paths = diff[section]
+        print(f"\n{section.upper()}: {len(paths)}")
+        for path in paths[:limit]:
+            print(f"  {marker} {path}")
+        if len(paths) > limit:
+            print(f"  ... and {len(paths) - limit} more")
+
+
+def restore_snapshot(name, target_dir=TRAINING_DATA_DIR, store_dir=SNAPSHOT_DIR, clean=False,
+                     workers=HASH_WORKERS):
+    """
+    Materialize a snapshot into a directory.
+
+    Files already matching the snapshot are left alone, so restoring over the
+    live tree only rewrites what changed.
+
+    Args:
+        name: Snapshot name
+        target_dir: Directory to restore into (created if missing)
+        clean: Also delete files in target_dir that are not in the snapshot
+        workers: Threads restoring files
+
+    Returns:
+        Number of files written
+    """
+    target_dir = Path(target_dir)
+    files = load_manifest(name, store_dir)['files']
+    current, _ = scan_tree(target_dir, files, workers) if target_dir.exists() else ({}, 0)
+
+    stale = [rel for rel, entry in files.items() if current.get(rel, [None, None])[1] != entry[1]]
+
+    def restore(rel):
+        dst = target_dir / rel
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dst.with_name(f".{dst.name}.restore")
+        link_or_copy(_object_path(store_dir, files[rel][1]), tmp, OBJECT_LINK_MODE)
+        os.replace(tmp, dst)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(restore, stale))
+
+    removed = 0
+    if clean:
+        for rel in set(current) - set(files):
+            (target_dir / rel).unlink()
+            removed += 1
+
+    print(f"✓ Restored {name} into {target_dir}: {len(stale)} files written, "
+          f"{len(files) - len(stale)} already up to date, {removed} removed")
+    return len(stale)
+
+
+def delete_snapshot(name, store_dir=SNAPSHOT_DIR):
+    """Remove a snapshot manifest (run gc afterwards to free its objects)"""
+    _manifest_path(store_dir, name).unlink()
+    print(f"✓ Deleted snapshot {name}")
+
+
+def gc(store_dir=SNAPSHOT_DIR):
+    """
+    Delete objects no snapshot references.
+
+    Returns:
+        Tuple (objects removed, bytes freed)
+    """
+    store_dir = Path(store_dir)
+    referenced = set()
+    for name in list_snapshots(store_dir):
+        referenced.update(entry[1] for entry in load_manifest(name, store_dir)['files'].values())
+
+    removed = freed = 0
+    for obj in (store_dir / "objects").glob('*/*'):
+        if obj.name not in referenced:
+            freed += obj.stat().st_size
+            obj.unlink()
+            removed += 1
+
+    print(f"✓ Garbage collection: {removed} objects removed, {freed / 1e6:.2f} MB freed")
+    return removed, freed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Content-addressed TRAINING_DATA snapshots")
+    parser.add_argument('--store', type=Path, default=SNAPSHOT_DIR, help="Snapshot store directory")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    create = sub.add_parser('create', help="Snapshot the training data")
+    create.add_argument('--root', type=Path, default=TRAINING_DATA_DIR)
+    create.add_argument('--label', default=None)
+
+    sub.add_parser('list', help="List snapshots")
+
+    diff = sub.add_parser('diff', help="Compare two snapshots, or a snapshot with the live tree")
+    diff.add_argument('old')
+    diff.add_argument('new', nargs='?')
+    diff.add_argument('--root', type=Path, default=TRAINING_DATA_DIR)
+
+    restore = sub.add_parser('restore', help="Restore a snapshot")
+    restore.add_argument('name')
+    restore.add_argument('--target', type=Path, default=TRAINING_DATA_DIR)
+    restore.add_argument('--clean', action='store_true', help="Delete files not in the snapshot")
+
+    delete = sub.add_parser('delete', help="Delete a snapshot manifest")
+    delete.add_argument('name')
+
+    sub.add_parser('gc', help="Remove unreferenced objects")
+
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print(f"📸 SNAPSHOT STORE: {args.store}")
+    print("="*60)
+
+    if args.command == 'create':
+        create_snapshot(args.root, args.store, args.label)
+    elif args.command == 'list':
+        for name in list_snapshots(args.store):
+            manifest = load_manifest(name, args.store)
+            total = sum(entry[0] for entry in manifest['files'].values())
+            print(f"  {name:<40} {len(manifest['files']):>7} files {total / 1e6:>9.1f} MB")
+    elif args.command == 'diff':
+        print_diff(diff_snapshots(args.old, args.new, args.store, args.root))
+    elif args.command == 'restore':
+        restore_snapshot(args.name, args.target, args.store, args.clean)
+    elif args.command == 'delete':
+        delete_snapshot(args.name, args.store)
+    elif args.command == 'gc':
+        gc(args.store)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""
+Confidence / NMS Threshold Sweep
+================================
+Runs the model once at a very low confidence with almost no NMS, keeps the
+raw detections in the prediction cache, then re-scores a whole grid of
+(conf, NMS IoU) operating points in NumPy without touching the model again.
+
+Both re-scoring steps are prefix-consistent in confidence order: greedy NMS
+only lets higher-confidence boxes suppress lower ones, and predictions are
+matched to ground truth highest confidence first. Each NMS IoU therefore
+needs one NMS pass and one matching pass, and every confidence threshold
+falls out of a cumulative sum.
+
+Usage:
+    python threshold_sweep.py
+"""
+
+from itertools import chain
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from ultralytics import YOLO
+
+from evaluate_and_test import (CLASS_NAMES, IMAGE_EXTENSIONS, IMG_SIZE, INFERENCE_BATCH_SIZE,
+                               get_model_path, iter_image_batches, log_msg)
+from inference_pipeline import run_pipeline
+from obb_metrics import load_ground_truth, sparse_pairwise_iou
+from obb_rendering import obb_to_numpy
+from prediction_cache import PredictionCache, file_digest
+
+# Sweep configuration
+TEST_IMAGES_DIR = Path("dataset/test/images")
+TEST_LABELS_DIR = Path("dataset/test/labels")
+RAW_CONF = 0.001          # Keep nearly everything the model emits
+RAW_NMS_IOU = 0.95        # Near-disabled NMS so lower IoUs can be re-applied
+CONF_GRID = np.round(np.arange(0.05, 0.96, 0.05), 2)
+NMS_IOU_GRID = np.array([0.3, 0.4, 0.5, 0.6, 0.7, 0.8])
+MATCH_IOU = 0.5
+OUTPUT_DIR = Path("evaluation")
+
+
+def collect_raw_detections(weights, image_dir=TEST_IMAGES_DIR):
+    """
+    Make sure every test image has low-confidence raw detections cached.
+
+    Args:
+        weights: Model weights (best.pt)
+        image_dir: Test images
+
+    Returns:
+        Tuple (cache, file names of the current test images)
+    """
+    cache = PredictionCache.open(weights, RAW_CONF, IMG_SIZE, RAW_NMS_IOU, tiling=None)  # Full-frame YOLO below
+    image_hashes = {}
+
+    def needs_inference(img_path):
+        image_hashes[img_path] = file_digest(img_path)
+        return image_hashes[img_path] not in cache
+
+    def cache_only(img_path, img, result):
+        cache.put(image_hashes[img_path], img.shape, *obb_to_numpy(result.obb))
+        return []
+
+    batches = iter_image_batches(image_dir, INFERENCE_BATCH_SIZE, keep=needs_inference)
+    first_batch = next(batches, None)
+    if first_batch is not None:
+        model = YOLO(str(weights))
+        run_pipeline(model, chain([first_batch], batches), cache_only, RAW_CONF,
+                     imgsz=IMG_SIZE, iou=RAW_NMS_IOU, max_det=1000)
+    cache.set_names({img_path.name: h for img_path, h in image_hashes.items()})
+    cache.save()
+
+    log_msg(f"Raw detections: {len(image_hashes)} images from {cache.path}", "💾")
+    return cache, [img_path.name for img_path in image_hashes]
+
+
+def _flatten(cache, names, ground_truth):
+    """Flatten cached predictions and ground truth into global arrays with image ids"""
+    preds = cache.to_predictions(names)
+    stems = sorted(set(preds) | set(ground_truth))
+    image_ids = {stem: i for i, stem in enumerate(stems)}
+
+    def stack(source, n_fields):
+        columns = [[] for _ in range(n_fields)]
+        for stem, entry in source.items():
+            for column, value in zip(columns, entry):
+                column.append(np.asarray(value))
+            columns[-1].append(np.full(len(entry[0]), image_ids[stem], dtype=np.int64))
+        return [np.concatenate(c) if c else np.zeros(0) for c in columns]
+
+    pred_polys, pred_conf, pred_cls, pred_img = stack(preds, 4)
+    gt_polys, gt_cls, gt_img = stack(ground_truth, 3)
+    return (pred_polys.reshape(-1, 4, 2), pred_conf, pred_cls.astype(np.int64), pred_img.astype(np.int64),
+            gt_polys.reshape(-1, 4, 2), gt_cls.astype(np.int64), gt_img.astype(np.int64))
+
+
+def _neighbours(rank, pi, gi, iou):
+    """CSR adjacency from each box to its pairs, best IoU first, in confidence-rank order"""
+    order = np.lexsort((-iou, rank[pi]))
+    pi, gi, iou = pi[order], gi[order], iou[order]
+    starts = np.searchsorted(rank[pi], np.arange(len(rank) + 1))
+    return gi, iou, starts
+
+
+def greedy_nms_keep(conf, pi, pj, iou, threshold):
+    """
+    Class-aware greedy NMS over precomputed overlapping pairs.
+
+    Args:
+        conf: (N,) confidences
+        pi, pj, iou: Same-class overlapping pairs with conf[pi] > conf[pj]
+
+    Returns:
+        (N,) boolean keep mask
+    """
+    keep = np.ones(len(conf), dtype=bool)
+    use = iou > threshold
+    pi, pj = pi[use], pj[use]
+    if len(pi) == 0:
+        return keep
+
+    order = np.argsort(pi, kind='stable')
+    pi, pj = pi[order], pj[order]
+    starts = np.searchsorted(pi, np.arange(len(conf) + 1))
+    # Only boxes that can suppress something need visiting, highest confidence first
+    for i in sorted(np.unique(pi), key=lambda k: -conf[k]):
+        if keep[i]:
+            keep[pj[starts[i]:starts[i + 1]]] = False
+    return keep
+
+
+def match_by_confidence(conf, kept, pi, gi, iou, n_gt, threshold=MATCH_IOU):
+    """
+    Match kept predictions to ground truth, highest confidence first.
+
+    Returns:
+        (N,) boolean true-positive mask
+    """
+    tp = np.zeros(len(conf), dtype=bool)
+    use = kept[pi] & (iou >= threshold)
+    pi, gi, iou = pi[use], gi[use], iou[use]
+    if len(pi) == 0:
+        return tp
+
+    rank = np.empty(len(conf), dtype=np.int64)
+    rank[np.argsort(-conf, kind='stable')] = np.arange(len(conf))
+    gi, iou, starts = _neighbours(rank, pi, gi, iou)
+    by_rank = np.argsort(rank)
+
+    taken = np.zeros(n_gt, dtype=bool)
+    for r in np.flatnonzero(np.diff(starts)):
+        for g in gi[starts[r]:starts[r + 1]]:
+            if not taken[g]:
+                taken[g] = True
+                tp[by_rank[r]] = True
+                break
+    return tp
+
+
+def sweep(cache, names, labels_dir=TEST_LABELS_DIR):
+    """
+    Score every (conf, NMS IoU) pair in the grid.
+
+    Returns:
+        DataFrame with one row per operating point
+    """
+    stems = {p.stem for p in TEST_IMAGES_DIR.rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS}
+    ground_truth = load_ground_truth(labels_dir, stems)
+    (pred_polys, pred_conf, pred_cls, pred_img,
+     gt_polys, gt_cls, gt_img) = _flatten(cache, names, ground_truth)
+
+    # Pairwise IoUs are computed once and reused for every grid point
+    ni, nj, nms_iou = sparse_pairwise_iou(pred_polys, pred_img, pred_polys, pred_img)
+    suppress = (pred_cls[ni] == pred_cls[nj]) & (pred_conf[ni] > pred_conf[nj])
+    ni, nj, nms_iou = ni[suppress], nj[suppress], nms_iou[suppress]
+
+    mi, mg, match_iou = sparse_pairwise_iou(pred_polys, pred_img, gt_polys, gt_img)
+    same = pred_cls[mi] == gt_cls[mg]
+    mi, mg, match_iou = mi[same], mg[same], match_iou[same]
+
+    n_gt = len(gt_cls)
+    num_classes = len(CLASS_NAMES)
+    order = np.argsort(-pred_conf, kind='stable')
+    sorted_conf = pred_conf[order]
+    # Number of predictions at or above each confidence threshold
+    cutoffs = np.searchsorted(-sorted_conf, -CONF_GRID, side='right')
+
+    rows = []
+    for nms_threshold in NMS_IOU_GRID:
+        kept = greedy_nms_keep(pred_conf, ni, nj, nms_iou, nms_threshold)
+        tp = match_by_confidence(pred_conf, kept, mi, mg, match_iou, n_gt)
+
+        k_sorted, tp_sorted = kept[order], tp[order]
+        cls_onehot = np.eye(num_classes, dtype=np.int64)[pred_cls[order]] * k_sorted[:, None]
+        cum_kept = np.concatenate([[0], np.cumsum(k_sorted)])
+        cum_tp = np.concatenate([[0], np.cumsum(tp_sorted)])
+        cum_cls = np.vstack([np.zeros(num_classes, np.int64), np.cumsum(cls_onehot, axis=0)])
+
+        n_det = cum_kept[cutoffs]
+        n_tp = cum_tp[cutoffs]
+        precision = n_tp / np.maximum(n_det, 1)
+        recall = n_tp / max(n_gt, 1)
+        f1 = 2 * precision * recall / np.maximum(precision + recall, 1e-9)
+
+        for k, conf in enumerate(CONF_GRID):
+            row = {
+                'conf': float(conf), 'nms_iou': float(nms_threshold),
+                'precision': float(precision[k]), 'recall': float(recall[k]), 'f1': float(f1[k]),
+                'tp': int(n_tp[k]), 'fp': int(n_det[k] - n_tp[k]), 'fn': int(n_gt - n_tp[k]),
+            }
+            for class_id, name in CLASS_NAMES.items():
+                row[f'n_{name}'] = int(cum_cls[cutoffs[k], class_id])
+            rows.append(row)
+
+    return pd.DataFrame(rows)
+
+
+def save_sweep(table, output_dir=OUTPUT_DIR):
+    """Write the operating-point table and precision/recall/F1 curves"""
+    from matplotlib.figure import Figure
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    table.to_csv(output_dir / "threshold_sweep.csv", index=False)
+
+    fig = Figure(figsize=(15, 4.5))
+    axes = fig.subplots(1, 3)
+    for nms_threshold, group in table.groupby('nms_iou'):
+        for ax, metric in zip(axes, ('precision', 'recall', 'f1')):
+            ax.plot(group['conf'], group[metric], marker='o', markersize=3, label=f"NMS IoU {nms_threshold:g}")
+    for ax, metric in zip(axes, ('Precision', 'Recall', 'F1')):
+        ax.set_title(f'{metric} vs Confidence', fontweight='bold')
+        ax.set_xlabel('Confidence Threshold')
+        ax.set_ylabel(metric)
+        ax.set_ylim([0, 1])
+        ax.grid(True, alpha=0.3)
+    axes[2].legend()
+    fig.savefig(output_dir / "threshold_sweep.png", dpi=150, bbox_inches='tight')
+
+
+def print_operating_points(table):
+    """Print the best-F1 point and the best point at each NMS IoU"""
+    print("\n" + "="*70)
+    print(f"🎚️  OPERATING POINTS (match IoU {MATCH_IOU})")
+    print("="*70)
+    print(f"  {'NMS IoU':>8} {'Conf':>6} {'Precision':>10} {'Recall':>8} {'F1':>7} {'TP':>5} {'FP':>5} {'FN':>5}")
+    for _, row in table.loc[table.groupby('nms_iou')['f1'].idxmax()].iterrows():
+        print(f"  {row['nms_iou']:>8.2f} {row['conf']:>6.2f} {row['precision']:>10.4f} {row['recall']:>8.4f} "
+              f"{row['f1']:>7.4f} {int(row['tp']):>5} {int(row['fp']):>5} {int(row['fn']):>5}")
+    best = table.loc[table['f1'].idxmax()]
+    print(f"\n  Best F1 {best['f1']:.4f} at conf={best['conf']:.2f}, NMS IoU={best['nms_iou']:.2f}")
+    print("="*70)
+
+
+if __name__ == '__main__':
+    weights = get_model_path()  # evaluate_and_test's run (best in the run registry)
+    if not weights.exists():
+        log_msg(f"Model not found: {weights}", "❌")
+    else:
+        cache, names = collect_raw_detections(weights)
+        table = sweep(cache, names)
+        save_sweep(table)
+        print_operating_points(table)
+        log_msg(f"Sweep saved to: {OUTPUT_DIR / 'threshold_sweep.csv'}", "✅")
@@ -0,0 +1,167 @@
+"""
+Tiled (Sliced) Inference
+========================
+The model is trained at imgsz=640, so running it on a 4K frame downsamples
+the image ~6x and thin cracks disappear. This module cuts large frames into
+overlapping 640px tiles, runs tile batches in parallel, shifts the tile OBBs
+back to frame coordinates and merges duplicates across seams with
+rotated-box NMS.
+
+`TiledPredictor.predict` mirrors `YOLO.predict` closely enough to be passed
+anywhere a model is expected (e.g. inference_pipeline.run_pipeline).
+"""
+
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from obb_rendering import obb_to_numpy
+
+# Tiling configuration
+TILE_SIZE = 640
+TILE_OVERLAP = 0.2        # Fraction of a tile shared with its neighbour
+TILE_BATCH = 8
+TILE_WORKERS = 2          # Each worker owns its own model instance
+MIN_TILING_SIDE = 960     # Smaller frames are predicted whole
+NMS_IOU = 0.5
+
+
+@lru_cache(maxsize=64)
+def tile_grid(width, height, tile=TILE_SIZE, overlap=TILE_OVERLAP):
+    """
+    Top-left corners of overlapping tiles covering a frame.
+
+    Cached per resolution, since a camera line produces the same frame size
+    over and over.
+
+    Returns:
+        Read-only (N, 2) int array of (x0, y0)
+    """
+    step = max(1, int(tile * (1 - overlap)))
+
+    def starts(size):
+        if size <= tile:
+            return [0]
+        positions = list(range(0, size - tile, step))
+        positions.append(size - tile)  # Last tile flush with the far edge
+        return positions
+
+    grid = np.array([(x, y) for y in starts(height) for x in starts(width)], dtype=np.int32)
+    grid.flags.writeable = False
+    return grid
+
+
+def rotated_nms(xywhr, conf, cls, iou_threshold=NMS_IOU):
+    """
+    Class-aware rotated NMS.
+
+    Returns:
+        Indices of the kept boxes, highest confidence first
+    """
+    if len(xywhr) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    import torch
+    from ultralytics.utils.ops import nms_rotated
+
+    # Offset each class far apart so boxes of different classes never overlap
+    boxes = xywhr.astype(np.float32).copy()
+    boxes[:, :2] += cls[:, None].astype(np.float32) * 4096 * 4
+    keep = nms_rotated(torch.from_numpy(boxes), torch.from_numpy(conf.astype(np.float32)), iou_threshold)
+    return keep.cpu().numpy()
+
+
+class _OBBArray:
+    """Minimal stand-in for `result.obb` holding [x, y, w, h, r, conf, cls] rows"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+
+class TiledResult:
+    """Merged detections for one frame, exposing `.obb` like an Ultralytics result"""
+
+    def __init__(self, data, orig_shape):
+        self.obb = _OBBArray(data)
+        self.orig_shape = orig_shape
+
+
+class TiledPredictor:
+    """
+    Runs sliced inference with a small pool of models.
+
+    Args:
+        model_factory: Callable returning a fresh YOLO model (one per worker)
+        workers: Number of tile batches predicted concurrently
+        tile_batch: Tiles per forward pass
+        nms_iou: IoU threshold for merging duplicates across tile seams
+    """
+
+    def __init__(self, model_factory, workers=TILE_WORKERS, tile_batch=TILE_BATCH, nms_iou=NMS_IOU):
+        self.tile_batch = tile_batch
+        self.nms_iou = nms_iou
+        self._models = queue.Queue()
+        for _ in range(workers):
+            self._models.put(model_factory())
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tiles')
+
+    def _predict_batch(self, crops, conf):
+        """Borrow a free model and predict one batch of crops"""
+        model = self._models.get()
+        try:
+            results = model.predict(crops, conf=conf, imgsz=TILE_SIZE, batch=len(crops), verbose=False)
+            rows = []
+            for result in results:
+                xywhr, scores, classes = obb_to_numpy(result.obb)
+                rows.append(np.column_stack([xywhr, scores, classes]).astype(np.float32))
+            return rows
+        finally:
+            self._models.put(model)
+
+    def predict(self, images, conf=0.25, **kwargs):
+        """
+        Predict a list of BGR frames.
+
+        Frames no larger than MIN_TILING_SIDE go through the model whole;
+        larger frames are tiled. Extra keyword arguments are accepted for
+        compatibility with `YOLO.predict` and ignored.
+
+        Returns:
+            List of TiledResult, one per input frame
+        """
+        if not isinstance(images, (list, tuple)):
+            images = [images]
+
+        # Flatten every tile of every frame into one work list
+        jobs = []  # (frame index, x0, y0, crop)
+        for idx, img in enumerate(images):
+            h, w = img.shape[:2]
+            if max(h, w) <= MIN_TILING_SIDE:
+                jobs.append((idx, 0, 0, img))
+                continue
+            for x0, y0 in tile_grid(w, h).tolist():
+                jobs.append((idx, x0, y0, img[y0:y0 + TILE_SIZE, x0:x0 + TILE_SIZE]))
+
+        batches = [jobs[i:i + self.tile_batch] for i in range(0, len(jobs), self.tile_batch)]
+        futures = [self._pool.submit(self._predict_batch, [job[3] for job in batch], conf)
+                   for batch in batches]
+
+        per_frame = [[] for _ in images]
+        for batch, future in zip(batches, futures):
+            for (idx, x0, y0, _), rows in zip(batch, future.result()):
+                if len(rows):
+                    rows[:, 0] += x0
+                    rows[:, 1] += y0
+                    per_frame[idx].append(rows)
+
+        results = []
+        for idx, img in enumerate(images):
+            data = np.concatenate(per_frame[idx]) if per_frame[idx] else np.zeros((0, 7), np.float32)
+            keep = rotated_nms(data[:, :5], data[:, 5], data[:, 6].astype(np.int64), self.nms_iou)
+            results.append(TiledResult(data[keep], img.shape[:2]))
+        return results
@@ -14,13 +14,11 @@
 import os
 import sys
 import zipfile
-import torch
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pandas as pd
 from pathlib import Path
 from datetime import datetime
-from ultralytics import YOLO
+
+# torch, ultralytics and matplotlib are imported inside the steps that
+# use them, so importing this module (or a failing early step) stays fast
 
 # ============================================================
 # CONFIGURATION
@@ -39,6 +37,10 @@ BATCH_SIZE = 16
 WORKERS = 4
 PATIENCE = 20  # Early stopping patience
 
+# CPU deployment artifacts produced alongside best.pt
+EXPORT_FORMATS = ('onnx', 'openvino')
+EXPORT_DYNAMIC_BATCH = True
+
 # ============================================================
 # UTILITY FUNCTIONS
 # ============================================================
@@ -64,6 +66,8 @@ def setup_environment():
     print_header("1️⃣  ENVIRONMENT SETUP")
     
     try:
+        import torch
+
         log_message(f"Python version: {sys.version}")
         log_message(f"PyTorch version: {torch.__version__}")
         log_message(f"CUDA available: {torch.cuda.is_available()}")
@@ -165,10 +169,19 @@ def validate_dataset():
 
 
 def train_model(device, data_yaml):
-    """Train the YOLOv8 OBB model"""
+    """
+    Train the YOLOv8 OBB model.
+    
+    Returns:
+        Path of the run directory Ultralytics wrote to (wedtect-obb-final,
+        or the first free wedtect-obb-finalN if that exists)
+    """
     print_header("4️⃣  MODEL TRAINING")
     
     try:
+        from ultralytics import YOLO
+        from run_registry import register_run
+
         log_message("Loading YOLOv8 Nano OBB model...")
         model = YOLO('yolov8n-obb.pt')
         log_message("✅ Model loaded successfully!")
@@ -188,8 +201,11 @@ def train_model(device, data_yaml):
         # Create runs directory
         RUNS_DIR.mkdir(exist_ok=True)
         
+        # Index the run as soon as it exists, so monitor_training.py finds it
+        model.add_callback("on_train_start", lambda trainer: register_run(trainer.save_dir))
+        
         # Train model
-        results = model.train(
+        model.train(
             data=data_yaml,
             epochs=EPOCHS,
             imgsz=IMG_SIZE,
@@ -205,7 +221,7 @@ def train_model(device, data_yaml):
         )
         
         log_message("\n✅ Training completed successfully!")
-        return results
+        return Path(model.trainer.save_dir)
         
     except Exception as e:
         log_message(f"❌ Training failed: {e}", "ERROR")
@@ -235,27 +251,31 @@ def evaluate_model(model):
         return None
 
 
-def plot_results():
+def plot_results(run_dir):
     """Plot training results"""
     print_header("6️⃣  RESULTS VISUALIZATION")
     
     try:
-        results_path = RUNS_DIR / "obb" / "wedtect-obb-final" / "results.csv"
+        results_path = run_dir / "results.csv"
         
         if not results_path.exists():
             log_message(f"⚠️  Results file not found: {results_path}", "WARNING")
             return
         
+        import matplotlib.pyplot as plt
+        from run_metrics import load_run_metrics
+
         log_message(f"Reading results from: {results_path}")
-        df = pd.read_csv(results_path)
+        metrics = load_run_metrics(results_path)
+        epochs = metrics.epoch
         
         # Create visualization
         fig, axes = plt.subplots(2, 2, figsize=(15, 10))
         fig.suptitle('Wedtect YOLOv8 OBB Training Results', fontsize=16)
         
         # Plot 1: Box Loss
-        axes[0, 0].plot(df['epoch'], df['train/box_loss'], label='Train', marker='o', markersize=3)
-        axes[0, 0].plot(df['epoch'], df['val/box_loss'], label='Val', marker='s', markersize=3)
+        axes[0, 0].plot(epochs, metrics['train/box_loss'], label='Train', marker='o', markersize=3)
+        axes[0, 0].plot(epochs, metrics['val/box_loss'], label='Val', marker='s', markersize=3)
         axes[0, 0].set_xlabel('Epoch')
         axes[0, 0].set_ylabel('Loss')
         axes[0, 0].set_title('Box Loss')
@@ -263,9 +283,9 @@ def plot_results():
         axes[0, 0].grid(True, alpha=0.3)
         
         # Plot 2: Precision & Recall
-        if 'metrics/precision(B)' in df.columns and 'metrics/recall(B)' in df.columns:
-            axes[0, 1].plot(df['epoch'], df['metrics/precision(B)'], label='Precision', marker='o', markersize=3)
-            axes[0, 1].plot(df['epoch'], df['metrics/recall(B)'], label='Recall', marker='s', markersize=3)
+        if metrics.precision is not None and metrics.recall is not None:
+            axes[0, 1].plot(epochs, metrics.precision, label='Precision', marker='o', markersize=3)
+            axes[0, 1].plot(epochs, metrics.recall, label='Recall', marker='s', markersize=3)
             axes[0, 1].set_xlabel('Epoch')
             axes[0, 1].set_ylabel('Score')
             axes[0, 1].set_title('Precision & Recall')
@@ -273,8 +293,10 @@ def plot_results():
             axes[0, 1].grid(True, alpha=0.3)
         
         # Plot 3: mAP
-        if 'metrics/mAP50(B)' in df.columns:
-            axes[1, 0].plot(df['epoch'], df['metrics/mAP50(B)'], label='mAP50', marker='o', markersize=3)
+        if metrics.map50 is not None:
+            axes[1, 0].plot(epochs, metrics.map50, label='mAP50', marker='o', markersize=3)
+            if metrics.map50_95 is not None:
+                axes[1, 0].plot(epochs, metrics.map50_95, label='mAP50-95', marker='s', markersize=3)
             axes[1, 0].set_xlabel('Epoch')
             axes[1, 0].set_ylabel('mAP50')
             axes[1, 0].set_title('Mean Average Precision')
@@ -286,9 +308,9 @@ def plot_results():
         summary_text = f"""
         Training Summary
         
-        Total Epochs: {len(df)}
-        Final Box Loss: {df['train/box_loss'].iloc[-1]:.4f}
-        Best Epoch: {df['epoch'].idxmin() + 1}
+        Total Epochs: {len(metrics)}
+        Final Box Loss: {metrics['train/box_loss'][-1]:.4f}
+        Best Epoch: {metrics.best_epoch} (mAP50-95)
         
         Dataset: Wedtect Segmentation v2i
         Model: YOLOv8 Nano OBB
@@ -296,7 +318,7 @@ def plot_results():
         axes[1, 1].text(0.1, 0.5, summary_text, fontsize=11, family='monospace', 
                        verticalalignment='center')
         
-        plot_path = RUNS_DIR / "obb" / "wedtect-obb-final" / "training_plots.png"
+        plot_path = run_dir / "training_plots.png"
         plt.savefig(plot_path, dpi=150, bbox_inches='tight')
         log_message(f"✅ Training plots saved to: {plot_path}")
         
@@ -347,17 +369,20 @@ def run_inference(model):
         log_message(f"⚠️  Inference had issues: {e}")
 
 
-def export_model():
+def export_model(run_dir):
     """Export the trained model"""
     print_header("8️⃣  MODEL EXPORT")
     
     try:
-        best_model_path = RUNS_DIR / "obb" / "wedtect-obb-final" / "weights" / "best.pt"
+        best_model_path = run_dir / "weights" / "best.pt"
         
         if not best_model_path.exists():
             log_message(f"❌ Best model not found: {best_model_path}", "ERROR")
             return
         
+        from ultralytics import YOLO
+        from export_cpu_model import export_cpu_artifacts
+
         log_message(f"Loading best model from: {best_model_path}")
         model = YOLO(str(best_model_path))
         
@@ -374,6 +399,13 @@ def export_model():
         log_message(f"  - Task: OBB (Oriented Bounding Box)")
         log_message(f"  - Framework: PyTorch")
         
+        # CPU inference artifacts for GPU-less production nodes
+        log_message("\nExporting CPU inference artifacts...")
+        artifacts = export_cpu_artifacts(best_model_path, formats=EXPORT_FORMATS,
+                                         imgsz=IMG_SIZE, dynamic=EXPORT_DYNAMIC_BATCH)
+        for fmt, path in artifacts.items():
+            log_message(f"✅ {fmt} artifact: {path}")
+        
         return final_model_path
         
     except Exception as e:
@@ -396,6 +428,8 @@ def main():
     log_message("🚀 Starting Wedtect YOLOv8 OBB Training Pipeline")
     
     try:
+        from ultralytics import YOLO
+
         # Step 1: Setup
         device = setup_environment()
         
@@ -406,20 +440,26 @@ def main():
         data_yaml = validate_dataset()
         
         # Step 4: Train model
-        results = train_model(device, data_yaml)
+        run_dir = train_model(device, data_yaml)
+        log_message(f"Run directory: {run_dir}")
+        
+        # Record the finished run (final metrics, best.pt hash) in the run registry
+        from run_registry import RunRegistry
+        with RunRegistry(RUNS_DIR / "obb") as registry:
+            registry.refresh()
         
         # Step 5: Evaluate
-        evaluate_model(YOLO(str(RUNS_DIR / "obb" / "wedtect-obb-final" / "weights" / "best.pt")))
+        evaluate_model(YOLO(str(run_dir / "weights" / "best.pt")))
         
         # Step 6: Visualize
-        plot_results()
+        plot_results(run_dir)
         
         # Step 7: Inference
-        model = YOLO(str(RUNS_DIR / "obb" / "wedtect-obb-final" / "weights" / "best.pt"))
+        model = YOLO(str(run_dir / "weights" / "best.pt"))
         run_inference(model)
         
         # Step 8: Export
-        export_model()
+        export_model(run_dir)
         
         # Final summary
         print_header("✅ TRAINING PIPELINE COMPLETE!")